@@ -0,0 +1,28 @@
+"""add scene boundaries to video metadata
+
+Revision ID: 3f8d62c1a9e4
+Revises: e5a91c7f3b42
+Create Date: 2026-10-16 13:05:42.614207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8d62c1a9e4'
+down_revision: Union[str, Sequence[str], None] = 'e5a91c7f3b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('video_metadata', sa.Column('scene_boundaries', sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('video_metadata', 'scene_boundaries')
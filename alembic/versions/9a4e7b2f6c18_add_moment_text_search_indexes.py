@@ -0,0 +1,41 @@
+"""add moment text search indexes
+
+Revision ID: 9a4e7b2f6c18
+Revises: 3f8d62c1a9e4
+Create Date: 2026-10-16 14:40:18.902553
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4e7b2f6c18'
+down_revision: Union[str, Sequence[str], None] = '3f8d62c1a9e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # Only indexes, all built CONCURRENTLY, so character_moments stays writable on a large table.
+    # The full-text document is an expression index: a STORED generated column would rewrite the
+    # whole table under an ACCESS EXCLUSIVE lock.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_character_moments_action_tsv', 'character_moments', [sa.text("to_tsvector('english'::regconfig, action)")], unique=False, postgresql_using='gin', postgresql_concurrently=True)
+        op.create_index('ix_character_moments_action_trgm', 'character_moments', ['action'], unique=False, postgresql_using='gin', postgresql_ops={'action': 'gin_trgm_ops'}, postgresql_concurrently=True)
+        op.create_index('ix_character_moments_video_id', 'character_moments', ['video_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_character_moments_character_id', 'character_moments', ['character_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_character_screenshot_metadata_lower_character_name', 'character_screenshot_metadata', [sa.text('lower(trim(character_name))')], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_character_screenshot_metadata_lower_character_name', table_name='character_screenshot_metadata')
+    op.drop_index('ix_character_moments_character_id', table_name='character_moments')
+    op.drop_index('ix_character_moments_video_id', table_name='character_moments')
+    op.drop_index('ix_character_moments_action_trgm', table_name='character_moments')
+    op.drop_index('ix_character_moments_action_tsv', table_name='character_moments')
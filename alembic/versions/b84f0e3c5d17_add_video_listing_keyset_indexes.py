@@ -0,0 +1,30 @@
+"""add video listing keyset indexes
+
+Revision ID: b84f0e3c5d17
+Revises: 7c1e4b9d2a60
+Create Date: 2026-10-16 10:03:27.551204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b84f0e3c5d17'
+down_revision: Union[str, Sequence[str], None] = '7c1e4b9d2a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_video_metadata_created_at_id', 'video_metadata', ['created_at', 'id'], unique=False)
+    op.create_index('ix_video_metadata_status_created_at_id', 'video_metadata', ['status', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_video_metadata_status_created_at_id', table_name='video_metadata')
+    op.drop_index('ix_video_metadata_created_at_id', table_name='video_metadata')
@@ -0,0 +1,51 @@
+"""normalize moment intervals
+
+Revision ID: c62f0d9e3a57
+Revises: 9a4e7b2f6c18
+Create Date: 2026-10-16 15:52:09.117364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c62f0d9e3a57'
+down_revision: Union[str, Sequence[str], None] = '9a4e7b2f6c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # btree_gist lets the GiST index cover the uuid video_id next to the range
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+
+    # Retried tasks left exact duplicates behind; keep one of each before adding the unique key
+    op.execute("""
+        DELETE FROM character_moments a
+        USING character_moments b
+        WHERE a.character_id = b.character_id
+          AND a.start_timestamp = b.start_timestamp
+          AND a.end_timestamp = b.end_timestamp
+          AND a.id > b.id
+    """)
+    op.create_unique_constraint('uq_character_moments_character_id_start_end', 'character_moments', ['character_id', 'start_timestamp', 'end_timestamp'])
+
+    op.add_column('character_moments', sa.Column(
+        'time_range',
+        postgresql.NUMRANGE(),
+        sa.Computed("numrange(start_timestamp::numeric, end_timestamp::numeric, '[]')", persisted=True),
+        nullable=True
+    ))
+    op.create_index('ix_character_moments_video_id_time_range', 'character_moments', ['video_id', 'time_range'], unique=False, postgresql_using='gist')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_character_moments_video_id_time_range', table_name='character_moments')
+    op.drop_column('character_moments', 'time_range')
+    op.drop_constraint('uq_character_moments_character_id_start_end', 'character_moments', type_='unique')
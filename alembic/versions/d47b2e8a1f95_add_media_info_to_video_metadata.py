@@ -0,0 +1,38 @@
+"""add media info to video metadata
+
+Revision ID: d47b2e8a1f95
+Revises: c62f0d9e3a57
+Create Date: 2026-10-16 18:42:09.318552
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd47b2e8a1f95'
+down_revision: Union[str, Sequence[str], None] = 'c62f0d9e3a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('video_metadata', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('video_metadata', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('video_metadata', sa.Column('video_codec', sa.String(length=16), nullable=True))
+    op.add_column('video_metadata', sa.Column('audio_codec', sa.String(length=16), nullable=True))
+    op.add_column('video_metadata', sa.Column('bitrate', sa.Integer(), nullable=True))
+    op.add_column('video_metadata', sa.Column('is_faststart', sa.Boolean(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('video_metadata', 'is_faststart')
+    op.drop_column('video_metadata', 'bitrate')
+    op.drop_column('video_metadata', 'audio_codec')
+    op.drop_column('video_metadata', 'video_codec')
+    op.drop_column('video_metadata', 'height')
+    op.drop_column('video_metadata', 'width')
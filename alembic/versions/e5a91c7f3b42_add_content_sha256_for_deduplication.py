@@ -0,0 +1,34 @@
+"""add content sha256 for deduplication
+
+Revision ID: e5a91c7f3b42
+Revises: b84f0e3c5d17
+Create Date: 2026-10-16 11:20:05.318774
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a91c7f3b42'
+down_revision: Union[str, Sequence[str], None] = 'b84f0e3c5d17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('video_metadata', sa.Column('content_sha256', sa.String(length=64), nullable=True))
+    op.create_unique_constraint('video_metadata_content_sha256_key', 'video_metadata', ['content_sha256'])
+    op.add_column('character_screenshot_metadata', sa.Column('content_sha256', sa.String(length=64), nullable=True))
+    op.create_unique_constraint('uq_character_screenshot_metadata_video_id_content_sha256', 'character_screenshot_metadata', ['video_id', 'content_sha256'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_character_screenshot_metadata_video_id_content_sha256', 'character_screenshot_metadata', type_='unique')
+    op.drop_column('character_screenshot_metadata', 'content_sha256')
+    op.drop_constraint('video_metadata_content_sha256_key', 'video_metadata', type_='unique')
+    op.drop_column('video_metadata', 'content_sha256')
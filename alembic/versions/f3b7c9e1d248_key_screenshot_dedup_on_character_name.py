@@ -0,0 +1,39 @@
+"""key screenshot dedup on character name
+
+Revision ID: f3b7c9e1d248
+Revises: d47b2e8a1f95
+Create Date: 2026-10-16 21:05:37.402816
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b7c9e1d248'
+down_revision: Union[str, Sequence[str], None] = 'd47b2e8a1f95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Build the new key before dropping the old one, so uniqueness is enforced throughout
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_character_screenshot_metadata_dedup',
+            'character_screenshot_metadata',
+            ['video_id', 'content_sha256', sa.text('lower(trim(character_name))')],
+            unique=True,
+            postgresql_concurrently=True
+        )
+    op.drop_constraint('uq_character_screenshot_metadata_video_id_content_sha256', 'character_screenshot_metadata', type_='unique')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Fails if the same crop was saved for several characters of one video since the upgrade
+    op.create_unique_constraint('uq_character_screenshot_metadata_video_id_content_sha256', 'character_screenshot_metadata', ['video_id', 'content_sha256'])
+    op.drop_index('uq_character_screenshot_metadata_dedup', table_name='character_screenshot_metadata')
@@ -1,42 +1,269 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Form
-from app.services.file_storage_service import file_storage_service
-from app.services.video_metadata_service import VideoMetadataStorageService, get_video_metadata_service
-from app.services.character_screenshot_metadata_service import ScreenshotMetadataService, get_screenshot_metadata_service
-from app.worker.tasks import process_character_search
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Form, Request, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from app.services.file_storage_service import async_file_storage_service
+from app.services.streaming_upload_service import streaming_upload_service
+from app.services.presigned_url_cache import presigned_url_cache
+from app.services.analysis_cache_service import analysis_result_cache, content_identity
+from app.services.local_video_cache import local_video_cache
+from app.services.ai.rate_limiter import engine_rate_limiter
+from app.services.job_progress_service import job_progress
+from app.services.video_metadata_service import AsyncVideoMetadataStorageService, get_async_video_metadata_service, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.models.video_metadata import VideoStatus
+from app.services.character_screenshot_metadata_service import AsyncScreenshotMetadataService, get_async_screenshot_metadata_service
+from app.services.upload_session_service import UploadSessionService, get_upload_session_service
+from app.services.moment_search_service import MomentSearchService, get_moment_search_service, DEFAULT_PAGE_SIZE as MOMENT_SEARCH_DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE as MOMENT_SEARCH_MAX_PAGE_SIZE
+from app.services.moment_timeline_service import MomentTimelineService, get_moment_timeline_service
+from app.schemas.upload_session import UploadSessionCreate
+from app.worker.tasks import schedule_character_search, index_video_scenes
+from app.worker.scheduling import search_client_id
+import logging
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/videos",
     tags=["Videos"]
 )
 
+async def discard_duplicate_upload(uploaded_key: str, record: dict, record_key_field: str = "storage_key") -> None:
+    """
+    Content-addressed deduplication: when the metadata service linked an upload to an existing
+    identical file, the copy we just wrote to MinIO is redundant, so we remove it.
+    """
+    if record.get("deduplicated") and record[record_key_field] != uploaded_key:
+        try:
+            await async_file_storage_service.delete_file(uploaded_key)
+        except Exception:
+            pass # An orphaned duplicate only costs storage; the request itself succeeded
+
 @router.get("/")
-async def get_videos(video_metadata_service: VideoMetadataStorageService = Depends(get_video_metadata_service)):
+async def get_videos(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    status: list[VideoStatus] | None = Query(None),
+    video_metadata_service: AsyncVideoMetadataStorageService = Depends(get_async_video_metadata_service)
+):
     """
-    Retrieves all uploaded videos, their metadata, and a temporary pre-signed URL for playback.
+    Retrieves one page of uploaded videos, their metadata, and a temporary pre-signed URL for playback.
     We merge data from the PostgreSQL database with signed URLs from MinIO.
+    Pass the returned `next_cursor` back as `cursor` to fetch the next page; filter with `?status=COMPLETED`.
     """
     try:
         # The router has no idea that a database even exists. It just asks the service for videos.
-        db_videos = video_metadata_service.get_all_video_metadata()
+        page = await video_metadata_service.get_video_metadata_page(limit, cursor, status)
+        db_videos = page["videos"]
         
+        # Add the ephemeral signed URLs for the frontend.
+        # They come from the presigned URL cache, so we only re-sign URLs that are about to expire.
+        urls = await run_in_threadpool(presigned_url_cache.get_urls, [v["storage_key"] for v in db_videos])
         response_videos = []
         for v in db_videos:
-            # Add the ephemeral signed URL for the frontend
-            v["url"] = file_storage_service.get_presigned_url(v["storage_key"])
+            v["url"] = urls[v["storage_key"]]
             response_videos.append(v)
             
         return {
             "status": "success",
             "count": len(response_videos),
+            "next_cursor": page["next_cursor"],
             "videos": response_videos
         }
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def schedule_scene_index(video_id: str) -> None:
+    """
+    Queues the one-off EXTRACTING stage (scene-boundary index) for a newly stored video.
+    """
+    try:
+        # Publishing to the broker is a blocking network call
+        await run_in_threadpool(index_video_scenes.delay, video_id)
+    except Exception:
+        pass # Searches work without a scene index; never fail the upload over it
+
+async def record_media_info(video_record: dict, video_metadata_service: AsyncVideoMetadataStorageService) -> dict | None:
+    """
+    Probes a newly stored video's container headers with a few ranged reads (kilobytes, even
+    for multi-GB files) and stores its duration, resolution, codecs, bitrate and faststart flag.
+    """
+    from app.core.config import settings
+
+    if not settings.MEDIA_PROBE_ENABLED:
+        return None
+    try:
+        media_info = await async_file_storage_service.probe_video(video_record["storage_key"])
+        if media_info:
+            await video_metadata_service.save_media_info(video_record["id"], media_info)
+        return media_info
+    except Exception as e:
+        # The upload itself succeeded; the scene index still fills in the duration later
+        logger.warning(f"Failed to probe the media info of video {video_record['id']}: {e}")
+        return None
+
+@router.get("/url-cache/stats")
+async def get_url_cache_stats():
+    """
+    Hit/miss counters of the presigned URL cache used by the video listing.
+    """
+    return {"status": "success", "url_cache": presigned_url_cache.stats()}
+
+@router.get("/analysis-cache/stats")
+async def get_analysis_cache_stats():
+    """
+    Hit/miss counters of the analysis result cache, shared by every worker.
+    """
+    try:
+        stats = await run_in_threadpool(analysis_result_cache.stats)
+        return {"status": "success", "analysis_cache": stats}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/worker-cache/stats")
+async def get_worker_video_cache_stats():
+    """
+    Hit/miss and bytes-saved counters of the worker-local video caches, per worker node.
+    """
+    try:
+        stats = await run_in_threadpool(local_video_cache.stats)
+        return {"status": "success", "worker_video_cache": stats}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/library-index/stats")
+async def get_library_index_stats():
+    """
+    Size and shape of the library-wide search index (segments, vectors, videos, IVF parameters).
+    """
+    from app.services.library_index import library_index
+    try:
+        stats = await run_in_threadpool(library_index.stats)
+        return {"status": "success", "library_index": stats}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/engine-limits/stats")
+async def get_engine_limit_stats():
+    """
+    Current utilization of the cluster-wide AI engine rate limits (tokens, in-flight calls, queued calls).
+    """
+    try:
+        stats = await run_in_threadpool(engine_rate_limiter.stats)
+        return {"status": "success", "engine_limits": stats}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{video_id}/scenes")
+async def get_video_scenes(
+    video_id: str,
+    video_metadata_service: AsyncVideoMetadataStorageService = Depends(get_async_video_metadata_service)
+):
+    """
+    Returns the scene-boundary index of a video (empty until the EXTRACTING stage has run).
+    """
+    try:
+        scene_index = await video_metadata_service.get_video_scenes(video_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if scene_index is None:
+        raise HTTPException(status_code=404, detail="Video not found.")
+    return {"status": "success", **scene_index}
+
+@router.get("/{video_id}/progress")
+async def stream_job_progress(video_id: str, request: Request, screenshot_id: str | None = None):
+    """
+    Server-Sent Events stream of the character searches running on a video: the current state of
+    every recent job first, then each stage transition (queued, downloading, analyzing, saving,
+    completed/failed, with the moments found) as the workers publish it.
+    With `screenshot_id`, only that job is streamed and the stream ends once it completed or failed.
+    """
+    import json
+    from contextlib import aclosing
+    from app.core.config import settings
+
+    if not settings.JOB_PROGRESS_ENABLED:
+        raise HTTPException(status_code=503, detail="Job progress reporting is disabled.")
+
+    async def event_stream():
+        async with aclosing(job_progress.listen(video_id, settings.JOB_PROGRESS_HEARTBEAT_SECONDS)) as events:
+            async for event in events:
+                if await request.is_disconnected():
+                    break
+                if event is None:
+                    # SSE comment: keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                if screenshot_id and event["screenshot_id"] != screenshot_id:
+                    continue
+                yield f"event: progress\ndata: {json.dumps(event)}\n\n"
+                if screenshot_id and event["stage"] in job_progress.TERMINAL_STAGES:
+                    break
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/{video_id}/progress/latest")
+async def get_latest_job_progress(video_id: str):
+    """
+    The last known stage of every recent character search on a video, for clients that can't keep a stream open.
+    """
+    try:
+        events = await run_in_threadpool(job_progress.latest, video_id)
+        return {"status": "success", "video_id": video_id, "jobs": events}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{video_id}/on-screen")
+async def get_characters_on_screen(
+    video_id: str,
+    start: float = Query(..., ge=0.0),
+    end: float = Query(..., ge=0.0),
+    moment_timeline_service: MomentTimelineService = Depends(get_moment_timeline_service)
+):
+    """
+    Returns every character on screen at any point between `start` and `end` (seconds),
+    with the moments that overlap that range.
+    """
+    try:
+        characters = await run_in_threadpool(moment_timeline_service.characters_on_screen, video_id, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {"status": "success", "video_id": video_id, "start": start, "end": end, "count": len(characters), "characters": characters}
+
+@router.delete("/{video_id}/analysis-cache")
+async def invalidate_analysis_cache(
+    video_id: str,
+    video_metadata_service: AsyncVideoMetadataStorageService = Depends(get_async_video_metadata_service)
+):
+    """
+    Forgets every cached analysis result for a video, so the next searches run the engine again.
+    """
+    video_record = await video_metadata_service.get_video_metadata_by_id(video_id)
+    if video_record is None:
+        raise HTTPException(status_code=404, detail="Video not found.")
+
+    try:
+        removed = await run_in_threadpool(
+            analysis_result_cache.invalidate_video,
+            content_identity(video_record["content_sha256"], video_record["storage_key"])
+        )
+        return {"status": "success", "video_id": video_id, "invalidated": removed}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/upload")
 async def upload_video(
     file: UploadFile = File(...), 
-    video_metadata_service: VideoMetadataStorageService = Depends(get_video_metadata_service)
+    video_metadata_service: AsyncVideoMetadataStorageService = Depends(get_async_video_metadata_service)
 ):
     """
     Endpoint for uploading a video file to our S3/MinIO storage bucket,
@@ -47,8 +274,9 @@ async def upload_video(
         
     try:
         # 1. Upload the physical massive file to MinIO via the File Storage Service
-        # We store original videos in the 'videos/' prefix folder
-        object_key = file_storage_service.upload_file(
+        # We store original videos in the 'videos/' prefix folder.
+        # boto3 is blocking, so it runs on the storage I/O threads to keep the event loop free.
+        upload = await async_file_storage_service.upload_file_with_digest(
             file.file, 
             file.filename, 
             file.content_type, 
@@ -56,57 +284,289 @@ async def upload_video(
         )
         
         # 2. Save the structured metadata via the Video Metadata Storage Service
-        video_record = video_metadata_service.save_video_metadata(
+        # (if this exact file was uploaded before, we get the existing video back instead)
+        video_record = await video_metadata_service.save_video_metadata(
             original_filename=file.filename, 
-            storage_key=object_key
+            storage_key=upload["storage_key"],
+            content_sha256=upload["sha256"]
         )
+        await discard_duplicate_upload(upload["storage_key"], video_record)
+        media_info = None
+        if not video_record["deduplicated"]:
+            media_info = await record_media_info(video_record, video_metadata_service)
+            await schedule_scene_index(video_record["id"])
         
         return {
             "status": "success",
             "message": "Video uploaded successfully",
             "video_id": video_record["id"],
-            "original_filename": video_record["original_filename"]
+            "original_filename": video_record["original_filename"],
+            "deduplicated": video_record["deduplicated"],
+            "media_info": media_info
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/search")
-async def search_video(query: str, character_name: str, video_id: str):
+@router.post("/upload/stream")
+async def upload_video_stream(
+    request: Request,
+    filename: str,
+    content_type: str = Header(...),
+    video_metadata_service: AsyncVideoMetadataStorageService = Depends(get_async_video_metadata_service)
+):
     """
-    Endpoint to search for a specific character action within an uploaded video.
-    *(MVP Note: This returns mock timestamp references based on the query).*
+    Streaming alternative to /upload for very large videos.
+    The client sends the raw video bytes as the request body (not a multipart form) and
+    the body is piped straight into an S3 multipart upload, without touching local disk.
     """
-    # Mock search logic
-    if query.lower() == "drinking" and character_name.lower() == "rick":
+    if not content_type.startswith("video/"):
+        raise HTTPException(status_code=400, detail="File must be a video.")
+
+    try:
+        # 1. Pipe the request body into MinIO part by part
+        upload = await streaming_upload_service.upload_stream(
+            request.stream(),
+            filename,
+            content_type,
+            prefix="videos/"
+        )
+
+        # 2. Save the structured metadata via the Video Metadata Storage Service
+        video_record = await video_metadata_service.save_video_metadata(
+            original_filename=filename,
+            storage_key=upload["storage_key"],
+            content_sha256=upload["sha256"]
+        )
+        await discard_duplicate_upload(upload["storage_key"], video_record)
+        media_info = None
+        if not video_record["deduplicated"]:
+            media_info = await record_media_info(video_record, video_metadata_service)
+            await schedule_scene_index(video_record["id"])
+
         return {
             "status": "success",
-            "video_id": video_id,
-            "character": character_name,
-            "query": query,
-            "matches": [
-                {"timestamp": "00:15:23", "confidence_score": 0.98},
-                {"timestamp": "00:21:05", "confidence_score": 0.92}
-            ]
+            "message": "Video uploaded successfully",
+            "video_id": video_record["id"],
+            "original_filename": video_record["original_filename"],
+            "deduplicated": video_record["deduplicated"],
+            "media_info": media_info,
+            "size_bytes": upload["size_bytes"],
+            "elapsed_seconds": upload["elapsed_seconds"],
+            "bytes_per_second": upload["bytes_per_second"]
         }
-        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- Resumable Chunked Uploads ---
+# 1. POST   /uploads                          -> open a session, learn the chunk size
+# 2. PUT    /uploads/{id}/chunks/{n}          -> send chunk n as the raw body (any order, in parallel)
+# 3. GET    /uploads/{id}                     -> see which chunks/offsets arrived (to resume after a failure)
+# 4. POST   /uploads/{id}/complete            -> stitch the chunks together and create the video record
+#    DELETE /uploads/{id}                     -> give up and free the stored chunks
+
+@router.post("/uploads")
+async def create_upload_session(
+    body: UploadSessionCreate,
+    upload_session_service: UploadSessionService = Depends(get_upload_session_service)
+):
+    """
+    Starts a resumable upload for a large video.
+    """
+    if not body.content_type.startswith("video/"):
+        raise HTTPException(status_code=400, detail="File must be a video.")
+
+    try:
+        upload_session = await run_in_threadpool(
+            upload_session_service.create_session,
+            body.filename,
+            body.content_type,
+            body.total_size
+        )
+        return {"status": "success", "upload_session": upload_session}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/uploads/{session_id}/chunks/{chunk_number}")
+async def upload_chunk(
+    session_id: str,
+    chunk_number: int,
+    request: Request,
+    upload_session_service: UploadSessionService = Depends(get_upload_session_service)
+):
+    """
+    Receives one numbered chunk of a resumable upload as the raw request body.
+    """
+    data = await request.body()
+    try:
+        chunk = await run_in_threadpool(upload_session_service.upload_chunk, session_id, chunk_number, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if chunk is None:
+        raise HTTPException(status_code=404, detail="Upload session not found.")
+    return {"status": "success", "chunk": chunk}
+
+@router.get("/uploads/{session_id}")
+async def get_upload_session(
+    session_id: str,
+    upload_session_service: UploadSessionService = Depends(get_upload_session_service)
+):
+    """
+    Reports which chunks of a resumable upload have been received and which are missing.
+    """
+    try:
+        upload_session = await run_in_threadpool(upload_session_service.get_session_status, session_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if upload_session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found.")
+    return {"status": "success", "upload_session": upload_session}
+
+@router.post("/uploads/{session_id}/complete")
+async def complete_upload_session(
+    session_id: str,
+    upload_session_service: UploadSessionService = Depends(get_upload_session_service),
+    video_metadata_service: AsyncVideoMetadataStorageService = Depends(get_async_video_metadata_service)
+):
+    """
+    Finalizes a resumable upload once every chunk has arrived and creates the video record.
+    """
+    try:
+        upload_session = await run_in_threadpool(upload_session_service.complete_session, session_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if upload_session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found.")
+    video_record = await video_metadata_service.get_video_metadata_by_id(upload_session["video_id"])
+    media_info = await record_media_info(video_record, video_metadata_service) if video_record else None
+    await schedule_scene_index(upload_session["video_id"])
+    return {
+        "status": "success",
+        "message": "Video uploaded successfully",
+        "video_id": upload_session["video_id"],
+        "original_filename": upload_session["original_filename"],
+        "media_info": media_info
+    }
+
+@router.delete("/uploads/{session_id}")
+async def abort_upload_session(
+    session_id: str,
+    upload_session_service: UploadSessionService = Depends(get_upload_session_service)
+):
+    """
+    Cancels a resumable upload and discards the chunks received so far.
+    """
+    try:
+        upload_session = await run_in_threadpool(upload_session_service.abort_session, session_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if upload_session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found.")
+    return {"status": "success", "upload_session": upload_session}
+
+@router.get("/search")
+async def search_video(
+    query: str,
+    video_id: str | None = None,
+    character_name: str | None = None,
+    min_confidence: float | None = Query(None, ge=0.0, le=1.0),
+    limit: int = Query(MOMENT_SEARCH_DEFAULT_PAGE_SIZE, ge=1, le=MOMENT_SEARCH_MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    moment_search_service: MomentSearchService = Depends(get_moment_search_service)
+):
+    """
+    Full-text search over the actions of every discovered moment (e.g. "drinking from a flask"),
+    optionally restricted to one video, one character and a minimum confidence.
+    Results are ranked by relevance; pass the returned `next_cursor` back as `cursor` for the next page.
+    """
+    try:
+        page = await run_in_threadpool(
+            moment_search_service.search_moments,
+            query,
+            video_id=video_id,
+            character_name=character_name,
+            min_confidence=min_confidence,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
     return {
         "status": "success",
+        "query": query,
         "video_id": video_id,
         "character": character_name,
-        "matches": []
+        "count": len(page["moments"]),
+        "next_cursor": page["next_cursor"],
+        "matches": page["moments"]
+    }
+
+@router.post("/search/library")
+async def search_library(
+    file: UploadFile = File(...),
+    limit: int = Form(50),
+    video_metadata_service: AsyncVideoMetadataStorageService = Depends(get_async_video_metadata_service)
+):
+    """
+    "Find this character in every video": one reference screenshot, ranked moments across the
+    whole library, answered from the library-wide embedding index (no background job).
+    Videos appear here once the VECTOR engine has indexed them.
+    """
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image.")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    import os
+    import tempfile
+    from app.core.config import settings
+    from app.services.ai.vector_engine import get_query_embedder, embed_image_files
+    from app.services.library_index import library_index
+
+    extension = os.path.splitext(file.filename or "")[1] or ".png"
+    with tempfile.NamedTemporaryFile(suffix=extension) as temp_image:
+        temp_image.write(await file.read())
+        temp_image.flush()
+        try:
+            query = await run_in_threadpool(embed_image_files, get_query_embedder(), [temp_image.name])
+            moments = await run_in_threadpool(
+                library_index.search,
+                query[0],
+                limit=limit,
+                min_score=settings.VECTOR_MATCH_THRESHOLD,
+                max_gap_seconds=settings.VECTOR_MAX_GAP_SECONDS
+            )
+            filenames = await video_metadata_service.get_video_filenames([m["video_id"] for m in moments])
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "status": "success",
+        "matches": [{**m, "original_filename": filenames.get(m["video_id"])} for m in moments if m["video_id"] in filenames]
     }
 
 @router.post("/search/screenshot")
 async def upload_screenshot_and_search(
+    request: Request,
     video_id: str = Form(...),
     character_name: str = Form(...),
     time_stamp: float = Form(...),
     file: UploadFile = File(...),
-    screenshot_metadata_service: ScreenshotMetadataService = Depends(get_screenshot_metadata_service)
+    screenshot_metadata_service: AsyncScreenshotMetadataService = Depends(get_async_screenshot_metadata_service)
 ):
     """
     Endpoint for uploading a cropped character face to search the video.
     This triggers the asynchronous Celery background worker!
+    Searches are scheduled fairly between clients with a trusted identity (see search_client_id).
     """
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image.")
@@ -115,7 +575,7 @@ async def upload_screenshot_and_search(
         # 1. Upload the physical image crop to MinIO
         # Neatly nest this inside the specific video's folder in MinIO
         prefix = f"videos/{video_id}/screenshots/"
-        object_key = file_storage_service.upload_file(
+        upload = await async_file_storage_service.upload_file_with_digest(
             file.file, 
             file.filename, 
             file.content_type, 
@@ -123,15 +583,35 @@ async def upload_screenshot_and_search(
         )
         
         # 2. Save the metadata to PostgreSQL (CharacterScreenshot table)
-        screenshot_record = screenshot_metadata_service.save_screenshot_metadata(
+        screenshot_record = await screenshot_metadata_service.save_screenshot_metadata(
             video_id=video_id,
             character_name=character_name,
-            storage_key=object_key,
-            time_stamp=time_stamp
+            storage_key=upload["storage_key"],
+            time_stamp=time_stamp,
+            content_sha256=upload["sha256"]
         )
+        await discard_duplicate_upload(upload["storage_key"], screenshot_record, record_key_field="screenshot_url")
+
+        # The same crop was already analyzed for this video and character, so its moments are already in the database
+        if screenshot_record["is_processed"]:
+            return {
+                "status": "success",
+                "message": f"This screenshot was already analyzed for {character_name}.",
+                "screenshot_id": screenshot_record["id"],
+                "processing_status": "COMPLETED"
+            }
         
         # 3. The Magic: Dispatch the job to Redis for Celery to pick up
-        process_character_search.delay(screenshot_record["id"])
+        # (screenshots for the same video arriving close together are analyzed as one batch)
+        client_id = search_client_id(request.headers, request.client.host if request.client else None)
+        search_id = await run_in_threadpool(schedule_character_search, screenshot_record["id"], screenshot_record["video_id"], client_id)
+        if search_id != screenshot_record["id"]:
+            return {
+                "status": "success",
+                "message": f"An identical search for {character_name} is already in progress.",
+                "screenshot_id": search_id,
+                "processing_status": "PROCESSING"
+            }
         
         # 4. Instantly return a success to the user so their browser doesn't freeze
         return {
@@ -8,15 +8,143 @@ class Settings(BaseSettings):
     S3_BUCKET_NAME: str
     S3_ENDPOINT_URL: str | None = None
     S3_USE_SSL: bool = True
+    # Streaming multipart uploads (S3 requires every part except the last to be >= 5 MiB)
+    S3_MULTIPART_PART_SIZE_MB: int = 16
+    S3_MULTIPART_CONCURRENCY: int = 4
+    # HTTP connections kept by each process's boto3 client (at least STORAGE_IO_THREADS on the API)
+    S3_MAX_POOL_CONNECTIONS: int = 32
+    # Resumable uploads that see no chunk for this long are aborted and garbage-collected
+    UPLOAD_SESSION_TTL_HOURS: int = 24
     DATABASE_URL: str
+    # Connection pool of the sync engine, per process (every Celery worker child has its own)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    # The API's asyncio engine (defaults to DATABASE_URL with the asyncpg driver)
+    ASYNC_DATABASE_URL: str | None = None
+    ASYNC_DB_POOL_SIZE: int = 10
+    ASYNC_DB_MAX_OVERFLOW: int = 20
+    # Dedicated threads for the API's blocking boto3 calls, so storage I/O never queues behind other threadpool work
+    STORAGE_IO_THREADS: int = 32
     
+    # Presigned URL cache (reuses signed playback URLs until shortly before they expire)
+    PRESIGNED_URL_CACHE_MAX_ENTRIES: int = 10000
+    PRESIGNED_URL_CACHE_SAFETY_MARGIN_SECONDS: int = 300
+    PRESIGNED_URL_CACHE_REDIS_URL: str | None = None # Set to share the cache across API workers
+
     # Celery & Message Broker
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
+    # General-purpose Redis (caches, shared counters), kept apart from the broker database
+    REDIS_URL: str = "redis://localhost:6379/1"
+    
+    # Long tasks: the broker redelivers a task not acknowledged within this time, so it must outlive the longest search
+    CELERY_VISIBILITY_TIMEOUT_HOURS: int = 6
+    
+    # Search scheduling: queue by video cost, de-duplication and per-client fair share
+    SEARCH_SHORT_QUEUE: str = "search_short"
+    SEARCH_LONG_QUEUE: str = "search_long"
+    SEARCH_LONG_VIDEO_SECONDS: int = 900 # Longer videos (or larger files, when the duration is unknown) go to the long queue
+    SEARCH_LONG_VIDEO_MB: int = 1024
+    SEARCH_DEDUP_TTL_HOURS: int = 6
+    SEARCH_MAX_RUNNING_PER_CLIENT: int = 4 # 0 disables fair share
+    SEARCH_FAIR_SHARE_RETRY_SECONDS: int = 15
+    # Who a "client" is for fair share. Requests without a trusted identity are never capped.
+    SEARCH_CLIENT_ID_HEADER: str = "" # Header set by a trusted gateway/auth proxy, e.g. "X-Authenticated-User"
+    SEARCH_CLIENT_ID_FROM_IP: bool = False # Opt-in: fall back to the caller's IP address
+    SEARCH_TRUSTED_PROXY_COUNT: int = 0 # Reverse proxies in front of the API; > 0 reads the IP from X-Forwarded-For
+    
+    # Checkpointed searches: a retry resumes at the first incomplete stage; transient errors are retried with backoff
+    SEARCH_CHECKPOINT_TTL_HOURS: int = 24
+    SEARCH_MAX_RETRIES: int = 3
+    SEARCH_RETRY_BACKOFF_SECONDS: int = 30 # Doubles on every retry
+    
+    # Search batching: screenshots for the same video arriving within this window share one engine call
+    SEARCH_BATCH_WINDOW_SECONDS: float = 5.0 # 0 disables batching
+    SEARCH_BATCH_MAX_SIZE: int = 8
+    
+    # Segmented analysis: long videos are split into overlapping windows analyzed in parallel
+    SEGMENTED_ANALYSIS_ENABLED: bool = True
+    SEGMENTED_ANALYSIS_MIN_DURATION_SECONDS: int = 1200 # Only videos longer than this are split
+    SEGMENT_WINDOW_SECONDS: int = 600
+    SEGMENT_OVERLAP_SECONDS: int = 30
+    SEGMENT_MAX_RETRIES: int = 3
+    
+    # Scene index (computed once per video, used to align segment windows and snap moment timestamps)
+    SCENE_INDEX_ENABLED: bool = True
+    SCENE_DETECTION_FPS: float = 4.0
+    SCENE_DETECTION_THRESHOLD: float = 0.35
+    SCENE_MIN_LENGTH_SECONDS: float = 1.0
+    SCENE_SNAP_TOLERANCE_SECONDS: float = 2.0
+    
+    # Media probe at upload time: duration, resolution, codecs from the MP4 headers via ranged reads
+    MEDIA_PROBE_ENABLED: bool = True
+    MEDIA_PROBE_HEAD_KB: int = 64 # First read; covers the whole header of most faststart files
+    MEDIA_PROBE_MAX_HEADER_MB: int = 16 # Larger moov boxes are not read
+    
+    # Moments of one character closer than this are merged into a single moment on write
+    MOMENT_MERGE_GAP_SECONDS: float = 1.0
+    
+    # Worker-local video cache (shared by all worker processes on one machine)
+    WORKER_VIDEO_CACHE_ENABLED: bool = True
+    WORKER_VIDEO_CACHE_DIR: str = "/tmp/moment_finder_video_cache"
+    WORKER_VIDEO_CACHE_MAX_GB: float = 20.0
+    
+    # Analysis result cache (skips repeat engine calls for identical searches)
+    ANALYSIS_CACHE_ENABLED: bool = True
+    ANALYSIS_CACHE_TTL_HOURS: int = 168
+    
+    # Job progress pushed to clients over Server-Sent Events (Redis pub/sub)
+    JOB_PROGRESS_ENABLED: bool = True
+    JOB_PROGRESS_TTL_HOURS: int = 24
+    JOB_PROGRESS_HEARTBEAT_SECONDS: float = 15.0
+    
+    # Prometheus endpoint of each Celery worker node (0 disables it); the API serves /metrics itself
+    WORKER_METRICS_PORT: int = 9808
     
     # AI Engines
     ACTIVE_AI_ENGINE: str = "GEMINI"
     GEMINI_API_KEY: str = ""
     GEMINI_MODEL_NAME: str = "gemini-2.5-flash-lite"
+    # File API polling: exponential backoff between these bounds, with an overall deadline
+    GEMINI_POLL_INITIAL_SECONDS: float = 1.0
+    GEMINI_POLL_MAX_SECONDS: float = 15.0
+    GEMINI_PROCESSING_TIMEOUT_SECONDS: int = 1800
+    # GEMINI_ASYNC engine: how many analyses one worker process may drive concurrently
+    ASYNC_ENGINE_MAX_IN_FLIGHT: int = 50
+    # Reuse one Gemini File API upload per video across searches
+    GEMINI_FILE_REUSE_ENABLED: bool = True
+    GEMINI_FILE_EXPIRY_MARGIN_MINUTES: int = 60
+    # VECTOR engine (local CLIP frame embeddings, no API calls)
+    VECTOR_EMBEDDING_MODEL_PATH: str = "models/clip-vit-base-patch32-vision.onnx"
+    VECTOR_EMBEDDING_THREADS: int = 4
+    VECTOR_BATCH_SIZE: int = 32
+    VECTOR_SAMPLE_FPS: float = 1.0
+    VECTOR_MATCH_THRESHOLD: float = 0.75
+    VECTOR_MAX_GAP_SECONDS: float = 2.0
+    # Library-wide search (IVF index over pooled frame embeddings of every video, VECTOR engine only)
+    LIBRARY_INDEX_ENABLED: bool = True
+    LIBRARY_INDEX_DIR: str = "/tmp/moment_finder_library_index"
+    LIBRARY_INDEX_POOL_SECONDS: float = 4.0
+    LIBRARY_INDEX_NLIST: int = 256
+    LIBRARY_INDEX_NPROBE: int = 16
+    LIBRARY_INDEX_TRAIN_MIN_VECTORS: int = 20000
+    LIBRARY_INDEX_MAX_SEGMENTS: int = 16
+    LIBRARY_INDEX_REFRESH_SECONDS: float = 60.0
+    LIBRARY_INDEX_RETIRED_GRACE_SECONDS: float = 600.0 # Merged-away files are kept this long; must exceed the refresh interval
+    # Cluster-wide limits on engine calls (token bucket + max in-flight, per budget)
+    ENGINE_RATE_LIMIT_ENABLED: bool = True
+    ENGINE_UPLOAD_RATE_PER_SECOND: float = 2.0
+    ENGINE_UPLOAD_BURST: int = 5
+    ENGINE_UPLOAD_MAX_IN_FLIGHT: int = 8
+    ENGINE_POLL_RATE_PER_SECOND: float = 10.0
+    ENGINE_POLL_BURST: int = 20
+    ENGINE_POLL_MAX_IN_FLIGHT: int = 50
+    ENGINE_GENERATE_RATE_PER_SECOND: float = 0.25
+    ENGINE_GENERATE_BURST: int = 5
+    ENGINE_GENERATE_MAX_IN_FLIGHT: int = 10
+    # How long a call may queue for a slot, and how often a provider quota error (429) is retried
+    ENGINE_RATE_LIMIT_MAX_WAIT_SECONDS: int = 900
+    ENGINE_QUOTA_MAX_RETRIES: int = 5
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
@@ -0,0 +1,86 @@
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+
+# Prometheus metrics shared by the API and the workers.
+#
+# Set the PROMETHEUS_MULTIPROC_DIR environment variable (to an empty, writable directory, one per
+# host) for prefork Celery workers and multi-process uvicorn: every process then writes its samples
+# to files in that directory, and collect_metrics() aggregates them, so nothing recorded in a
+# short-lived worker child is lost.
+
+# Stages range from milliseconds (DB writes) to many minutes (Gemini processing long videos)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800)
+
+SEARCH_STAGE_SECONDS = Histogram(
+    "moment_finder_search_stage_seconds",
+    "Time spent in each stage of a character search task",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+ENGINE_STAGE_SECONDS = Histogram(
+    "moment_finder_engine_stage_seconds",
+    "Time spent in each stage of an AI engine call",
+    ["engine", "stage"],
+    buckets=STAGE_BUCKETS
+)
+STAGE_ERRORS = Counter(
+    "moment_finder_stage_errors_total",
+    "Stages that ended with an exception",
+    ["component", "stage"]
+)
+BYTES_TRANSFERRED = Counter(
+    "moment_finder_bytes_transferred_total",
+    "Bytes moved to and from object storage and AI engines",
+    ["target", "direction"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "moment_finder_http_request_duration_seconds",
+    "API request latency by route template",
+    ["method", "route", "status"]
+)
+
+@contextmanager
+def observe_stage(histogram: Histogram, component: str, stage: str, **labels):
+    """
+    Times the `with` block into `histogram` (labelled with `stage` and `labels`), and counts
+    it in STAGE_ERRORS when it raises.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(component=component, stage=stage).inc()
+        raise
+    finally:
+        histogram.labels(stage=stage, **labels).observe(time.perf_counter() - started)
+
+def count_bytes(target: str, direction: str, size_bytes: int) -> None:
+    BYTES_TRANSFERRED.labels(target=target, direction=direction).inc(size_bytes)
+
+def is_multiprocess() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+def metrics_registry():
+    """
+    The registry to export: the aggregate of every process in multiprocess mode, else this process's own.
+    """
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+def collect_metrics() -> tuple[bytes, str]:
+    """
+    Returns (body, content_type) in the Prometheus text exposition format.
+    """
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+def mark_process_dead(pid: int) -> None:
+    """
+    Lets the multiprocess collector drop the live-only samples of an exited process.
+    """
+    if is_multiprocess():
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,21 @@
+from functools import lru_cache
+import redis
+from app.core.config import settings
+
+@lru_cache
+def get_redis_client() -> redis.Redis:
+    """
+    Returns the shared Redis client (caches, counters, locks) for this process.
+    redis-py keeps its own connection pool and transparently resets it after a fork,
+    so it is safe to call this from both the API and the prefork Celery workers.
+    """
+    return redis.Redis.from_url(settings.REDIS_URL)
+
+@lru_cache
+def get_async_redis_client() -> "redis.asyncio.Redis":
+    """
+    Returns the shared asyncio Redis client of the API process, for work that waits on Redis
+    from the event loop (e.g. pub/sub subscriptions behind streaming responses).
+    """
+    import redis.asyncio
+    return redis.asyncio.Redis.from_url(settings.REDIS_URL)
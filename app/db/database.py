@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
@@ -7,7 +9,10 @@ from app.core.config import settings
 # and establishes a pool of active connections to the database server.
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_pre_ping=True  # This tells SQLAlchemy to constantly verify the connection is still alive before sending a query
+    pool_pre_ping=True,  # This tells SQLAlchemy to constantly verify the connection is still alive before sending a query
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS
 )
 
 # A SessionLocal instance is what we actually use to write data (like adding a new Video).
@@ -25,3 +30,32 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def async_database_url() -> str:
+    """
+    The connection string for the asyncio engine: ASYNC_DATABASE_URL when set, otherwise
+    DATABASE_URL with its driver swapped for asyncpg (same server, same credentials).
+    """
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    return make_url(settings.DATABASE_URL).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+# The API's request path talks to Postgres through this asyncio engine, so a request waiting on
+# the database yields the event loop instead of holding one of the threadpool's threads.
+# Nothing connects until the first query, so processes that never use it (the workers) pay nothing.
+async_engine = create_async_engine(
+    async_database_url(),
+    pool_pre_ping=True,
+    pool_size=settings.ASYNC_DB_POOL_SIZE,
+    max_overflow=settings.ASYNC_DB_MAX_OVERFLOW
+)
+
+# expire_on_commit=False: attributes stay readable after commit without another (awaited) round trip
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    """
+    The asyncio counterpart of get_db, for endpoints whose services await the database.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,5 +1,7 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.metrics import HTTP_REQUEST_SECONDS, collect_metrics
 
 # Initialize the FastAPI application
 app = FastAPI(
@@ -25,6 +27,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """
+    Records every request's latency, labelled with its route template (not the raw path,
+    which would create one time series per video ID).
+    """
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=str(status)
+        ).observe(time.perf_counter() - started)
+
 # Register routers
 app.include_router(video.router, prefix="/api")
 
@@ -35,3 +57,11 @@ def health_check():
     Health check endpoint to verify the API server is running successfully.
     """
     return {"status": "ok", "message": "Moment Finder AI API is operational"}
+
+@app.get("/metrics", tags=["System"], include_in_schema=False)
+def metrics():
+    """
+    Prometheus scrape endpoint (search stage timings, bytes transferred, errors, request latency).
+    """
+    body, content_type = collect_metrics()
+    return Response(content=body, media_type=content_type)
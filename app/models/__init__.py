@@ -1,3 +1,4 @@
 from .video_metadata import VideoMetadata, VideoStatus
 from .character_screenshot_metadata import CharacterScreenshotMetadata
 from .moment import CharacterMoment
+from .upload_session import UploadSession, UploadSessionStatus
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, ForeignKey, Float, Boolean
+from sqlalchemy import Column, String, DateTime, ForeignKey, Float, Boolean, Index, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.db.base import Base
@@ -20,10 +20,11 @@ class CharacterScreenshotMetadata(Base):
     character_name = Column(String, nullable=False) # e.g., "Thanos"
     screenshot_url = Column(String, nullable=False) # The MinIO url for the crop
     time_stamp = Column(Float, nullable=False) # What second in the video it was cropped
+    content_sha256 = Column(String(64), nullable=True) # Hex SHA-256 of the image, used to deduplicate uploads
     
     # AI Search Architecture
     is_processed = Column(Boolean, default=False) # True when we have generated vector embeddings for it
-    vector_id = Column(String, nullable=True) # The ID connecting it to ChromaDB / pgvector
+    vector_id = Column(String, nullable=True) # Storage key of its embedding (set by the VECTOR engine)
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -31,3 +32,23 @@ class CharacterScreenshotMetadata(Base):
     # Relationships
     video = relationship("VideoMetadata", back_populates="screenshots")
     moments = relationship("CharacterMoment", back_populates="character")
+
+def normalized_character_name(name):
+    """
+    Character names are compared trimmed and case-insensitively everywhere (screenshot dedup and
+    the moment search filter), through this one expression so both hit the indexes below.
+    """
+    return func.lower(func.trim(name))
+
+# Character filter of the moment search
+Index("ix_character_screenshot_metadata_lower_character_name", normalized_character_name(CharacterScreenshotMetadata.character_name))
+
+# The same crop submitted twice for the same video and character is stored (and analyzed) only once.
+# The character is part of the key: one crop can legitimately be searched under several names.
+Index(
+    "uq_character_screenshot_metadata_dedup",
+    CharacterScreenshotMetadata.video_id,
+    CharacterScreenshotMetadata.content_sha256,
+    normalized_character_name(CharacterScreenshotMetadata.character_name),
+    unique=True
+)
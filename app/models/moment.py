@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, ForeignKey, Float
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, ForeignKey, Float, Index, Computed, UniqueConstraint, func, literal_column
+from sqlalchemy.dialects.postgresql import UUID, NUMRANGE
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
@@ -10,6 +10,17 @@ class CharacterMoment(Base):
     Represents an actual AI discovery inside the video.
     """
     __tablename__ = "character_moments"
+    __table_args__ = (
+        # Text search over the action descriptions (see MomentSearchService and ACTION_TSVECTOR below)
+        Index("ix_character_moments_action_trgm", "action", postgresql_using="gin", postgresql_ops={"action": "gin_trgm_ops"}),
+        # Postgres doesn't index foreign keys by itself; the search filters on both
+        Index("ix_character_moments_video_id", "video_id"),
+        Index("ix_character_moments_character_id", "character_id"),
+        # Moments are stored normalized per character; this key makes re-saving a result a no-op
+        UniqueConstraint("character_id", "start_timestamp", "end_timestamp", name="uq_character_moments_character_id_start_end"),
+        # "Who is on screen between t1 and t2 in this video" (needs the btree_gist extension for video_id)
+        Index("ix_character_moments_video_id_time_range", "video_id", "time_range", postgresql_using="gist"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
@@ -21,6 +32,7 @@ class CharacterMoment(Base):
     action = Column(String, nullable=False) # e.g. "snapping fingers"
     start_timestamp = Column(Float, nullable=False) # In seconds
     end_timestamp = Column(Float, nullable=False) # In seconds
+    time_range = Column(NUMRANGE, Computed("numrange(start_timestamp::numeric, end_timestamp::numeric, '[]')", persisted=True)) # Maintained by Postgres
     
     confidence_score = Column(Float, nullable=False) # e.g. 0.98
     thumbnail_url = Column(String, nullable=True) # A visual thumbnail of the found moment
@@ -31,3 +43,9 @@ class CharacterMoment(Base):
     # Relationships
     video = relationship("VideoMetadata", back_populates="moments")
     character = relationship("CharacterScreenshotMetadata", back_populates="moments")
+
+# The full-text document of a moment's action. It is an expression index rather than a stored
+# column, so adding it never rewrote the table; queries must use this exact expression (with the
+# configuration inlined, not bound) for Postgres to match it against the index.
+ACTION_TSVECTOR = func.to_tsvector(literal_column("'english'::regconfig"), CharacterMoment.action)
+Index("ix_character_moments_action_tsv", ACTION_TSVECTOR, postgresql_using="gin")
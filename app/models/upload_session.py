@@ -0,0 +1,42 @@
+import uuid
+import enum
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Enum, BigInteger, Integer, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.base import Base
+
+class UploadSessionStatus(enum.Enum):
+    ACTIVE = "ACTIVE"
+    COMPLETED = "COMPLETED"
+    ABORTED = "ABORTED"
+
+class UploadSession(Base):
+    """
+    Tracks a resumable, chunked video upload.
+    Every session maps 1:1 onto an S3 multipart upload; the chunks themselves live in
+    S3 / MinIO as multipart parts, so this row only holds the bookkeeping.
+    """
+    __tablename__ = "upload_sessions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    # The file being uploaded
+    original_filename = Column(String, nullable=False)
+    content_type = Column(String, nullable=False)
+    total_size = Column(BigInteger, nullable=False) # Declared by the client up front, in bytes
+
+    # Chunking contract (chunk N covers bytes [(N-1) * chunk_size, N * chunk_size))
+    chunk_size = Column(BigInteger, nullable=False)
+    total_chunks = Column(Integer, nullable=False)
+
+    # The S3 multipart upload this session writes into
+    storage_key = Column(String, nullable=False, unique=True)
+    s3_upload_id = Column(String, nullable=False)
+
+    status = Column(Enum(UploadSessionStatus), default=UploadSessionStatus.ACTIVE, nullable=False)
+    # Set once the session is finalized, so repeated "complete" calls are idempotent
+    video_id = Column(UUID(as_uuid=True), ForeignKey("video_metadata.id"), nullable=True)
+
+    # Timestamps (updated_at doubles as "last activity" for garbage collection)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
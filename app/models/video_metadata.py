@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, DateTime, Enum, Float
+from sqlalchemy import Column, String, Integer, DateTime, Enum, Float, Index, LargeBinary, Boolean
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import enum
@@ -15,6 +15,11 @@ class VideoStatus(enum.Enum):
 
 class VideoMetadata(Base):
     __tablename__ = "video_metadata"
+    __table_args__ = (
+        # Keyset pagination indexes for the video listing (newest first, id as the tie-breaker)
+        Index("ix_video_metadata_created_at_id", "created_at", "id"),
+        Index("ix_video_metadata_status_created_at_id", "status", "created_at", "id"),
+    )
 
     # Primary Key
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -23,6 +28,16 @@ class VideoMetadata(Base):
     original_filename = Column(String, nullable=False)
     storage_key = Column(String, nullable=False, unique=True) # e.g. the MinIO object key
     duration_seconds = Column(Integer, nullable=True) # Useful for frontend progress bars
+    content_sha256 = Column(String(64), nullable=True, unique=True) # Hex SHA-256 of the file, used to deduplicate uploads
+    scene_boundaries = Column(LargeBinary, nullable=True) # Packed float32 scene cut timestamps, set by the EXTRACTING stage
+    
+    # Container-level media info, probed from the file's headers right after upload
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    video_codec = Column(String(16), nullable=True) # Sample entry fourcc, e.g. avc1, hvc1
+    audio_codec = Column(String(16), nullable=True)
+    bitrate = Column(Integer, nullable=True) # Average, bits per second
+    is_faststart = Column(Boolean, nullable=True) # moov before mdat: playable while still downloading
     
     # AI Tracking
     status = Column(Enum(VideoStatus), default=VideoStatus.PENDING, nullable=False)
@@ -0,0 +1 @@
+# Initialize schemas module
@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+
+class UploadSessionCreate(BaseModel):
+    """
+    Request body for starting a resumable upload.
+    """
+    filename: str = Field(description="The original name of the video file.")
+    content_type: str = Field(description="The MIME type of the video, e.g. 'video/mp4'.")
+    total_size: int = Field(gt=0, description="The exact size of the full file in bytes.")
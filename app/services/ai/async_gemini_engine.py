@@ -0,0 +1,224 @@
+import time
+import asyncio
+import json
+import logging
+from typing import List, Dict, Any, Tuple
+
+from app.services.ai.gemini_engine import (
+    GeminiAIEngine,
+    VideoAnalysisResultSchema,
+    BatchVideoAnalysisResultSchema,
+    build_character_prompt,
+    build_batch_prompt,
+    generation_config,
+    parse_batch_response,
+    polling_delays,
+)
+from app.services.ai.async_runtime import run_coroutine
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class AsyncGeminiAIEngine(GeminiAIEngine):
+    """
+    asyncio variant of the Gemini engine, built on the SDK's async client (`client.aio`).
+
+    Every network wait (uploads, PROCESSING polls, generate_content) is an `await`, so a single
+    worker process can drive dozens of analyses at once through the shared loop in async_runtime.
+    The blocking BaseAIEngine methods stay available and simply run the coroutines on that loop,
+    so the Celery tasks don't need to know which engine they are talking to.
+    """
+
+    # --- File handling ---
+
+    async def _wait_until_active_async(self, remote_file):
+        """
+        Polls the File API with exponential backoff until the upload is ACTIVE,
+        giving up after GEMINI_PROCESSING_TIMEOUT_SECONDS.
+        """
+        deadline = time.monotonic() + settings.GEMINI_PROCESSING_TIMEOUT_SECONDS
+        delays = polling_delays()
+        while remote_file.state.name == "PROCESSING":
+            delay = next(delays)
+            if time.monotonic() + delay > deadline:
+                raise TimeoutError(f"Gemini is still processing {remote_file.name} after {settings.GEMINI_PROCESSING_TIMEOUT_SECONDS}s.")
+            await asyncio.sleep(delay)
+            remote_file = await self.client.aio.files.get(name=remote_file.name)
+
+        if remote_file.state.name == "FAILED":
+            raise Exception("Gemini failed to process the uploaded video file.")
+        return remote_file
+
+    async def _get_registered_video_file_async(self, video_identity: str):
+        # The registry talks to Redis synchronously, so its calls are pushed off the loop
+        name = await asyncio.to_thread(self.file_registry.lookup, video_identity)
+        if not name:
+            return None
+
+        await asyncio.to_thread(self.file_registry.acquire, name)
+        try:
+            video_file = await self._wait_until_active_async(await self.client.aio.files.get(name=name))
+            logger.info(f"Reusing Gemini file {name} for this video (skipping upload).")
+            return video_file
+        except Exception as e:
+            logger.warning(f"Registered Gemini file {name} is no longer usable ({e}). Re-uploading...")
+            await asyncio.to_thread(self.file_registry.release, name, self._delete_remote_file)
+            await asyncio.to_thread(self.file_registry.evict, video_identity, self._delete_remote_file)
+            return None
+
+    async def _acquire_lock_async(self, lock) -> bool:
+        """
+        Waits for a registry lock without tying up a thread: every attempt is a non-blocking Redis
+        call and the waits between attempts are asyncio sleeps. A blocking acquire in to_thread would
+        hold one of the loop's few default-executor threads for up to the whole lock timeout, and
+        enough waiters would starve the lock holder's own registry calls.
+        """
+        deadline = time.monotonic() + lock.blocking_timeout
+        delays = polling_delays()
+        while not await asyncio.to_thread(lock.acquire, blocking=False):
+            delay = next(delays)
+            if time.monotonic() + delay > deadline:
+                return False
+            await asyncio.sleep(delay)
+        return True
+
+    async def _get_shared_video_file_async(self, video_file_path: str, video_identity: str):
+        video_file = await self._get_registered_video_file_async(video_identity)
+        if video_file:
+            return video_file
+
+        lock = self.file_registry.lock(video_identity)
+        if not await self._acquire_lock_async(lock):
+            raise TimeoutError(f"Timed out waiting for another worker to upload video {video_identity}.")
+        try:
+            # Another worker may have uploaded this video while we were waiting for the lock
+            video_file = await self._get_registered_video_file_async(video_identity)
+            if video_file:
+                return video_file
+
+            logger.info("Uploading video to Gemini File API (it will be reused by later searches)...")
+            video_file = await self._wait_until_active_async(await self.client.aio.files.upload(file=video_file_path))
+            await asyncio.to_thread(self.file_registry.acquire, video_file.name)
+            await asyncio.to_thread(
+                self.file_registry.register, video_identity, video_file.name, getattr(video_file, "expiration_time", None)
+            )
+            return video_file
+        finally:
+            await asyncio.to_thread(lock.release)
+
+    async def _acquire_video_file_async(self, video_file_path: str, video_identity: str | None):
+        if video_identity is not None and self.file_registry is not None:
+            return await self._get_shared_video_file_async(video_file_path, video_identity), True
+        return await self.client.aio.files.upload(file=video_file_path), False
+
+    async def _cleanup_async(self, video_file, shared_video: bool, img_files: list) -> None:
+        logger.info("Cleaning up temporary Gemini files...")
+        try:
+            if video_file and shared_video:
+                await asyncio.to_thread(self.file_registry.release, video_file.name, self._delete_remote_file)
+            elif video_file:
+                await self.client.aio.files.delete(name=video_file.name)
+            await asyncio.gather(*(self.client.aio.files.delete(name=f.name) for f in img_files))
+        except Exception as cleanup_error:
+            logger.error(f"Failed to delete files from Gemini: {cleanup_error}")
+
+    async def _upload_inputs_async(self, video_file_path: str, video_identity: str | None, image_paths: List[str]):
+        """
+        Acquires the video and uploads the reference images concurrently. If any of them fails,
+        the ones that did succeed are released before the first error is re-raised.
+        """
+        video_result, *image_results = await asyncio.gather(
+            self._acquire_video_file_async(video_file_path, video_identity),
+            *(self.client.aio.files.upload(file=path) for path in image_paths),
+            return_exceptions=True
+        )
+        img_files = [r for r in image_results if not isinstance(r, BaseException)]
+        errors = [r for r in (video_result, *image_results) if isinstance(r, BaseException)]
+        if errors:
+            video_file, shared_video = (None, False) if isinstance(video_result, BaseException) else video_result
+            await self._cleanup_async(video_file, shared_video, img_files)
+            raise errors[0]
+        video_file, shared_video = video_result
+        return video_file, shared_video, img_files
+
+    # --- Analysis ---
+
+    async def find_character_moments_async(self, video_file_path: str, screenshot_file_path: str, character_name: str, video_identity: str | None = None) -> List[Dict[str, Any]]:
+        """
+        Same contract as find_character_moments, without blocking a thread while waiting on Gemini.
+        """
+        logger.info(f"Uploading files to Gemini File API for {character_name}...")
+        video_file = None
+        img_files = []
+        shared_video = False
+
+        try:
+            # Upload the video and the reference image concurrently
+            video_file, shared_video, img_files = await self._upload_inputs_async(
+                video_file_path, video_identity, [screenshot_file_path]
+            )
+            img_file = img_files[0]
+
+            logger.info(f"Waiting for video {video_file.name} to process on Gemini servers...")
+            video_file = await self._wait_until_active_async(video_file)
+
+            logger.info("Files ready. Prompting Gemini...")
+            response = await self.client.aio.models.generate_content(
+                model=self.model_name,
+                contents=[img_file, video_file, build_character_prompt(character_name)],
+                config=generation_config(VideoAnalysisResultSchema)
+            )
+
+            data = json.loads(response.text)
+            logger.info(f"Gemini Analysis Successful. Found {len(data.get('moments', []))} moments.")
+            return data.get("moments", [])
+
+        except Exception as e:
+            logger.error(f"Error during Gemini Analysis: {e}")
+            raise e
+
+        finally:
+            await self._cleanup_async(video_file, shared_video, img_files)
+
+    async def find_multiple_character_moments_async(self, video_file_path: str, characters: List[Tuple[str, str]], video_identity: str | None = None) -> List[List[Dict[str, Any]]]:
+        """
+        Same contract as find_multiple_character_moments, without blocking a thread.
+        """
+        logger.info(f"Uploading files to Gemini File API for a batch of {len(characters)} characters...")
+        video_file = None
+        img_files = []
+        shared_video = False
+
+        try:
+            video_file, shared_video, img_files = await self._upload_inputs_async(
+                video_file_path, video_identity, [path for path, _ in characters]
+            )
+
+            logger.info(f"Waiting for video {video_file.name} to process on Gemini servers...")
+            video_file = await self._wait_until_active_async(video_file)
+
+            logger.info("Files ready. Prompting Gemini with the whole batch...")
+            response = await self.client.aio.models.generate_content(
+                model=self.model_name,
+                contents=[*img_files, video_file, build_batch_prompt([name for _, name in characters])],
+                config=generation_config(BatchVideoAnalysisResultSchema)
+            )
+
+            results = parse_batch_response(response.text, len(characters))
+            logger.info(f"Gemini Batch Analysis Successful. Found {sum(len(r) for r in results)} moments across {len(characters)} characters.")
+            return results
+
+        except Exception as e:
+            logger.error(f"Error during Gemini Batch Analysis: {e}")
+            raise e
+
+        finally:
+            await self._cleanup_async(video_file, shared_video, img_files)
+
+    # --- Blocking BaseAIEngine contract (used by the Celery tasks) ---
+
+    def find_character_moments(self, video_file_path: str, screenshot_file_path: str, character_name: str, video_identity: str | None = None) -> List[Dict[str, Any]]:
+        return run_coroutine(self.find_character_moments_async(video_file_path, screenshot_file_path, character_name, video_identity))
+
+    def find_multiple_character_moments(self, video_file_path: str, characters: List[Tuple[str, str]], video_identity: str | None = None) -> List[List[Dict[str, Any]]]:
+        return run_coroutine(self.find_multiple_character_moments_async(video_file_path, characters, video_identity))
@@ -0,0 +1,56 @@
+import os
+import asyncio
+import threading
+import logging
+from typing import Any, Coroutine
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# One asyncio event loop per worker process, running on a background thread.
+#
+# Run the worker with a thread pool (`celery -A app.worker.celery_app worker --pool=threads --concurrency=64`)
+# and every task thread hands its engine coroutine to this loop and waits. Dozens of analyses, which
+# spend nearly all their time waiting on the network, then share a single process instead of each
+# needing its own RAM-heavy prefork child.
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_pid: int | None = None
+_slots: asyncio.Semaphore | None = None
+_in_flight = 0
+_lock = threading.Lock()
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _loop_pid, _slots
+    with _lock:
+        # The pid check makes this fork-safe: a forked child starts its own loop thread
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _slots = asyncio.Semaphore(settings.ASYNC_ENGINE_MAX_IN_FLIGHT)
+            _loop_pid = os.getpid()
+            threading.Thread(target=_loop.run_forever, name="async-engine-loop", daemon=True).start()
+            logger.info(f"Started async engine event loop (max {settings.ASYNC_ENGINE_MAX_IN_FLIGHT} in-flight analyses).")
+        return _loop
+
+async def _run_limited(coro: Coroutine[Any, Any, Any]) -> Any:
+    global _in_flight
+    async with _slots:
+        _in_flight += 1
+        try:
+            return await coro
+        finally:
+            _in_flight -= 1
+
+def run_coroutine(coro: Coroutine[Any, Any, Any]) -> Any:
+    """
+    Runs `coro` on this process's shared event loop and blocks the calling thread until it finishes.
+    At most ASYNC_ENGINE_MAX_IN_FLIGHT coroutines run at once; the rest wait for a slot.
+    """
+    loop = _get_loop()
+    return asyncio.run_coroutine_threadsafe(_run_limited(coro), loop).result()
+
+def in_flight() -> int:
+    """
+    Number of analyses currently running on this process's loop.
+    """
+    return _in_flight
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 
 class BaseAIEngine(ABC):
     """
@@ -8,7 +8,7 @@ class BaseAIEngine(ABC):
     """
     
     @abstractmethod
-    def find_character_moments(self, video_file_path: str, screenshot_file_path: str, character_name: str) -> List[Dict[str, Any]]:
+    def find_character_moments(self, video_file_path: str, screenshot_file_path: str, character_name: str, video_identity: str | None = None) -> List[Dict[str, Any]]:
         """
         Analyzes a video to find moments where a specific character is present.
         
@@ -16,6 +16,8 @@ class BaseAIEngine(ABC):
             video_file_path (str): The local path to the video file to be analyzed.
             screenshot_file_path (str): The local path to the character reference image.
             character_name (str): The descriptive name of the character (e.g., "Viktor").
+            video_identity (str | None): A stable identifier of the video's content (e.g. "sha256:...").
+                Engines may use it to reuse per-video work (uploads, indexes) across searches.
             
         Returns:
             List[Dict[str, Any]]: A list of dictionaries representing the found moments.
@@ -30,3 +32,24 @@ class BaseAIEngine(ABC):
                 ]
         """
         pass
+
+    def find_multiple_character_moments(self, video_file_path: str, characters: List[Tuple[str, str]], video_identity: str | None = None) -> List[List[Dict[str, Any]]]:
+        """
+        Analyzes one video for several characters at once.
+        
+        Args:
+            video_file_path (str): The local path to the video file to be analyzed.
+            characters (List[Tuple[str, str]]): (screenshot_file_path, character_name) pairs.
+            video_identity (str | None): See find_character_moments.
+            
+        Returns:
+            List[List[Dict[str, Any]]]: One list of moments per entry in `characters`, in the same order,
+                each following the find_character_moments schema.
+        
+        The default implementation simply analyzes the characters one after another.
+        Engines that can look for several characters in one pass should override it.
+        """
+        return [
+            self.find_character_moments(video_file_path, screenshot_file_path, character_name, video_identity=video_identity)
+            for screenshot_file_path, character_name in characters
+        ]
@@ -1,26 +1,42 @@
 import logging
+from functools import lru_cache
 from app.services.ai.base import BaseAIEngine
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+@lru_cache
 def get_ai_engine() -> BaseAIEngine:
+    """
+    The AI engine of this process, built on first use and reused by every later task
+    (engines are stateless between calls, and their clients and models are expensive to build).
+    Worker children build it up front, see app.worker.lifecycle.
+    """
+    return create_ai_engine()
+
+def create_ai_engine() -> BaseAIEngine:
     """
     Factory function that dynamically loaded the chosen AI engine based on environment variables.
-    Currently only supports GEMINI, but acts as the single point of entry for future engines (like VECTOR).
+    Supports GEMINI, GEMINI_ASYNC and the local VECTOR engine, and acts as the single point of entry for future engines.
     """
     engine_name = settings.ACTIVE_AI_ENGINE.upper()
     
     if engine_name == "GEMINI":
         from app.services.ai.gemini_engine import GeminiAIEngine
+        from app.services.ai.rate_limiter import engine_rate_limiter
         logger.info("Initializing the Gemini 2.5 Flash-Lite UI Engine...")
-        return GeminiAIEngine()
+        return GeminiAIEngine(rate_limiter=engine_rate_limiter)
+        
+    elif engine_name == "GEMINI_ASYNC":
+        from app.services.ai.async_gemini_engine import AsyncGeminiAIEngine
+        from app.services.ai.rate_limiter import engine_rate_limiter
+        logger.info("Initializing the asyncio Gemini Engine...")
+        return AsyncGeminiAIEngine(rate_limiter=engine_rate_limiter)
         
     elif engine_name == "VECTOR":
-        # Placeholder for future Phase
-        # from app.services.ai.vector_engine import VectorAIEngine
-        # return VectorAIEngine()
-        raise NotImplementedError("Vector DB AI Engine is not yet implemented.")
+        from app.services.ai.vector_engine import VectorAIEngine
+        logger.info("Initializing the local Vector (frame embedding) Engine...")
+        return VectorAIEngine()
         
     else:
         logger.error(f"Unknown ACTIVE_AI_ENGINE configured in .env: {engine_name}")
@@ -2,13 +2,16 @@ import os
 import json
 import logging
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from google import genai
 from google.genai import types
 from pydantic import BaseModel, Field
 
 from app.services.ai.base import BaseAIEngine
+from app.services.ai.gemini_file_registry import GeminiFileRegistry
+from app.services.ai.rate_limiter import EngineRateLimiter, RateLimitedClient
 from app.core.config import settings
+from app.core.metrics import ENGINE_STAGE_SECONDS, observe_stage, count_bytes
 
 logger = logging.getLogger(__name__)
 
@@ -22,65 +25,221 @@ class CharacterMomentSchema(BaseModel):
 class VideoAnalysisResultSchema(BaseModel):
     moments: list[CharacterMomentSchema]
 
+class CharacterAnalysisResultSchema(BaseModel):
+    character_number: int = Field(description="The number of the reference image (starting at 1) showing this character.")
+    moments: list[CharacterMomentSchema]
+
+class BatchVideoAnalysisResultSchema(BaseModel):
+    characters: list[CharacterAnalysisResultSchema]
+
+# Prompt building and response parsing are shared by the blocking and the asyncio engine.
+
+def build_character_prompt(character_name: str) -> str:
+    return (
+        f"You are an expert video analysis AI. \n"
+        f"1. Look at the attached image. This character's name is '{character_name}'.\n"
+        f"2. Watch the attached video carefully.\n"
+        f"3. Find every distinct scene or moment where '{character_name}' is clearly visible.\n"
+        f"4. Return a list of those moments, including the start and end timestamps (in seconds), "
+        f"a brief description of what they are doing, and your confidence score."
+    )
+
+def build_batch_prompt(character_names: List[str]) -> str:
+    # Tell the model which numbered image is which character
+    character_lines = "".join(
+        f"   - Image {number} shows the character '{name}'.\n"
+        for number, name in enumerate(character_names, start=1)
+    )
+    return (
+        f"You are an expert video analysis AI. \n"
+        f"1. Look at the {len(character_names)} attached reference images, in order:\n"
+        f"{character_lines}"
+        f"2. Watch the attached video carefully.\n"
+        f"3. For EACH character, find every distinct scene or moment where they are clearly visible.\n"
+        f"4. Return one entry per character (identified by its image number) with a list of those moments, "
+        f"including the start and end timestamps (in seconds), a brief description of what they are doing, "
+        f"and your confidence score."
+    )
+
+def generation_config(response_schema: type[BaseModel]) -> types.GenerateContentConfig:
+    # Structured Outputs guarantee we get back JSON matching our DB schema
+    return types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=response_schema,
+        temperature=0.2 # Keep it analytical, not creative
+    )
+
+def parse_batch_response(raw_json: str, character_count: int) -> List[List[Dict[str, Any]]]:
+    # Map the results back onto the input order (characters the model skipped get no moments)
+    data = json.loads(raw_json)
+    results: List[List[Dict[str, Any]]] = [[] for _ in range(character_count)]
+    for entry in data.get("characters", []):
+        index = entry.get("character_number", 0) - 1
+        if 0 <= index < character_count:
+            results[index].extend(entry.get("moments", []))
+    return results
+
+def polling_delays():
+    """
+    Exponential backoff for File API polling: short videos are picked up within a second,
+    long ones don't get hammered with a request every 2 seconds for minutes.
+    """
+    delay = settings.GEMINI_POLL_INITIAL_SECONDS
+    while True:
+        yield delay
+        delay = min(delay * 1.5, settings.GEMINI_POLL_MAX_SECONDS)
+
 class GeminiAIEngine(BaseAIEngine):
     """
     Concrete implementation of the AI Engine using Google's Gemini 2.5 Flash-Lite.
     Uses the modern google-genai SDK.
     """
     
-    def __init__(self):
-        if not settings.GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY is not set in the environment variables.")
-            
-        # Initialize the new SDK client
-        self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
+    def __init__(self, client: genai.Client | None = None, file_registry: GeminiFileRegistry | None = None,
+                 rate_limiter: EngineRateLimiter | None = None):
+        # The client, registry and limiter can be injected (e.g. a fake genai.Client and fakeredis in tests)
+        if client is None:
+            if not settings.GEMINI_API_KEY:
+                raise ValueError("GEMINI_API_KEY is not set in the environment variables.")
+            # Initialize the new SDK client
+            client = genai.Client(api_key=settings.GEMINI_API_KEY)
+        if rate_limiter is not None:
+            # Every upload, poll and generate_content call now queues for a cluster-wide slot
+            client = RateLimitedClient(client, rate_limiter)
+        self.client = client
         # Load the dynamic model name from environment variables (e.g. gemini-1.5-pro or gemini-2.5-flash-lite)
         self.model_name = settings.GEMINI_MODEL_NAME
+
+        # Shared registry of already uploaded videos, so repeat searches skip the upload entirely
+        if file_registry is None and settings.GEMINI_FILE_REUSE_ENABLED:
+            from app.core.redis import get_redis_client
+            file_registry = GeminiFileRegistry(get_redis_client(), settings.GEMINI_FILE_EXPIRY_MARGIN_MINUTES * 60)
+        self.file_registry = file_registry
+
+    def _stage(self, stage: str):
+        return observe_stage(ENGINE_STAGE_SECONDS, "gemini", stage, engine="gemini")
+
+    def _upload(self, file_path: str):
+        """
+        Uploads one local file to the File API, recording its duration and size.
+        """
+        with self._stage("upload"):
+            remote_file = self.client.files.upload(file=file_path)
+        count_bytes("gemini", "upload", os.path.getsize(file_path))
+        return remote_file
+
+    def _wait_until_active(self, remote_file):
+        """
+        Polls the File API (with backoff) until Google has finished processing the upload,
+        giving up after GEMINI_PROCESSING_TIMEOUT_SECONDS.
+        """
+        with self._stage("processing_wait"):
+            return self._poll_until_active(remote_file)
+
+    def _poll_until_active(self, remote_file):
+        deadline = time.monotonic() + settings.GEMINI_PROCESSING_TIMEOUT_SECONDS
+        delays = polling_delays()
+        while remote_file.state.name == "PROCESSING":
+            delay = next(delays)
+            if time.monotonic() + delay > deadline:
+                raise TimeoutError(f"Gemini is still processing {remote_file.name} after {settings.GEMINI_PROCESSING_TIMEOUT_SECONDS}s.")
+            time.sleep(delay)
+            remote_file = self.client.files.get(name=remote_file.name)
+            
+        if remote_file.state.name == "FAILED":
+            raise Exception("Gemini failed to process the uploaded video file.")
+        return remote_file
+
+    def _delete_remote_file(self, name: str) -> None:
+        self.client.files.delete(name=name)
+
+    def _get_registered_video_file(self, video_identity: str):
+        """
+        Returns the already uploaded remote file for this video (acquired), or None if there
+        is none or it is no longer usable.
+        """
+        name = self.file_registry.lookup(video_identity)
+        if not name:
+            return None
+
+        self.file_registry.acquire(name)
+        try:
+            video_file = self._wait_until_active(self.client.files.get(name=name))
+            logger.info(f"Reusing Gemini file {name} for this video (skipping upload).")
+            return video_file
+        except Exception as e:
+            logger.warning(f"Registered Gemini file {name} is no longer usable ({e}). Re-uploading...")
+            self.file_registry.release(name, self._delete_remote_file)
+            self.file_registry.evict(video_identity, self._delete_remote_file)
+            return None
+
+    def _get_shared_video_file(self, video_file_path: str, video_identity: str):
+        """
+        Returns an ACTIVE remote file for the video, uploading it only if no live upload exists.
+        The returned file is acquired and must be released by the caller.
+        """
+        video_file = self._get_registered_video_file(video_identity)
+        if video_file:
+            return video_file
+
+        with self.file_registry.lock(video_identity):
+            # Another worker may have uploaded this video while we were waiting for the lock
+            video_file = self._get_registered_video_file(video_identity)
+            if video_file:
+                return video_file
+
+            logger.info("Uploading video to Gemini File API (it will be reused by later searches)...")
+            video_file = self._wait_until_active(self._upload(video_file_path))
+            self.file_registry.acquire(video_file.name)
+            self.file_registry.register(video_identity, video_file.name, getattr(video_file, "expiration_time", None))
+            return video_file
         
-    def find_character_moments(self, video_file_path: str, screenshot_file_path: str, character_name: str) -> List[Dict[str, Any]]:
+    def _acquire_video_file(self, video_file_path: str, video_identity: str | None):
+        """
+        Returns (remote_video_file, is_shared). Shared files come from the registry and must be
+        released with _release_video_file; unshared ones are uploaded just for this call.
+        """
+        if video_identity is not None and self.file_registry is not None:
+            return self._get_shared_video_file(video_file_path, video_identity), True
+        return self._upload(video_file_path), False
+
+    def _release_video_file(self, video_file, shared: bool) -> None:
+        if shared:
+            self.file_registry.release(video_file.name, self._delete_remote_file)
+        else:
+            self.client.files.delete(name=video_file.name)
+
+    def find_character_moments(self, video_file_path: str, screenshot_file_path: str, character_name: str, video_identity: str | None = None) -> List[Dict[str, Any]]:
         """
         Uploads physical files to the Gemini File API, prompts the model, and parses the structured response.
+        When a `video_identity` is given, the video upload is shared with every other search on the same video.
         """
         logger.info(f"Uploading files to Gemini File API for {character_name}...")
         video_file = None
         img_file = None
+        shared_video = False
         
         try:
-            # 1. Upload the files to Google's temporary storage server
-            video_file = self.client.files.upload(file=video_file_path)
-            img_file = self.client.files.upload(file=screenshot_file_path)
+            # 1. Upload the files to Google's temporary storage server (or reuse the live video upload)
+            video_file, shared_video = self._acquire_video_file(video_file_path, video_identity)
+            img_file = self._upload(screenshot_file_path)
             
             # Wait for video to process in Google's system before prompting
             logger.info(f"Waiting for video {video_file.name} to process on Gemini servers...")
-            while video_file.state.name == "PROCESSING":
-                time.sleep(2)
-                video_file = self.client.files.get(name=video_file.name)
-                
-            if video_file.state.name == "FAILED":
-                raise Exception("Gemini failed to process the uploaded video file.")
+            video_file = self._wait_until_active(video_file)
                 
             logger.info("Files ready. Prompting Gemini...")
             
             # 2. Formulate the highly specific prompt
-            prompt = (
-                f"You are an expert video analysis AI. \n"
-                f"1. Look at the attached image. This character's name is '{character_name}'.\n"
-                f"2. Watch the attached video carefully.\n"
-                f"3. Find every distinct scene or moment where '{character_name}' is clearly visible.\n"
-                f"4. Return a list of those moments, including the start and end timestamps (in seconds), "
-                f"a brief description of what they are doing, and your confidence score."
-            )
+            prompt = build_character_prompt(character_name)
             
             # 3. Call the model using Structured Outputs to guarantee we get back JSON matching our DB schema
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=[img_file, video_file, prompt],
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    response_schema=VideoAnalysisResultSchema,
-                    temperature=0.2 # Keep it analytical, not creative
+            with self._stage("generate_content"):
+                response = self.client.models.generate_content(
+                    model=self.model_name,
+                    contents=[img_file, video_file, prompt],
+                    config=generation_config(VideoAnalysisResultSchema)
                 )
-            )
             
             # 4. Parse the guaranteed JSON text back into a Python dictionary list
             raw_json = response.text
@@ -94,12 +253,69 @@ class GeminiAIEngine(BaseAIEngine):
             raise e
             
         finally:
-            # 5. Cleanup: ALWAYS delete the files from Google's servers to save space and maintain privacy
+            # 5. Cleanup: ALWAYS delete the per-search files from Google's servers to save space and maintain privacy.
+            # A shared video upload is only released here; the registry deletes it once nobody uses it.
+            logger.info("Cleaning up temporary Gemini files...")
+            try:
+                with self._stage("cleanup"):
+                    if video_file:
+                        self._release_video_file(video_file, shared_video)
+                    if img_file:
+                        self.client.files.delete(name=img_file.name)
+            except Exception as cleanup_error:
+                logger.error(f"Failed to delete files from Gemini: {cleanup_error}")
+
+    def find_multiple_character_moments(self, video_file_path: str, characters: List[Tuple[str, str]], video_identity: str | None = None) -> List[List[Dict[str, Any]]]:
+        """
+        Looks for several characters in one video with a single upload and a single prompt.
+        Each reference image is numbered, and the model reports the moments per image number.
+        """
+        names = ", ".join(name for _, name in characters)
+        logger.info(f"Uploading files to Gemini File API for a batch of {len(characters)} characters ({names})...")
+        video_file = None
+        img_files = []
+        shared_video = False
+
+        try:
+            # 1. Upload (or reuse) the video once, plus one reference image per character
+            video_file, shared_video = self._acquire_video_file(video_file_path, video_identity)
+            for screenshot_file_path, _ in characters:
+                img_files.append(self._upload(screenshot_file_path))
+
+            logger.info(f"Waiting for video {video_file.name} to process on Gemini servers...")
+            video_file = self._wait_until_active(video_file)
+
+            logger.info("Files ready. Prompting Gemini with the whole batch...")
+
+            # 2. Tell the model which numbered image is which character
+            prompt = build_batch_prompt([name for _, name in characters])
+
+            # 3. One structured call for every character
+            with self._stage("generate_content"):
+                response = self.client.models.generate_content(
+                    model=self.model_name,
+                    contents=[*img_files, video_file, prompt],
+                    config=generation_config(BatchVideoAnalysisResultSchema)
+                )
+
+            # 4. Map the results back onto the input order
+            results = parse_batch_response(response.text, len(characters))
+
+            logger.info(f"Gemini Batch Analysis Successful. Found {sum(len(r) for r in results)} moments across {len(characters)} characters.")
+            return results
+
+        except Exception as e:
+            logger.error(f"Error during Gemini Batch Analysis: {e}")
+            raise e
+
+        finally:
+            # 5. Cleanup, exactly like the single-character path
             logger.info("Cleaning up temporary Gemini files...")
             try:
-                if video_file:
-                    self.client.files.delete(name=video_file.name)
-                if img_file:
-                    self.client.files.delete(name=img_file.name)
+                with self._stage("cleanup"):
+                    if video_file:
+                        self._release_video_file(video_file, shared_video)
+                    for img_file in img_files:
+                        self.client.files.delete(name=img_file.name)
             except Exception as cleanup_error:
                 logger.error(f"Failed to delete files from Gemini: {cleanup_error}")
@@ -0,0 +1,103 @@
+import time
+import logging
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+class GeminiFileRegistry:
+    """
+    Remembers which video is already uploaded to the Gemini File API, so every search on the
+    same video can reuse one remote file instead of re-uploading (and re-waiting for PROCESSING).
+
+    State lives in Redis so every worker shares it:
+    - gemini_file:video:{identity}  -> the live remote file name (expires shortly before Gemini deletes it)
+    - gemini_file:refs:{name}       -> how many analyses are currently using that remote file
+    - gemini_file:doomed:{name}     -> set when the file was evicted while still in use
+
+    Remote files are never deleted per call. They either expire on Gemini's side, or are deleted
+    by `evict()` once nobody references them (the last `release()` performs a deferred delete).
+    """
+
+    KEY_PREFIX = "gemini_file"
+    # Gemini keeps uploaded files for 48 hours; used when the SDK doesn't report an expiry
+    DEFAULT_FILE_LIFETIME_SECONDS = 48 * 3600
+
+    def __init__(self, redis_client, expiry_margin_seconds: int = 3600):
+        self.redis = redis_client
+        self.expiry_margin_seconds = expiry_margin_seconds
+
+    def _video_key(self, identity: str) -> str:
+        return f"{self.KEY_PREFIX}:video:{identity}"
+
+    def _refs_key(self, file_name: str) -> str:
+        return f"{self.KEY_PREFIX}:refs:{file_name}"
+
+    def _doomed_key(self, file_name: str) -> str:
+        return f"{self.KEY_PREFIX}:doomed:{file_name}"
+
+    def lookup(self, identity: str) -> str | None:
+        """
+        Returns the remote file name registered for this video, if it is not about to expire.
+        """
+        value = self.redis.get(self._video_key(identity))
+        return value.decode() if value is not None else None
+
+    def register(self, identity: str, file_name: str, expiration_time: datetime | None = None) -> None:
+        """
+        Records a freshly uploaded (ACTIVE) remote file for this video.
+        The registry entry disappears `expiry_margin_seconds` before the remote file expires,
+        so we never hand out a file that could vanish mid-analysis.
+        """
+        if expiration_time is not None:
+            expires_at = expiration_time.replace(tzinfo=expiration_time.tzinfo or timezone.utc).timestamp()
+        else:
+            expires_at = time.time() + self.DEFAULT_FILE_LIFETIME_SECONDS
+        ttl = int(expires_at - time.time() - self.expiry_margin_seconds)
+        if ttl <= 0:
+            return
+        self.redis.set(self._video_key(identity), file_name, ex=ttl)
+
+    def lock(self, identity: str, timeout: int = 1800):
+        """
+        A cluster-wide lock so two workers never upload the same video at the same time.
+        """
+        # thread_local=False so the asyncio engine can acquire and release it from different threads
+        return self.redis.lock(f"{self.KEY_PREFIX}:lock:{identity}", timeout=timeout, blocking_timeout=timeout, thread_local=False)
+
+    def acquire(self, file_name: str) -> None:
+        """
+        Marks a remote file as in use by one more analysis.
+        """
+        self.redis.incr(self._refs_key(file_name))
+
+    def release(self, file_name: str, delete_file) -> None:
+        """
+        Marks a remote file as no longer used by one analysis.
+        If it was evicted in the meantime and this was the last user, `delete_file(name)` is called.
+        """
+        remaining = self.redis.decr(self._refs_key(file_name))
+        if remaining <= 0:
+            self.redis.delete(self._refs_key(file_name))
+            if self.redis.delete(self._doomed_key(file_name)):
+                self._delete_remote(file_name, delete_file)
+
+    def evict(self, identity: str, delete_file) -> None:
+        """
+        Forgets the remote file for this video (e.g. it failed or turned out to be gone) and deletes it,
+        deferring the delete until the last in-flight analysis releases it.
+        """
+        file_name = self.lookup(identity)
+        self.redis.delete(self._video_key(identity))
+        if file_name is None:
+            return
+        if int(self.redis.get(self._refs_key(file_name)) or 0) > 0:
+            self.redis.set(self._doomed_key(file_name), 1, ex=self.DEFAULT_FILE_LIFETIME_SECONDS)
+        else:
+            self._delete_remote(file_name, delete_file)
+
+    @staticmethod
+    def _delete_remote(file_name: str, delete_file) -> None:
+        try:
+            delete_file(file_name)
+        except Exception as e:
+            logger.error(f"Failed to delete Gemini file {file_name}: {e}")
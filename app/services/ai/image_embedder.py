@@ -0,0 +1,43 @@
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class OnnxImageEmbedder:
+    """
+    Computes CLIP-style image embeddings on the CPU with ONNX Runtime.
+
+    Expects the vision tower of a CLIP model exported to ONNX, taking (n, 3, 224, 224) float32
+    pixel values and returning one embedding per image (an `image_embeds` output when there is one,
+    otherwise the first output). Embeddings are L2-normalized, so a dot product is a cosine similarity.
+    """
+
+    INPUT_SIZE = 224
+    # CLIP's preprocessing constants
+    MEAN = np.array([0.48145466, 0.4578275, 0.40821073], dtype=np.float32)
+    STD = np.array([0.26862954, 0.26130258, 0.27577711], dtype=np.float32)
+
+    def __init__(self, model_path: str, threads: int = 4):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The VECTOR engine requires `onnxruntime` (pip install onnxruntime).") from e
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        output_names = [output.name for output in self.session.get_outputs()]
+        self.output_name = "image_embeds" if "image_embeds" in output_names else output_names[0]
+        logger.info(f"Loaded image embedding model {model_path} ({self.output_name}).")
+
+    def embed(self, frames: np.ndarray) -> np.ndarray:
+        """
+        Embeds a (n, INPUT_SIZE * INPUT_SIZE, 3) uint8 block of RGB frames into (n, d) unit vectors.
+        """
+        pixels = frames.reshape(-1, self.INPUT_SIZE, self.INPUT_SIZE, 3).astype(np.float32) / 255.0
+        pixels = ((pixels - self.MEAN) / self.STD).transpose(0, 3, 1, 2)
+        embeddings = self.session.run([self.output_name], {self.input_name: np.ascontiguousarray(pixels)})[0]
+        embeddings = embeddings.reshape(len(frames), -1).astype(np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
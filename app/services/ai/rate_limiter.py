@@ -0,0 +1,315 @@
+import time
+import uuid
+import random
+import asyncio
+import logging
+from contextlib import contextmanager, asynccontextmanager
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, AsyncIterator
+from app.core.config import settings
+from app.core.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class Budget:
+    rate_per_second: float
+    burst: int
+    max_in_flight: int
+
+class RateLimitTimeout(TimeoutError):
+    """
+    Raised when a call has queued for longer than the limiter's max wait.
+    """
+
+# Atomically: drop expired leases, check for a free in-flight slot, refill the bucket and take a token.
+# A token is only consumed when a slot is free too, so a full semaphore never burns rate budget.
+# Returns {granted, seconds_to_wait}.
+_ACQUIRE_SCRIPT = """
+local bucket_key, leases_key = KEYS[1], KEYS[2]
+local rate, burst, max_in_flight = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local lease_id, lease_seconds = ARGV[4], tonumber(ARGV[5])
+
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+redis.call('ZREMRANGEBYSCORE', leases_key, '-inf', now)
+if redis.call('ZCARD', leases_key) >= max_in_flight then
+    return {0, '0.5'}
+end
+
+local state = redis.call('HMGET', bucket_key, 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+
+local granted, wait = 0, 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    granted = 1
+    redis.call('ZADD', leases_key, now + lease_seconds, lease_id)
+    redis.call('EXPIRE', leases_key, math.ceil(lease_seconds) + 60)
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', bucket_key, 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', bucket_key, math.ceil(burst / rate) + 60)
+return {granted, tostring(wait)}
+"""
+
+def is_quota_error(error: Exception) -> bool:
+    """
+    True for provider-side rate limiting (HTTP 429 / RESOURCE_EXHAUSTED), which is worth waiting out.
+    """
+    return getattr(error, "code", None) == 429 or "RESOURCE_EXHAUSTED" in str(error)
+
+class EngineRateLimiter:
+    """
+    Cluster-wide rate limiter and concurrency governor for AI engine calls.
+
+    Every budget (e.g. "upload", "poll", "generate") has a token bucket (`rate_per_second`,
+    refilling up to `burst`) and a semaphore of `max_in_flight` leases, both kept in Redis so every
+    worker shares them. Leases expire after `lease_seconds`, so a crashed worker can't leak a slot.
+
+    Calls that can't get a slot queue with jittered backoff instead of failing, and provider quota
+    errors (429) are retried the same way; only waiting longer than `max_wait_seconds` raises.
+    """
+
+    KEY_PREFIX = "engine_limit"
+
+    def __init__(self, redis_client, budgets: Dict[str, Budget], enabled: bool = True,
+                 max_wait_seconds: float = 900, quota_max_retries: int = 5, lease_seconds: float = 1800):
+        self.redis = redis_client
+        self.budgets = budgets
+        self.enabled = enabled
+        self.max_wait_seconds = max_wait_seconds
+        self.quota_max_retries = quota_max_retries
+        self.lease_seconds = lease_seconds
+        self._acquire_script = redis_client.register_script(_ACQUIRE_SCRIPT)
+
+    def _key(self, budget_name: str, kind: str) -> str:
+        return f"{self.KEY_PREFIX}:{budget_name}:{kind}"
+
+    # --- Slots ---
+
+    def try_acquire(self, budget_name: str) -> tuple[str | None, float]:
+        """
+        One non-blocking attempt. Returns (lease_id, 0) when granted, else (None, seconds_to_wait).
+        """
+        budget = self.budgets[budget_name]
+        lease_id = uuid.uuid4().hex
+        granted, wait = self._acquire_script(
+            keys=[self._key(budget_name, "bucket"), self._key(budget_name, "leases")],
+            args=[budget.rate_per_second, budget.burst, budget.max_in_flight, lease_id, self.lease_seconds]
+        )
+        return (lease_id, 0.0) if int(granted) else (None, float(wait))
+
+    def release(self, budget_name: str, lease_id: str) -> None:
+        try:
+            self.redis.zrem(self._key(budget_name, "leases"), lease_id)
+        except Exception as e:
+            logger.error(f"Failed to release engine slot {budget_name}/{lease_id}: {e}")
+
+    def _next_delay(self, attempt: int, suggested: float) -> float:
+        # Exponential backoff with full jitter, never shorter than what the bucket told us to wait
+        backoff = min(0.25 * 2 ** attempt, 10.0)
+        return max(suggested, random.uniform(backoff / 2, backoff))
+
+    def _record_wait(self, budget_name: str, waited: float) -> None:
+        if waited <= 0:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.incr(self._key(budget_name, "throttled"))
+            pipe.incrbyfloat(self._key(budget_name, "waited_seconds"), round(waited, 3))
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to record engine limiter metrics: {e}")
+
+    @contextmanager
+    def limit(self, budget_name: str) -> Iterator[None]:
+        """
+        Blocks until the budget grants a slot, and holds it for the duration of the `with` block.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        started = time.monotonic()
+        attempt = 0
+        self.redis.incr(self._key(budget_name, "waiting"))
+        try:
+            while True:
+                lease_id, suggested = self.try_acquire(budget_name)
+                if lease_id:
+                    break
+                delay = self._next_delay(attempt, suggested)
+                if time.monotonic() - started + delay > self.max_wait_seconds:
+                    raise RateLimitTimeout(f"No '{budget_name}' engine slot within {self.max_wait_seconds}s.")
+                time.sleep(delay)
+                attempt += 1
+        finally:
+            self.redis.decr(self._key(budget_name, "waiting"))
+        self._record_wait(budget_name, time.monotonic() - started if attempt else 0.0)
+
+        try:
+            yield
+        finally:
+            self.release(budget_name, lease_id)
+
+    @asynccontextmanager
+    async def limit_async(self, budget_name: str) -> AsyncIterator[None]:
+        """
+        Same as `limit()`, but waits with asyncio.sleep so the event loop keeps running other analyses.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        started = time.monotonic()
+        attempt = 0
+        await asyncio.to_thread(self.redis.incr, self._key(budget_name, "waiting"))
+        try:
+            while True:
+                lease_id, suggested = await asyncio.to_thread(self.try_acquire, budget_name)
+                if lease_id:
+                    break
+                delay = self._next_delay(attempt, suggested)
+                if time.monotonic() - started + delay > self.max_wait_seconds:
+                    raise RateLimitTimeout(f"No '{budget_name}' engine slot within {self.max_wait_seconds}s.")
+                await asyncio.sleep(delay)
+                attempt += 1
+        finally:
+            await asyncio.to_thread(self.redis.decr, self._key(budget_name, "waiting"))
+        await asyncio.to_thread(self._record_wait, budget_name, time.monotonic() - started if attempt else 0.0)
+
+        try:
+            yield
+        finally:
+            await asyncio.to_thread(self.release, budget_name, lease_id)
+
+    # --- Calls ---
+
+    def call(self, budget_name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Runs `fn` inside the budget, retrying provider quota errors with backoff.
+        """
+        for attempt in range(self.quota_max_retries + 1):
+            try:
+                with self.limit(budget_name):
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                if not self.enabled or not is_quota_error(e) or attempt == self.quota_max_retries:
+                    raise
+                delay = self._next_delay(attempt + 2, 0.0)
+                logger.warning(f"Engine quota hit on '{budget_name}' ({e}). Retrying in {delay:.1f}s...")
+                time.sleep(delay)
+
+    async def call_async(self, budget_name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        for attempt in range(self.quota_max_retries + 1):
+            try:
+                async with self.limit_async(budget_name):
+                    return await fn(*args, **kwargs)
+            except Exception as e:
+                if not self.enabled or not is_quota_error(e) or attempt == self.quota_max_retries:
+                    raise
+                delay = self._next_delay(attempt + 2, 0.0)
+                logger.warning(f"Engine quota hit on '{budget_name}' ({e}). Retrying in {delay:.1f}s...")
+                await asyncio.sleep(delay)
+
+    # --- Metrics ---
+
+    def stats(self) -> dict:
+        """
+        Current utilization of every budget across the cluster.
+        """
+        now = time.time()
+        result = {"enabled": self.enabled, "budgets": {}}
+        for name, budget in self.budgets.items():
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zcount(self._key(name, "leases"), now, "+inf")
+            pipe.hmget(self._key(name, "bucket"), "tokens", "updated_at")
+            pipe.get(self._key(name, "waiting"))
+            pipe.get(self._key(name, "throttled"))
+            pipe.get(self._key(name, "waited_seconds"))
+            in_flight, (tokens, updated_at), waiting, throttled, waited = pipe.execute()
+
+            if tokens is None:
+                tokens_available = float(budget.burst)
+            else:
+                refill = max(0.0, now - float(updated_at)) * budget.rate_per_second
+                tokens_available = min(float(budget.burst), float(tokens) + refill)
+
+            result["budgets"][name] = {
+                "rate_per_second": budget.rate_per_second,
+                "burst": budget.burst,
+                "tokens_available": round(tokens_available, 2),
+                "max_in_flight": budget.max_in_flight,
+                "in_flight": in_flight,
+                "utilization": round(in_flight / budget.max_in_flight, 4) if budget.max_in_flight else 0.0,
+                "waiting": max(int(waiting or 0), 0),
+                "throttled_calls": int(throttled or 0),
+                "waited_seconds": round(float(waited or 0), 3)
+            }
+        return result
+
+class _LimitedNamespace:
+    """
+    Proxies an SDK namespace (e.g. `client.files`), routing the listed methods through a budget.
+    """
+
+    def __init__(self, target, limiter: EngineRateLimiter, budgets: Dict[str, str], is_async: bool = False):
+        self._target = target
+        self._limiter = limiter
+        self._budgets = budgets
+        self._is_async = is_async
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._target, name)
+        budget_name = self._budgets.get(name)
+        if budget_name is None:
+            return attr
+        call = self._limiter.call_async if self._is_async else self._limiter.call
+        return partial(call, budget_name, attr)
+
+# Which SDK calls draw from which budget
+FILE_BUDGETS = {"upload": "upload", "get": "poll", "delete": "poll"}
+MODEL_BUDGETS = {"generate_content": "generate"}
+
+class RateLimitedClient:
+    """
+    Wraps a genai.Client so every File API and generate_content call (sync and `.aio`) goes through
+    the limiter. The engines use it exactly like the real client.
+    """
+
+    def __init__(self, client, limiter: EngineRateLimiter):
+        self._client = client
+        self.files = _LimitedNamespace(client.files, limiter, FILE_BUDGETS)
+        self.models = _LimitedNamespace(client.models, limiter, MODEL_BUDGETS)
+        self.aio = _LimitedAsyncClient(client.aio, limiter)
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+class _LimitedAsyncClient:
+    def __init__(self, aio_client, limiter: EngineRateLimiter):
+        self._client = aio_client
+        self.files = _LimitedNamespace(aio_client.files, limiter, FILE_BUDGETS, is_async=True)
+        self.models = _LimitedNamespace(aio_client.models, limiter, MODEL_BUDGETS, is_async=True)
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+engine_rate_limiter = EngineRateLimiter(
+    get_redis_client(),
+    budgets={
+        "upload": Budget(settings.ENGINE_UPLOAD_RATE_PER_SECOND, settings.ENGINE_UPLOAD_BURST, settings.ENGINE_UPLOAD_MAX_IN_FLIGHT),
+        "poll": Budget(settings.ENGINE_POLL_RATE_PER_SECOND, settings.ENGINE_POLL_BURST, settings.ENGINE_POLL_MAX_IN_FLIGHT),
+        "generate": Budget(settings.ENGINE_GENERATE_RATE_PER_SECOND, settings.ENGINE_GENERATE_BURST, settings.ENGINE_GENERATE_MAX_IN_FLIGHT),
+    },
+    enabled=settings.ENGINE_RATE_LIMIT_ENABLED,
+    max_wait_seconds=settings.ENGINE_RATE_LIMIT_MAX_WAIT_SECONDS,
+    quota_max_retries=settings.ENGINE_QUOTA_MAX_RETRIES,
+    lease_seconds=settings.GEMINI_PROCESSING_TIMEOUT_SECONDS
+)
@@ -0,0 +1,215 @@
+import os
+import hashlib
+import logging
+import tempfile
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple, Iterator
+
+import numpy as np
+
+from app.services.ai.base import BaseAIEngine
+from app.services.ai.image_embedder import OnnxImageEmbedder
+from app.services.scene_detector import iter_rgb_frames
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Similarities are computed over this many frames at a time, so a memory-mapped index is
+# paged in progressively instead of being materialized as float32 all at once.
+SCAN_CHUNK_FRAMES = 65536
+
+def file_sha256(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(8 * 1024 * 1024), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def model_tag() -> str:
+    # Indexes built with another model or sampling rate are different objects, never mixed up
+    model = os.path.splitext(os.path.basename(settings.VECTOR_EMBEDDING_MODEL_PATH))[0]
+    return f"{model}-{settings.VECTOR_SAMPLE_FPS:g}fps"
+
+def frame_index_key(video_identity: str) -> str:
+    """
+    Object key of a video's frame-embedding index (a float16 .npy matrix, one row per sampled frame).
+    """
+    return f"embeddings/videos/{hashlib.sha256(video_identity.encode()).hexdigest()}/{model_tag()}.npy"
+
+def screenshot_vector_key(screenshot_sha256: str) -> str:
+    """
+    Object key of a screenshot's embedding; stored as CharacterScreenshotMetadata.vector_id.
+    """
+    return f"embeddings/screenshots/{screenshot_sha256}/{model_tag()}.npy"
+
+def cosine_scan(index: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """
+    Cosine similarity of every indexed frame against every query: (frames, d) x (q, d) -> (frames, q).
+    Both sides are unit vectors, so this is a chunked matrix product.
+    """
+    similarities = np.empty((len(index), len(queries)), dtype=np.float32)
+    query_matrix = queries.astype(np.float32).T
+    for start in range(0, len(index), SCAN_CHUNK_FRAMES):
+        chunk = np.asarray(index[start:start + SCAN_CHUNK_FRAMES], dtype=np.float32)
+        similarities[start:start + len(chunk)] = chunk @ query_matrix
+    return similarities
+
+def group_matches(similarities: np.ndarray, sample_fps: float, threshold: float, max_gap_seconds: float, character_name: str) -> List[Dict[str, Any]]:
+    """
+    Turns per-frame similarities into moments: frames above `threshold` that are at most
+    `max_gap_seconds` apart are one continuous appearance.
+    """
+    hits = np.flatnonzero(similarities >= threshold)
+    if len(hits) == 0:
+        return []
+
+    max_gap_frames = max(int(round(max_gap_seconds * sample_fps)), 1)
+    # Split the hit frames wherever two consecutive hits are further apart than the allowed gap
+    runs = np.split(hits, np.flatnonzero(np.diff(hits) > max_gap_frames) + 1)
+    moments = []
+    for run in runs:
+        moments.append({
+            "action": f"{character_name} on screen",
+            "start_timestamp": round(float(run[0] / sample_fps), 3),
+            "end_timestamp": round(float((run[-1] + 1) / sample_fps), 3),
+            "confidence_score": round(float(np.clip(similarities[run].max(), 0.0, 1.0)), 4)
+        })
+    return moments
+
+@lru_cache
+def get_query_embedder() -> OnnxImageEmbedder:
+    """
+    The embedding model for processes that only embed queries (the API), loaded on first use.
+    """
+    return OnnxImageEmbedder(settings.VECTOR_EMBEDDING_MODEL_PATH, settings.VECTOR_EMBEDDING_THREADS)
+
+def embed_image_files(embedder: OnnxImageEmbedder, image_paths: List[str]) -> np.ndarray:
+    """
+    Embeds reference images, decoded and cropped exactly like the indexed video frames.
+    """
+    size = embedder.INPUT_SIZE
+    frames = [np.concatenate(list(iter_rgb_frames(path, size, size, crop=True)))[:1] for path in image_paths]
+    return embedder.embed(np.concatenate(frames))
+
+class VectorAIEngine(BaseAIEngine):
+    """
+    Local, CPU-only engine: every video is embedded once (one CLIP image embedding per sampled
+    frame), and each character search is a cosine-similarity scan of that index followed by
+    temporal grouping. After indexing, a search costs milliseconds and no API call at all.
+
+    Indexes are float16 .npy matrices stored in S3 / MinIO next to the videos, and memory-mapped
+    from the worker-local cache, so many searches on one machine share a single copy in page cache.
+    """
+
+    def __init__(self, embedder: OnnxImageEmbedder | None = None, storage=None, local_cache=None):
+        # Everything can be injected (e.g. a fake embedder and in-memory storage in tests)
+        if embedder is None:
+            embedder = OnnxImageEmbedder(settings.VECTOR_EMBEDDING_MODEL_PATH, settings.VECTOR_EMBEDDING_THREADS)
+        if storage is None:
+            from app.services.file_storage_service import file_storage_service
+            storage = file_storage_service
+        if local_cache is None:
+            from app.services.local_video_cache import local_video_cache
+            local_cache = local_video_cache
+        self.embedder = embedder
+        self.storage = storage
+        self.local_cache = local_cache
+        self.sample_fps = settings.VECTOR_SAMPLE_FPS
+
+    # --- Indexing ---
+
+    def build_frame_index(self, video_file_path: str, output_path: str) -> int:
+        """
+        Samples the video at VECTOR_SAMPLE_FPS, embeds every frame, and writes the (frames, d)
+        float16 matrix to `output_path`. Returns the number of frames indexed.
+        """
+        size = self.embedder.INPUT_SIZE
+        blocks = []
+        for frames in iter_rgb_frames(video_file_path, size, size, self.sample_fps,
+                                      frames_per_block=settings.VECTOR_BATCH_SIZE, crop=True):
+            blocks.append(self.embedder.embed(frames).astype(np.float16))
+        if not blocks:
+            raise ValueError(f"No frames could be decoded from {video_file_path}")
+        index = np.concatenate(blocks)
+        np.save(output_path, index)
+        logger.info(f"Indexed {len(index)} frames ({index.nbytes} bytes of float16 embeddings).")
+        return len(index)
+
+    def has_frame_index(self, video_identity: str) -> bool:
+        """
+        True once the video is indexed, i.e. searches no longer need the video file itself.
+        """
+        return self.storage.object_exists(frame_index_key(video_identity))
+
+    def ensure_frame_index(self, video_file_path: str | None, video_identity: str) -> str:
+        """
+        Makes sure the video's frame index exists in storage (building it if needed) and returns its key.
+        `video_file_path` may be None when the index is known to exist (see has_frame_index).
+        """
+        key = frame_index_key(video_identity)
+        if self.storage.object_exists(key):
+            return key
+
+        logger.info(f"No frame index for {video_identity} yet. Building it...")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            local_path = os.path.join(temp_dir, "index.npy")
+            self.build_frame_index(video_file_path, local_path)
+            self.storage.upload_local_file(local_path, key)
+        return key
+
+    @contextmanager
+    def _open_frame_index(self, video_file_path: str | None, video_identity: str | None) -> Iterator[np.ndarray]:
+        """
+        Yields the video's frame index as a read-only memory map.
+        """
+        if video_identity is None:
+            # Nothing to key a shared index on: build a throwaway one
+            with tempfile.TemporaryDirectory() as temp_dir:
+                local_path = os.path.join(temp_dir, "index.npy")
+                self.build_frame_index(video_file_path, local_path)
+                yield np.load(local_path, mmap_mode="r")
+            return
+
+        key = self.ensure_frame_index(video_file_path, video_identity)
+        with self.local_cache.checkout(key) as local_path:
+            yield np.load(local_path, mmap_mode="r")
+
+    def embed_screenshots(self, screenshot_file_paths: List[str]) -> np.ndarray:
+        return embed_image_files(self.embedder, screenshot_file_paths)
+
+    # --- Search ---
+
+    def find_character_moments(self, video_file_path: str | None, screenshot_file_path: str, character_name: str, video_identity: str | None = None) -> List[Dict[str, Any]]:
+        """
+        Scans the video's frame index for frames that look like the screenshot.
+        """
+        return self.find_multiple_character_moments(video_file_path, [(screenshot_file_path, character_name)], video_identity)[0]
+
+    def find_multiple_character_moments(self, video_file_path: str | None, characters: List[Tuple[str, str]], video_identity: str | None = None) -> List[List[Dict[str, Any]]]:
+        """
+        All characters are scored in the same pass over the index (one matrix product).
+        """
+        queries = self.embed_screenshots([path for path, _ in characters])
+        with self._open_frame_index(video_file_path, video_identity) as index:
+            similarities = cosine_scan(index, queries)
+
+        results = [
+            group_matches(similarities[:, column], self.sample_fps, settings.VECTOR_MATCH_THRESHOLD,
+                          settings.VECTOR_MAX_GAP_SECONDS, character_name)
+            for column, (_, character_name) in enumerate(characters)
+        ]
+        logger.info(f"Vector search complete. Found {sum(len(r) for r in results)} moments across {len(characters)} characters.")
+        return results
+
+    def store_screenshot_vector(self, screenshot_file_path: str, screenshot_sha256: str | None = None) -> str:
+        """
+        Persists a screenshot's embedding and returns its key (the screenshot's vector_id).
+        """
+        key = screenshot_vector_key(screenshot_sha256 or file_sha256(screenshot_file_path))
+        if not self.storage.object_exists(key):
+            with tempfile.TemporaryDirectory() as temp_dir:
+                local_path = os.path.join(temp_dir, "vector.npy")
+                np.save(local_path, self.embed_screenshots([screenshot_file_path]).astype(np.float16))
+                self.storage.upload_local_file(local_path, key)
+        return key
@@ -0,0 +1,113 @@
+import json
+import hashlib
+import logging
+from typing import List, Dict, Any
+from app.core.config import settings
+from app.core.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+def normalize_character_name(character_name: str) -> str:
+    """
+    " Rick  Sanchez" and "rick sanchez" are the same search.
+    """
+    return " ".join(character_name.split()).casefold()
+
+def content_identity(content_sha256: str | None, storage_key: str) -> str:
+    """
+    Identifies a stored file by its content hash, falling back to its (immutable) storage key
+    for files uploaded before hashing existed or through paths that don't hash.
+    """
+    return f"sha256:{content_sha256}" if content_sha256 else f"key:{storage_key}"
+
+class AnalysisResultCache:
+    """
+    Redis-backed cache of raw engine results.
+
+    An analysis is fully determined by (video content, screenshot content, character name,
+    engine, model), so re-running the same search can skip the multi-minute engine call.
+    Entries expire after `ttl_seconds`, and every entry is also registered in a per-video set
+    so all results for a video can be invalidated explicitly.
+    """
+
+    KEY_PREFIX = "analysis_cache"
+
+    def __init__(self, redis_client, ttl_seconds: int, enabled: bool = True):
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+
+    def build_key(self, video_identity: str, screenshot_identity: str, character_name: str,
+                  engine_name: str | None = None, model_name: str | None = None) -> str:
+        engine_name = (engine_name or settings.ACTIVE_AI_ENGINE).upper()
+        model_name = model_name or settings.GEMINI_MODEL_NAME
+        raw = "|".join([video_identity, screenshot_identity, normalize_character_name(character_name), engine_name, model_name])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _entry_key(self, cache_key: str) -> str:
+        return f"{self.KEY_PREFIX}:entry:{cache_key}"
+
+    def _video_index_key(self, video_identity: str) -> str:
+        return f"{self.KEY_PREFIX}:video:{video_identity}"
+
+    def get(self, cache_key: str) -> List[Dict[str, Any]] | None:
+        """
+        Returns the cached moments for this analysis, or None on a miss.
+        Cache failures are logged and treated as a miss, never as a task failure.
+        """
+        if not self.enabled:
+            return None
+        try:
+            value = self.redis.get(self._entry_key(cache_key))
+            self.redis.incr(f"{self.KEY_PREFIX}:stats:{'hits' if value is not None else 'misses'}")
+            return json.loads(value) if value is not None else None
+        except Exception as e:
+            logger.error(f"Analysis cache lookup failed: {e}")
+            return None
+
+    def set(self, cache_key: str, video_identity: str, moments: List[Dict[str, Any]]) -> None:
+        """
+        Stores the engine output for this analysis with the configured TTL.
+        """
+        if not self.enabled:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            pipe.setex(self._entry_key(cache_key), self.ttl_seconds, json.dumps(moments))
+            pipe.sadd(self._video_index_key(video_identity), cache_key)
+            pipe.expire(self._video_index_key(video_identity), self.ttl_seconds)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Analysis cache write failed: {e}")
+
+    def invalidate_video(self, video_identity: str) -> int:
+        """
+        Drops every cached result for one video. Returns the number of entries removed.
+        """
+        index_key = self._video_index_key(video_identity)
+        cache_keys = [k.decode() for k in self.redis.smembers(index_key)]
+        if cache_keys:
+            self.redis.delete(*[self._entry_key(k) for k in cache_keys])
+        self.redis.delete(index_key)
+        return len(cache_keys)
+
+    def stats(self) -> dict:
+        """
+        Cluster-wide hit/miss counters (shared by every worker through Redis).
+        """
+        hits, misses = self.redis.mget(f"{self.KEY_PREFIX}:stats:hits", f"{self.KEY_PREFIX}:stats:misses")
+        hits, misses = int(hits or 0), int(misses or 0)
+        lookups = hits + misses
+        return {
+            "enabled": self.enabled,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+analysis_result_cache = AnalysisResultCache(
+    get_redis_client(),
+    ttl_seconds=settings.ANALYSIS_CACHE_TTL_HOURS * 3600,
+    enabled=settings.ANALYSIS_CACHE_ENABLED
+)
@@ -1,42 +1,144 @@
+import uuid
+from sqlalchemy import select, Select
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
-from app.models.character_screenshot_metadata import CharacterScreenshotMetadata
-from app.db.database import get_db
+from app.models.character_screenshot_metadata import CharacterScreenshotMetadata, normalized_character_name
+from app.db.database import get_db, get_async_db
 import logging
 
 logger = logging.getLogger(__name__)
 
+def screenshot_by_content_statement(video_id, content_sha256: str, character_name: str) -> Select:
+    """
+    The deduplication lookup shared by the sync and async services: a crop already submitted for
+    this video and this character (compared trimmed and case-insensitively), by its SHA-256.
+    Mirrors the columns of the unique index on character_screenshot_metadata.
+    """
+    return (
+        select(CharacterScreenshotMetadata)
+        .where(
+            CharacterScreenshotMetadata.video_id == video_id,
+            CharacterScreenshotMetadata.content_sha256 == content_sha256,
+            normalized_character_name(CharacterScreenshotMetadata.character_name) == normalized_character_name(character_name)
+        )
+        .limit(1)
+    )
+
 class ScreenshotMetadataService:
     def __init__(self, db: Session):
         self.db = db
 
-    def save_screenshot_metadata(self, video_id: str, character_name: str, storage_key: str, time_stamp: float) -> dict:
+    def save_screenshot_metadata(self, video_id: str, character_name: str, storage_key: str, time_stamp: float, content_sha256: str | None = None) -> dict:
         """
         Saves metadata for a new CharacterScreenshot (character crop) in PostgreSQL.
+        If the exact same image (by SHA-256) was already submitted for this video and character,
+        the existing record is returned with "deduplicated": True instead of creating a new one.
         """
+        if content_sha256:
+            existing = self.get_screenshot_by_content_hash(video_id, content_sha256, character_name)
+            if existing:
+                return existing
+
         try:
             db_screenshot = CharacterScreenshotMetadata(
                 video_id=video_id,
                 character_name=character_name,
                 screenshot_url=storage_key,
-                time_stamp=time_stamp
+                time_stamp=time_stamp,
+                content_sha256=content_sha256
             )
             self.db.add(db_screenshot)
             self.db.commit()
             self.db.refresh(db_screenshot)
             
-            return {
-                "id": str(db_screenshot.id),
-                "video_id": str(db_screenshot.video_id),
-                "character_name": db_screenshot.character_name,
-                "screenshot_url": db_screenshot.screenshot_url,
-                "time_stamp": db_screenshot.time_stamp,
-                "created_at": db_screenshot.created_at.isoformat()
-            }
+            return self._screenshot_to_dict(db_screenshot, deduplicated=False)
+        except IntegrityError as e:
+            self.db.rollback()
+            # A concurrent request saved the same crop first; link to that one instead
+            existing = self.get_screenshot_by_content_hash(video_id, content_sha256, character_name) if content_sha256 else None
+            if existing:
+                return existing
+            logger.error(f"Failed to save screenshot metadata: {e}")
+            raise Exception(f"Database error: {e}")
         except Exception as e:
             self.db.rollback()
             logger.error(f"Failed to save screenshot metadata: {e}")
             raise Exception(f"Database error: {e}")
 
+    def get_screenshot_by_content_hash(self, video_id: str, content_sha256: str, character_name: str) -> dict | None:
+        """
+        Looks up a crop already submitted for this video and character by the SHA-256 of its content.
+        """
+        db_screenshot = self.db.scalar(screenshot_by_content_statement(video_id, content_sha256, character_name))
+        return self._screenshot_to_dict(db_screenshot, deduplicated=True) if db_screenshot else None
+
+    @staticmethod
+    def _screenshot_to_dict(db_screenshot: CharacterScreenshotMetadata, deduplicated: bool) -> dict:
+        return {
+            "id": str(db_screenshot.id),
+            "video_id": str(db_screenshot.video_id),
+            "character_name": db_screenshot.character_name,
+            "screenshot_url": db_screenshot.screenshot_url,
+            "time_stamp": db_screenshot.time_stamp,
+            "content_sha256": db_screenshot.content_sha256,
+            "is_processed": bool(db_screenshot.is_processed),
+            "deduplicated": deduplicated,
+            "created_at": db_screenshot.created_at.isoformat()
+        }
+
 def get_screenshot_metadata_service(db: Session = Depends(get_db)) -> ScreenshotMetadataService:
     return ScreenshotMetadataService(db)
+
+class AsyncScreenshotMetadataService:
+    """
+    The asyncio twin of ScreenshotMetadataService for the API's request path.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def save_screenshot_metadata(self, video_id: str, character_name: str, storage_key: str, time_stamp: float, content_sha256: str | None = None) -> dict:
+        """
+        See ScreenshotMetadataService.save_screenshot_metadata (including content-hash deduplication).
+        """
+        # asyncpg binds UUID columns from uuid.UUID objects only
+        video_id = uuid.UUID(str(video_id))
+        if content_sha256:
+            existing = await self.get_screenshot_by_content_hash(video_id, content_sha256, character_name)
+            if existing:
+                return existing
+
+        try:
+            db_screenshot = CharacterScreenshotMetadata(
+                video_id=video_id,
+                character_name=character_name,
+                screenshot_url=storage_key,
+                time_stamp=time_stamp,
+                content_sha256=content_sha256
+            )
+            self.db.add(db_screenshot)
+            await self.db.commit()
+            await self.db.refresh(db_screenshot)
+
+            return ScreenshotMetadataService._screenshot_to_dict(db_screenshot, deduplicated=False)
+        except IntegrityError as e:
+            await self.db.rollback()
+            # A concurrent request saved the same crop first; link to that one instead
+            existing = await self.get_screenshot_by_content_hash(video_id, content_sha256, character_name) if content_sha256 else None
+            if existing:
+                return existing
+            logger.error(f"Failed to save screenshot metadata: {e}")
+            raise Exception(f"Database error: {e}")
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"Failed to save screenshot metadata: {e}")
+            raise Exception(f"Database error: {e}")
+
+    async def get_screenshot_by_content_hash(self, video_id: str, content_sha256: str, character_name: str) -> dict | None:
+        db_screenshot = await self.db.scalar(screenshot_by_content_statement(video_id, content_sha256, character_name))
+        return ScreenshotMetadataService._screenshot_to_dict(db_screenshot, deduplicated=True) if db_screenshot else None
+
+def get_async_screenshot_metadata_service(db: AsyncSession = Depends(get_async_db)) -> AsyncScreenshotMetadataService:
+    return AsyncScreenshotMetadataService(db)
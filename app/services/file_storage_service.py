@@ -1,52 +1,203 @@
 import boto3
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError
 from app.core.config import settings
+from app.core.metrics import count_bytes
+import os
 import uuid
+import asyncio
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+class HashingReader:
+    """
+    Wraps a file object and computes its SHA-256 (and size) incrementally as it is read,
+    so we get the content hash for free while the bytes stream to S3 / MinIO.
+    It deliberately exposes only read(), so boto3 consumes it strictly front to back.
+    """
+
+    def __init__(self, file_obj):
+        self.file_obj = file_obj
+        self.hasher = hashlib.sha256()
+        self.size_bytes = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.file_obj.read(size)
+        self.hasher.update(data)
+        self.size_bytes += len(data)
+        return data
+
+    def hexdigest(self) -> str:
+        return self.hasher.hexdigest()
+
 class FileStorageService:
     def __init__(self):
+        self.bucket_name = settings.S3_BUCKET_NAME
+        self.connect()
+
+    def connect(self) -> None:
+        """
+        (Re)creates the boto3 client and its connection pool. A forked worker child calls this so
+        it never shares sockets with its parent.
+        """
         self.s3_client = boto3.client(
             "s3",
             aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
             region_name=settings.AWS_REGION,
             endpoint_url=settings.S3_ENDPOINT_URL,
-            use_ssl=settings.S3_USE_SSL
+            use_ssl=settings.S3_USE_SSL,
+            config=BotoConfig(max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS)
         )
-        self.bucket_name = settings.S3_BUCKET_NAME
 
-    def upload_file(self, file_obj, filename: str, content_type: str, prefix: str = "") -> str:
+    @staticmethod
+    def generate_object_key(filename: str, prefix: str = "") -> str:
         """
-        Uploads a file object to S3 / MinIO and returns the generated object key.
-        Supports optional prefixes (e.g., 'videos/' or 'videos/{id}/screenshots/').
+        Builds a unique object key for a new upload, keeping the original file extension.
         """
         # Generate a unique key for the file to prevent overwrites
         extension = filename.split('.')[-1] if '.' in filename else ''
         file_uuid = uuid.uuid4().hex
-        unique_key = f"{prefix}{file_uuid}.{extension}" if extension else f"{prefix}{file_uuid}"
+        return f"{prefix}{file_uuid}.{extension}" if extension else f"{prefix}{file_uuid}"
+
+    @staticmethod
+    def _safe_filename(filename: str) -> str:
+        # S3/MinIO metadata values shouldn't contain non-ASCII characters, so we handle that safely.
+        return filename.encode('ascii', 'ignore').decode() or "unknown_video"
+
+    def upload_file(self, file_obj, filename: str, content_type: str, prefix: str = "") -> str:
+        """
+        Uploads a file object to S3 / MinIO and returns the generated object key.
+        Supports optional prefixes (e.g., 'videos/' or 'videos/{id}/screenshots/').
+        """
+        return self.upload_file_with_digest(file_obj, filename, content_type, prefix)["storage_key"]
+
+    def upload_file_with_digest(self, file_obj, filename: str, content_type: str, prefix: str = "") -> dict:
+        """
+        Same as upload_file, but also returns the SHA-256 of the content (computed while uploading)
+        so callers can deduplicate identical files. Returns {'storage_key', 'sha256', 'size_bytes'}.
+        """
+        unique_key = self.generate_object_key(filename, prefix)
+        reader = HashingReader(file_obj)
         
         try:
             # We store the original filename in the object metadata
-            # S3/MinIO metadata values shouldn't contain non-ASCII characters, so we handle that safely.
-            safe_filename = filename.encode('ascii', 'ignore').decode() or "unknown_video"
-            
             self.s3_client.upload_fileobj(
-                file_obj,
+                reader,
                 self.bucket_name,
                 unique_key,
                 ExtraArgs={
                     'ContentType': content_type,
-                    'Metadata': {'original-filename': safe_filename}
+                    'Metadata': {'original-filename': self._safe_filename(filename)}
                 }
             )
-            return unique_key
+            count_bytes("storage", "upload", reader.size_bytes)
+            return {"storage_key": unique_key, "sha256": reader.hexdigest(), "size_bytes": reader.size_bytes}
         except ClientError as e:
             logger.error(f"Error uploading file to storage: {e}")
             raise Exception("Failed to upload video to storage")
 
+    def delete_file(self, object_key: str) -> None:
+        """
+        Deletes an object from S3 / MinIO (e.g. a freshly uploaded duplicate).
+        """
+        try:
+            self.s3_client.delete_object(Bucket=self.bucket_name, Key=object_key)
+        except ClientError as e:
+            logger.error(f"Error deleting file {object_key} from storage: {e}")
+            raise Exception("Failed to delete file from storage")
+
+    # --- Low-level S3 Multipart primitives ---
+    # These let callers push a large object in independent parts (in parallel, and from any
+    # source such as an HTTP request stream) instead of handing boto3 one blocking file object.
+
+    def create_multipart_upload(self, object_key: str, filename: str, content_type: str) -> str:
+        """
+        Starts an S3 multipart upload for `object_key` and returns its UploadId.
+        """
+        try:
+            response = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=object_key,
+                ContentType=content_type,
+                Metadata={'original-filename': self._safe_filename(filename)}
+            )
+            return response["UploadId"]
+        except ClientError as e:
+            logger.error(f"Error starting multipart upload for {object_key}: {e}")
+            raise Exception("Failed to start multipart upload")
+
+    def upload_part(self, object_key: str, upload_id: str, part_number: int, data: bytes) -> dict:
+        """
+        Uploads a single part of a multipart upload.
+        Returns the {'PartNumber', 'ETag'} pair S3 needs to complete the upload.
+        """
+        try:
+            response = self.s3_client.upload_part(
+                Bucket=self.bucket_name,
+                Key=object_key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=data
+            )
+            count_bytes("storage", "upload", len(data))
+            return {"PartNumber": part_number, "ETag": response["ETag"]}
+        except ClientError as e:
+            logger.error(f"Error uploading part {part_number} of {object_key}: {e}")
+            raise Exception("Failed to upload part to storage")
+
+    def complete_multipart_upload(self, object_key: str, upload_id: str, parts: list[dict]) -> None:
+        """
+        Stitches the uploaded parts together into the final object.
+        """
+        try:
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=object_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": sorted(parts, key=lambda p: p["PartNumber"])}
+            )
+        except ClientError as e:
+            # A retried completion whose earlier attempt went through: the upload is gone, the object is there
+            if e.response.get("Error", {}).get("Code") == "NoSuchUpload" and self.object_exists(object_key):
+                logger.info(f"Multipart upload for {object_key} was already completed")
+                return
+            logger.error(f"Error completing multipart upload for {object_key}: {e}")
+            raise Exception("Failed to complete multipart upload")
+
+    def list_parts(self, object_key: str, upload_id: str) -> list[dict]:
+        """
+        Lists every part S3 has received so far for a multipart upload.
+        Returns dicts with 'PartNumber', 'ETag' and 'Size', ordered by part number.
+        """
+        parts = []
+        try:
+            paginator = self.s3_client.get_paginator("list_parts")
+            for page in paginator.paginate(Bucket=self.bucket_name, Key=object_key, UploadId=upload_id):
+                for part in page.get("Parts", []):
+                    parts.append({"PartNumber": part["PartNumber"], "ETag": part["ETag"], "Size": part["Size"]})
+            return sorted(parts, key=lambda p: p["PartNumber"])
+        except ClientError as e:
+            logger.error(f"Error listing parts for {object_key}: {e}")
+            raise Exception("Failed to list uploaded parts")
+
+    def abort_multipart_upload(self, object_key: str, upload_id: str) -> None:
+        """
+        Aborts a multipart upload so S3 / MinIO frees the storage held by its parts.
+        """
+        try:
+            self.s3_client.abort_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=object_key,
+                UploadId=upload_id
+            )
+        except ClientError as e:
+            # Aborting is best-effort cleanup, so we only log it
+            logger.error(f"Error aborting multipart upload for {object_key}: {e}")
+
     def get_presigned_url(self, object_key: str, expiration_seconds: int = 3600) -> str:
         """
         Generates a secure, temporary URL to access the video file directly from the browser.
@@ -68,11 +219,80 @@ class FileStorageService:
         """
         try:
             self.s3_client.download_file(self.bucket_name, object_key, download_path)
+            count_bytes("storage", "download", os.path.getsize(download_path))
             return download_path
         except ClientError as e:
             logger.error(f"Error downloading file {object_key} from storage: {e}")
             raise Exception("Failed to download file from storage")
 
+    def read_range(self, object_key: str, start: int, end: int) -> bytes:
+        """
+        Reads bytes start..end (inclusive, like an HTTP Range header) of a stored object,
+        without downloading the rest of it.
+        """
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=object_key, Range=f"bytes={start}-{end}")
+            data = response["Body"].read()
+            count_bytes("storage", "download", len(data))
+            return data
+        except ClientError as e:
+            logger.error(f"Error reading bytes {start}-{end} of {object_key}: {e}")
+            raise Exception("Failed to read file from storage")
+
+    def hash_object(self, object_key: str) -> str:
+        """
+        Hex SHA-256 of a stored object, streamed from storage without touching the local disk.
+        Used for objects assembled by S3 (multipart uploads), whose parts can't be hashed in order.
+        """
+        try:
+            body = self.s3_client.get_object(Bucket=self.bucket_name, Key=object_key)["Body"]
+            hasher = hashlib.sha256()
+            size_bytes = 0
+            for block in body.iter_chunks(8 * 1024 * 1024):
+                hasher.update(block)
+                size_bytes += len(block)
+            count_bytes("storage", "download", size_bytes)
+            return hasher.hexdigest()
+        except ClientError as e:
+            logger.error(f"Error hashing {object_key}: {e}")
+            raise Exception("Failed to read file from storage")
+
+    def get_object_size(self, object_key: str) -> int:
+        """
+        Returns the size in bytes of a stored object (a HEAD request, no download).
+        """
+        try:
+            return self.s3_client.head_object(Bucket=self.bucket_name, Key=object_key)["ContentLength"]
+        except ClientError as e:
+            logger.error(f"Error reading metadata of {object_key}: {e}")
+            raise Exception("Failed to read file metadata from storage")
+
+    def object_exists(self, object_key: str) -> bool:
+        """
+        True if the object is stored (a HEAD request, no download).
+        """
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=object_key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            logger.error(f"Error reading metadata of {object_key}: {e}")
+            raise Exception("Failed to read file metadata from storage")
+
+    def upload_local_file(self, local_path: str, object_key: str, content_type: str = "application/octet-stream") -> str:
+        """
+        Uploads a file from the worker's disk under an explicit object key (e.g. derived artifacts
+        such as embedding indexes, whose key is computed from the video they belong to).
+        """
+        try:
+            self.s3_client.upload_file(local_path, self.bucket_name, object_key, ExtraArgs={'ContentType': content_type})
+            count_bytes("storage", "upload", os.path.getsize(local_path))
+            return object_key
+        except ClientError as e:
+            logger.error(f"Error uploading {local_path} to storage: {e}")
+            raise Exception("Failed to upload file to storage")
+
     def list_videos(self) -> list:
         """
         Retrieves all videos from the bucket, fetches their original filenames from metadata, 
@@ -109,4 +329,46 @@ class FileStorageService:
             logger.error(f"Error listing files: {e}")
             raise Exception("Failed to retrieve videos from storage")
 
+class AsyncFileStorageService:
+    """
+    Awaitable storage calls for the API's request path.
+
+    boto3 has no asyncio transport, so each call still runs on a thread, but on a dedicated pool
+    (`threads` wide) rather than the shared threadpool used by run_in_threadpool. Slow uploads
+    therefore never starve other blocking work of threads, and the event loop only awaits.
+    boto3 clients are thread-safe, so all threads share the wrapped service's client.
+    """
+
+    def __init__(self, storage: FileStorageService, threads: int):
+        self.storage = storage
+        self._executor = ThreadPoolExecutor(max_workers=max(threads, 1), thread_name_prefix="storage-io")
+
+    async def _run(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: function(*args, **kwargs))
+
+    async def upload_file_with_digest(self, file_obj, filename: str, content_type: str, prefix: str = "") -> dict:
+        return await self._run(self.storage.upload_file_with_digest, file_obj, filename, content_type, prefix)
+
+    async def delete_file(self, object_key: str) -> None:
+        await self._run(self.storage.delete_file, object_key)
+
+    async def object_exists(self, object_key: str) -> bool:
+        return await self._run(self.storage.object_exists, object_key)
+
+    async def get_object_size(self, object_key: str) -> int:
+        return await self._run(self.storage.get_object_size, object_key)
+
+    async def probe_video(self, object_key: str) -> dict | None:
+        """
+        Container-level media info of a stored video from a few ranged reads (see media_probe).
+        """
+        from app.services.media_probe import probe_stored_video
+        return await self._run(
+            probe_stored_video, self.storage, object_key,
+            head_bytes=settings.MEDIA_PROBE_HEAD_KB * 1024,
+            max_header_bytes=settings.MEDIA_PROBE_MAX_HEADER_MB * 1024 * 1024
+        )
+
 file_storage_service = FileStorageService()
+async_file_storage_service = AsyncFileStorageService(file_storage_service, settings.STORAGE_IO_THREADS)
@@ -0,0 +1,97 @@
+import json
+import time
+import logging
+from typing import AsyncIterator, Dict, Any, List
+from app.core.config import settings
+from app.core.redis import get_redis_client, get_async_redis_client
+
+logger = logging.getLogger(__name__)
+
+class JobProgress:
+    """
+    Redis pub/sub channel for the progress of character searches.
+
+    Workers publish every stage transition of a screenshot's analysis (queued, downloading,
+    analyzing, saving, completed/failed) on its video's channel, and API processes fan them out
+    to subscribed browsers, so nobody has to poll the database to find out when a job finished.
+    The latest event of each screenshot is also kept in a per-video hash (with a TTL), so a client
+    that subscribes late starts from the current state instead of waiting for the next transition.
+    """
+
+    KEY_PREFIX = "job_progress"
+    TERMINAL_STAGES = ("completed", "failed")
+
+    def __init__(self, redis_client, ttl_seconds: int, enabled: bool = True, async_redis_client=None):
+        self.redis = redis_client
+        self.async_redis = async_redis_client
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+
+    def _channel(self, video_id: str) -> str:
+        return f"{self.KEY_PREFIX}:channel:{video_id}"
+
+    def _latest_key(self, video_id: str) -> str:
+        return f"{self.KEY_PREFIX}:latest:{video_id}"
+
+    def publish(self, video_id, screenshot_id, stage: str, **details) -> None:
+        """
+        Announces that a screenshot's analysis reached `stage`. Extra keyword arguments
+        (moments_found, message, ...) are passed through to subscribers.
+        Progress is best effort: failures are logged, never raised into the task.
+        """
+        if not self.enabled:
+            return
+        payload = json.dumps({
+            "video_id": str(video_id),
+            "screenshot_id": str(screenshot_id),
+            "stage": stage,
+            "timestamp": time.time(),
+            **details
+        })
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hset(self._latest_key(str(video_id)), str(screenshot_id), payload)
+            pipe.expire(self._latest_key(str(video_id)), self.ttl_seconds)
+            pipe.publish(self._channel(str(video_id)), payload)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to publish job progress for screenshot ID {screenshot_id}: {e}")
+
+    def latest(self, video_id: str) -> List[Dict[str, Any]]:
+        """
+        The last known state of every recently analyzed screenshot of a video.
+        """
+        events = [json.loads(value) for value in self.redis.hvals(self._latest_key(video_id))]
+        return sorted(events, key=lambda event: event["timestamp"])
+
+    async def listen(self, video_id: str, heartbeat_seconds: float) -> AsyncIterator[Dict[str, Any] | None]:
+        """
+        Yields the current state of the video's jobs, then every new event as it is published.
+        Yields None whenever nothing happened for `heartbeat_seconds`, so the caller can keep the
+        connection alive and notice disconnected clients.
+        """
+        pubsub = self.async_redis.pubsub()
+        # Subscribe before reading the snapshot, so no transition can fall in between
+        await pubsub.subscribe(self._channel(video_id))
+        try:
+            snapshot = await self.async_redis.hvals(self._latest_key(video_id))
+            for event in sorted((json.loads(value) for value in snapshot), key=lambda event: event["timestamp"]):
+                yield event
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat_seconds)
+                if message is None:
+                    yield None
+                else:
+                    yield json.loads(message["data"])
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close progress subscription for video ID {video_id}: {e}")
+
+job_progress = JobProgress(
+    get_redis_client(),
+    ttl_seconds=settings.JOB_PROGRESS_TTL_HOURS * 3600,
+    enabled=settings.JOB_PROGRESS_ENABLED,
+    async_redis_client=get_async_redis_client()
+)
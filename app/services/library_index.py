@@ -0,0 +1,399 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+from dataclasses import dataclass
+from typing import List, Dict, Any
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.ai.vector_engine import model_tag
+
+logger = logging.getLogger(__name__)
+
+ENTRY_DTYPE = np.dtype([("video", np.int32), ("start", np.float32), ("end", np.float32)])
+
+def pool_frame_embeddings(frame_index: np.ndarray, sample_fps: float, scene_boundaries: List[float], pool_seconds: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Averages a video's per-frame embeddings into one vector per span of at most `pool_seconds`
+    that never crosses a scene cut. Returns (unit vectors, starts, ends).
+    This keeps the library index ~`pool_seconds * sample_fps` times smaller than per-frame vectors.
+    """
+    duration = len(frame_index) / sample_fps
+    edges = np.unique(np.concatenate([
+        np.arange(0.0, duration, pool_seconds),
+        [b for b in scene_boundaries if 0.0 < b < duration],
+        [duration]
+    ]))
+    frame_times = np.arange(len(frame_index)) / sample_fps
+    spans = np.searchsorted(edges, frame_times, side="right") - 1
+
+    sums = np.zeros((len(edges) - 1, frame_index.shape[1]), dtype=np.float32)
+    np.add.at(sums, spans, np.asarray(frame_index, dtype=np.float32))
+    counts = np.bincount(spans, minlength=len(edges) - 1)
+
+    keep = counts > 0
+    vectors = sums[keep]
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return vectors, edges[:-1][keep].astype(np.float32), edges[1:][keep].astype(np.float32)
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 15, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means (cosine) for the IVF coarse quantizer.
+    """
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_lists(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        empty = np.bincount(assignments, minlength=nlist) == 0
+        # Re-seed empty lists with random vectors instead of letting them die
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk):
+        block = np.asarray(vectors[start:start + chunk], dtype=np.float32)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+@dataclass
+class LoadedSegment:
+    vectors: np.ndarray # (n, d) float16, memory-mapped, rows grouped by inverted list
+    offsets: np.ndarray # (lists + 1,) row offset of every inverted list
+    entries: np.ndarray # (n,) ENTRY_DTYPE, memory-mapped
+    videos: List[str]
+
+class LibraryIndex:
+    """
+    Library-wide approximate nearest neighbour index (IVF) over pooled frame embeddings of every
+    video, answering "where does this character appear in the whole archive?" in one query.
+
+    Layout in object storage (under KEY_PREFIX), all files immutable except the manifest:
+    - manifest.json                the live segments, the centroids, a version number, and the
+                                   retired files still awaiting deletion
+    - centroids-<id>.npy           the IVF coarse quantizer (trained once enough vectors exist)
+    - segments/<id>/vectors.npy    float16 vectors, sorted by inverted list
+    - segments/<id>/offsets.npy    where each inverted list starts
+    - segments/<id>/entries.npy    (video slot, start, end) per vector
+
+    Ingestion is incremental: every video becomes a small segment, and once there are more than
+    `max_segments` the smallest ones are merged (like an LSM tree). Until `train_min_vectors`
+    vectors exist, the index is small enough to scan exhaustively and has no centroids.
+
+    Readers copy the files to `local_dir` once and memory-map them, so loading is near-instant and
+    the OS page cache is shared between processes.
+
+    Files superseded by a merge are not deleted right away: a reader may have just read the previous
+    manifest and still be fetching them. They are listed as `retired` and deleted by a later ingest
+    once `retired_grace_seconds` (longer than any reader's refresh) have passed.
+    """
+
+    KEY_PREFIX = "embeddings/library"
+
+    def __init__(self, storage, local_dir: str, redis_client=None, nlist: int = 256, nprobe: int = 16,
+                 train_min_vectors: int = 20000, max_segments: int = 16, refresh_seconds: float = 60,
+                 retired_grace_seconds: float = 600):
+        self.storage = storage
+        self.local_dir = local_dir
+        self.redis = redis_client
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_min_vectors = train_min_vectors
+        self.max_segments = max_segments
+        self.refresh_seconds = refresh_seconds
+        self.retired_grace_seconds = retired_grace_seconds
+
+        self._lock = threading.Lock()
+        self._version = None
+        self._loaded_at = 0.0
+        self._segments: List[LoadedSegment] = []
+        self._centroids: np.ndarray | None = None
+
+    # --- Storage ---
+
+    def _key(self, name: str) -> str:
+        return f"{self.KEY_PREFIX}/{name}"
+
+    def _local_path(self, key: str) -> str:
+        return os.path.join(self.local_dir, key)
+
+    def _fetch(self, key: str) -> str:
+        """
+        Returns a local copy of an immutable index file, downloading it on first use.
+        """
+        path = self._local_path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.part.{os.getpid()}.{threading.get_ident()}"
+            self.storage.download_file(key, temp_path)
+            os.replace(temp_path, path)
+        return path
+
+    def _put(self, key: str, local_path: str, content_type: str = "application/octet-stream") -> None:
+        self.storage.upload_local_file(local_path, key, content_type)
+        # Keep our own copy too, so this process never downloads what it just wrote
+        path = self._local_path(key)
+        if os.path.abspath(local_path) != os.path.abspath(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copyfile(local_path, path)
+
+    def read_manifest(self) -> dict:
+        key = self._key("manifest.json")
+        if not self.storage.object_exists(key):
+            return {"version": 0, "model": model_tag(), "centroids": None, "segments": [], "retired": []}
+        os.makedirs(self.local_dir, exist_ok=True)
+        temp_path = os.path.join(self.local_dir, f"manifest.{os.getpid()}.{threading.get_ident()}.json")
+        try:
+            self.storage.download_file(key, temp_path)
+            with open(temp_path) as f:
+                return json.load(f)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _write_manifest(self, manifest: dict) -> None:
+        manifest["version"] += 1
+        temp_path = os.path.join(self.local_dir, f"manifest.{os.getpid()}.{threading.get_ident()}.json")
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(manifest, f)
+            self.storage.upload_local_file(temp_path, self._key("manifest.json"), "application/json")
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _load_segment(self, segment: dict) -> LoadedSegment:
+        prefix = f"segments/{segment['id']}"
+        return LoadedSegment(
+            vectors=np.load(self._fetch(self._key(f"{prefix}/vectors.npy")), mmap_mode="r"),
+            offsets=np.load(self._fetch(self._key(f"{prefix}/offsets.npy"))),
+            entries=np.load(self._fetch(self._key(f"{prefix}/entries.npy")), mmap_mode="r"),
+            videos=segment["videos"]
+        )
+
+    def _write_segment(self, vectors: np.ndarray, entries: np.ndarray, videos: List[str], centroids: np.ndarray | None) -> dict:
+        """
+        Writes one immutable segment, with its rows grouped by inverted list.
+        """
+        lists = len(centroids) if centroids is not None else 1
+        assignments = assign_lists(vectors, centroids) if centroids is not None else np.zeros(len(vectors), dtype=np.int64)
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.zeros(lists + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignments, minlength=lists))
+
+        segment_id = uuid.uuid4().hex
+        directory = self._local_path(self._key(f"segments/{segment_id}"))
+        os.makedirs(directory, exist_ok=True)
+        for name, array in (("vectors", np.asarray(vectors, dtype=np.float32)[order].astype(np.float16)),
+                            ("offsets", offsets), ("entries", np.asarray(entries)[order])):
+            path = os.path.join(directory, f"{name}.npy")
+            np.save(path, array)
+            self._put(self._key(f"segments/{segment_id}/{name}.npy"), path)
+        return {"id": segment_id, "count": int(len(vectors)), "videos": videos, "trained": centroids is not None}
+
+    # --- Ingestion (workers) ---
+
+    def _ingest_lock(self):
+        return self.redis.lock(self._key("lock"), timeout=1800, blocking_timeout=1800)
+
+    def add_video(self, video_id: str, vectors: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> bool:
+        """
+        Adds one video's pooled vectors as a new segment. Returns False if the video is already indexed.
+        """
+        with self._ingest_lock():
+            manifest = self.read_manifest()
+            if manifest.get("model") != model_tag():
+                logger.warning(f"Library index was built with {manifest.get('model')}; starting a new one for {model_tag()}.")
+                self._retire(manifest, manifest["segments"], [manifest["centroids"]] if manifest["centroids"] else [])
+                manifest = {"version": manifest["version"], "model": model_tag(), "centroids": None, "segments": [], "retired": manifest.get("retired", [])}
+            if any(video_id in segment["videos"] for segment in manifest["segments"]):
+                return False
+
+            centroids = np.load(self._fetch(manifest["centroids"])) if manifest["centroids"] else None
+            entries = np.zeros(len(vectors), dtype=ENTRY_DTYPE)
+            entries["start"], entries["end"] = starts, ends
+            manifest["segments"].append(self._write_segment(vectors, entries, [video_id], centroids))
+
+            total = sum(segment["count"] for segment in manifest["segments"])
+            if centroids is None and total >= self.train_min_vectors:
+                self._train(manifest)
+            elif len(manifest["segments"]) > self.max_segments:
+                self._merge(manifest, sorted(manifest["segments"], key=lambda s: s["count"])[:len(manifest["segments"]) // 2 + 1])
+
+            self._collect_retired(manifest)
+            self._write_manifest(manifest)
+            logger.info(f"Added video {video_id} to the library index ({len(vectors)} vectors, {len(manifest['segments'])} segments).")
+            return True
+
+    def _train(self, manifest: dict) -> None:
+        """
+        Trains the IVF centroids on everything indexed so far and rewrites it as one clustered segment.
+        """
+        loaded = [self._load_segment(segment) for segment in manifest["segments"]]
+        sample = np.concatenate([np.asarray(s.vectors, dtype=np.float32) for s in loaded])
+        logger.info(f"Training {self.nlist} IVF centroids on {len(sample)} vectors...")
+        centroids = train_centroids(sample, self.nlist)
+
+        centroids_key = self._key(f"centroids-{uuid.uuid4().hex}.npy")
+        path = self._local_path(centroids_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.save(path, centroids)
+        self._put(centroids_key, path)
+        manifest["centroids"] = centroids_key
+        self._merge(manifest, list(manifest["segments"]), loaded)
+
+    def _merge(self, manifest: dict, segments: List[dict], loaded: List[LoadedSegment] | None = None) -> None:
+        """
+        Replaces `segments` by a single segment (re-assigned with the current centroids).
+        """
+        loaded = loaded or [self._load_segment(segment) for segment in segments]
+        centroids = np.load(self._fetch(manifest["centroids"])) if manifest["centroids"] else None
+
+        videos, entry_blocks = [], []
+        for segment in loaded:
+            entries = np.array(segment.entries)
+            entries["video"] += len(videos) # Re-number the video slots into the merged list
+            entry_blocks.append(entries)
+            videos.extend(segment.videos)
+        merged = self._write_segment(
+            np.concatenate([np.asarray(s.vectors, dtype=np.float32) for s in loaded]),
+            np.concatenate(entry_blocks), videos, centroids
+        )
+
+        merged_ids = {segment["id"] for segment in segments}
+        manifest["segments"] = [s for s in manifest["segments"] if s["id"] not in merged_ids] + [merged]
+        self._retire(manifest, segments)
+        logger.info(f"Merged {len(segments)} library index segments into {merged['id']} ({merged['count']} vectors).")
+
+    def _retire(self, manifest: dict, segments: List[dict], other_keys: List[str] = ()) -> None:
+        """
+        Schedules the files of superseded segments (and centroids) for deletion after the grace period.
+        """
+        keys = [self._key(f"segments/{segment['id']}/{name}.npy") for segment in segments for name in ("vectors", "offsets", "entries")]
+        manifest.setdefault("retired", []).append({"keys": keys + list(other_keys), "retired_at": time.time()})
+
+    def _collect_retired(self, manifest: dict) -> None:
+        """
+        Deletes retired files no reader can still be fetching. Failed deletions are retried next time.
+        """
+        cutoff = time.time() - self.retired_grace_seconds
+        remaining = []
+        for retired in manifest.get("retired", []):
+            if retired["retired_at"] > cutoff:
+                remaining.append(retired)
+                continue
+            failed = []
+            for key in retired["keys"]:
+                try:
+                    self.storage.delete_file(key)
+                except Exception as e:
+                    logger.warning(f"Failed to delete retired library index file {key}: {e}")
+                    failed.append(key)
+            if failed:
+                remaining.append({"keys": failed, "retired_at": retired["retired_at"]})
+        manifest["retired"] = remaining
+
+    # --- Search (API) ---
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Picks up segments written by the workers since the last load (at most every `refresh_seconds`).
+        """
+        with self._lock:
+            if not force and time.monotonic() - self._loaded_at < self.refresh_seconds:
+                return
+            manifest = self.read_manifest()
+            self._loaded_at = time.monotonic()
+            if manifest["version"] == self._version:
+                return
+            self._segments = [self._load_segment(segment) for segment in manifest["segments"]]
+            self._centroids = np.load(self._fetch(manifest["centroids"])) if manifest["centroids"] else None
+            self._version = manifest["version"]
+
+            # Drop local copies of segments that were merged away (open memory maps stay valid)
+            live = {segment["id"] for segment in manifest["segments"]}
+            segments_dir = self._local_path(self._key("segments"))
+            for segment_id in os.listdir(segments_dir) if os.path.isdir(segments_dir) else []:
+                if segment_id not in live:
+                    shutil.rmtree(os.path.join(segments_dir, segment_id), ignore_errors=True)
+
+    def search(self, query: np.ndarray, limit: int = 50, min_score: float = 0.75, max_gap_seconds: float = 2.0) -> List[Dict[str, Any]]:
+        """
+        Returns the best matching moments across every indexed video, highest score first.
+        Only the `nprobe` inverted lists closest to the query are scanned in each segment.
+        """
+        self.refresh()
+        segments, centroids = self._segments, self._centroids
+        query = np.asarray(query, dtype=np.float32).ravel()
+        probes = np.argsort(centroids @ query)[-self.nprobe:] if centroids is not None else None
+
+        hits = []
+        for segment in segments:
+            if probes is None or len(segment.offsets) == 2:
+                ranges = [(0, len(segment.vectors))]
+            else:
+                ranges = [(segment.offsets[l], segment.offsets[l + 1]) for l in probes]
+            for start, end in ranges:
+                if end <= start:
+                    continue
+                scores = np.asarray(segment.vectors[start:end], dtype=np.float32) @ query
+                for row in np.flatnonzero(scores >= min_score):
+                    entry = segment.entries[start + row]
+                    hits.append((segment.videos[entry["video"]], float(entry["start"]), float(entry["end"]), float(scores[row])))
+
+        # Stitch neighbouring hits of the same video into moments
+        hits.sort()
+        moments: List[Dict[str, Any]] = []
+        for video_id, start, end, score in hits:
+            previous = moments[-1] if moments else None
+            if previous and previous["video_id"] == video_id and start <= previous["end_timestamp"] + max_gap_seconds:
+                previous["end_timestamp"] = max(previous["end_timestamp"], round(end, 3))
+                previous["confidence_score"] = max(previous["confidence_score"], round(min(score, 1.0), 4))
+            else:
+                moments.append({
+                    "video_id": video_id,
+                    "start_timestamp": round(start, 3),
+                    "end_timestamp": round(end, 3),
+                    "confidence_score": round(min(score, 1.0), 4)
+                })
+        moments.sort(key=lambda m: m["confidence_score"], reverse=True)
+        return moments[:limit]
+
+    def stats(self) -> dict:
+        self.refresh()
+        return {
+            "version": self._version,
+            "segments": len(self._segments),
+            "vectors": int(sum(len(s.vectors) for s in self._segments)),
+            "videos": int(sum(len(s.videos) for s in self._segments)),
+            "trained": self._centroids is not None,
+            "nlist": len(self._centroids) if self._centroids is not None else 0,
+            "nprobe": self.nprobe
+        }
+
+def _build_library_index() -> LibraryIndex:
+    from app.core.redis import get_redis_client
+    from app.services.file_storage_service import file_storage_service
+    return LibraryIndex(
+        file_storage_service,
+        local_dir=settings.LIBRARY_INDEX_DIR,
+        redis_client=get_redis_client(),
+        nlist=settings.LIBRARY_INDEX_NLIST,
+        nprobe=settings.LIBRARY_INDEX_NPROBE,
+        train_min_vectors=settings.LIBRARY_INDEX_TRAIN_MIN_VECTORS,
+        max_segments=settings.LIBRARY_INDEX_MAX_SEGMENTS,
+        refresh_seconds=settings.LIBRARY_INDEX_REFRESH_SECONDS,
+        retired_grace_seconds=settings.LIBRARY_INDEX_RETIRED_GRACE_SECONDS
+    )
+
+# Nothing is loaded until the first query, so API startup doesn't pay for the index
+library_index = _build_library_index()
@@ -0,0 +1,278 @@
+import os
+import json
+import socket
+import hashlib
+import logging
+from contextlib import contextmanager
+from typing import Iterator
+from app.core.config import settings
+from app.services.file_storage_service import FileStorageService, file_storage_service
+
+try:
+    import fcntl # POSIX only; Celery's prefork pool doesn't run on Windows anyway
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class LocalVideoCache:
+    """
+    A size-bounded on-disk cache of videos downloaded from S3 / MinIO, shared by every worker
+    process on the same machine, so back-to-back searches on the same video don't re-download it.
+
+    Layout inside `cache_dir`, per video (named after a hash of its storage_key):
+    - <entry>.mp4   the video itself, only ever created by an atomic rename of a finished download
+    - <entry>.json  size (and SHA-256 if known), checked before every reuse
+    - <entry>.lock  flock() target: shared while a task reads the file, exclusive only to evict it
+    - <entry>.dl.lock  flock() target: exclusive while one process downloads the video
+
+    Least-recently-used entries (by mtime, bumped on every hit) are evicted once the cache exceeds
+    `max_bytes`. Entries locked by a running task are never evicted.
+    """
+
+    STATS_KEY_PREFIX = "worker_video_cache:stats"
+
+    def __init__(self, storage: FileStorageService, cache_dir: str, max_bytes: int, redis_client=None, enabled: bool = True):
+        self.storage = storage
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.redis = redis_client
+        self.enabled = enabled and fcntl is not None
+        self.hostname = socket.gethostname()
+
+    # --- Paths ---
+
+    def _entry_base(self, storage_key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(storage_key.encode()).hexdigest())
+
+    def _video_path(self, base: str, storage_key: str) -> str:
+        extension = os.path.splitext(storage_key)[1] or ".mp4"
+        return base + extension
+
+    # --- Metrics ---
+
+    def _record(self, **counters: int) -> None:
+        if self.redis is None:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for name, value in counters.items():
+                pipe.hincrby(f"{self.STATS_KEY_PREFIX}:{self.hostname}", name, value)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to record video cache metrics: {e}")
+
+    def stats(self) -> dict:
+        """
+        Hit/miss and bytes-saved counters per worker node, plus their totals.
+        """
+        nodes = {}
+        totals = {"hits": 0, "misses": 0, "bytes_saved": 0, "bytes_downloaded": 0, "evictions": 0}
+        for key in self.redis.scan_iter(match=f"{self.STATS_KEY_PREFIX}:*"):
+            host = key.decode().rsplit(":", 1)[1]
+            counters = {k.decode(): int(v) for k, v in self.redis.hgetall(key).items()}
+            nodes[host] = counters
+            for name in totals:
+                totals[name] += counters.get(name, 0)
+        lookups = totals["hits"] + totals["misses"]
+        totals["hit_rate"] = round(totals["hits"] / lookups, 4) if lookups else 0.0
+        return {"totals": totals, "nodes": nodes}
+
+    # --- Cache ---
+
+    def _is_valid(self, video_path: str, meta_path: str, expected_sha256: str | None) -> bool:
+        """
+        Integrity check before reuse: the file must match the size recorded when it was downloaded
+        (and the content hash, if the database knows it).
+        """
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if os.path.getsize(video_path) != meta["size_bytes"]:
+                return False
+            if expected_sha256 and meta.get("sha256") and meta["sha256"] != expected_sha256:
+                return False
+            return True
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def _download(self, storage_key: str, video_path: str, meta_path: str, expected_sha256: str | None) -> int:
+        """
+        Downloads into a private temp file, verifies it, and atomically renames it into place.
+        """
+        temp_path = f"{video_path}.part.{os.getpid()}"
+        try:
+            self.storage.download_file(storage_key, temp_path)
+            size_bytes = os.path.getsize(temp_path)
+
+            expected_size = self.storage.get_object_size(storage_key)
+            if size_bytes != expected_size:
+                raise Exception(f"Downloaded {size_bytes} bytes for {storage_key}, expected {expected_size}")
+
+            sha256 = None
+            if expected_sha256:
+                hasher = hashlib.sha256()
+                with open(temp_path, "rb") as f:
+                    for block in iter(lambda: f.read(8 * 1024 * 1024), b""):
+                        hasher.update(block)
+                sha256 = hasher.hexdigest()
+                if sha256 != expected_sha256:
+                    raise Exception(f"Checksum mismatch for {storage_key}")
+
+            os.replace(temp_path, video_path)
+            with open(f"{meta_path}.tmp.{os.getpid()}", "w") as f:
+                json.dump({"storage_key": storage_key, "size_bytes": size_bytes, "sha256": sha256}, f)
+            os.replace(f"{meta_path}.tmp.{os.getpid()}", meta_path)
+            return size_bytes
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _acquire(self, lock_path: str, operation: int):
+        """
+        Opens and flock()s `lock_path`; closing the returned file releases the lock.
+        Lock files are deleted along with their evicted entry, so after locking we check that the
+        file we hold is still the one at `lock_path` (otherwise we locked an orphan and retry).
+        Raises BlockingIOError when `operation` includes LOCK_NB and the lock is taken.
+        """
+        while True:
+            lock_file = open(lock_path, "a+")
+            try:
+                fcntl.flock(lock_file, operation)
+                if os.fstat(lock_file.fileno()).st_ino == os.stat(lock_path).st_ino:
+                    return lock_file
+            except FileNotFoundError:
+                pass
+            except BaseException:
+                lock_file.close()
+                raise
+            lock_file.close()
+
+    def _fill(self, storage_key: str, base: str, video_path: str, meta_path: str, expected_sha256: str | None):
+        """
+        Downloads a missing video under its entry's download lock, so two processes never download
+        the same video twice, and returns a shared lock on the entry once the file is in place.
+        The download lock is separate from the readers' lock: converting a held shared flock() to
+        exclusive isn't atomic and would also wait for every task still reading the file.
+        """
+        while True:
+            download_lock = self._acquire(base + ".dl.lock", fcntl.LOCK_EX)
+            try:
+                if self._is_valid(video_path, meta_path, expected_sha256):
+                    # Another process finished the download while we were waiting
+                    self._record(hits=1, bytes_saved=os.path.getsize(video_path))
+                else:
+                    logger.info(f"Video cache miss for {storage_key}. Downloading...")
+                    size_bytes = self._download(storage_key, video_path, meta_path, expected_sha256)
+                    self._record(misses=1, bytes_downloaded=size_bytes)
+                # Eviction skips entries whose download lock is held, so the file can't go away
+                # between the download and taking the shared lock
+                reader_lock = self._acquire(base + ".lock", fcntl.LOCK_SH)
+            finally:
+                download_lock.close()
+            if self._is_valid(video_path, meta_path, expected_sha256):
+                return reader_lock
+            reader_lock.close()
+
+    @contextmanager
+    def checkout(self, storage_key: str, expected_sha256: str | None = None) -> Iterator[str]:
+        """
+        Yields a local path to the video, downloading it only if it isn't cached yet.
+        The file is guaranteed to stay in place until the `with` block exits.
+        """
+        if not self.enabled:
+            # No cache (or no flock on this platform): plain per-task download
+            temp_path = os.path.join(self.cache_dir, f"uncached-{os.getpid()}-{os.path.basename(storage_key)}")
+            os.makedirs(self.cache_dir, exist_ok=True)
+            try:
+                self.storage.download_file(storage_key, temp_path)
+                yield temp_path
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        base = self._entry_base(storage_key)
+        video_path = self._video_path(base, storage_key)
+        meta_path = base + ".json"
+
+        # Shared lock while we use the file: other tasks may read the same video concurrently,
+        # but eviction (which needs an exclusive lock) must wait for us
+        reader_lock = self._acquire(base + ".lock", fcntl.LOCK_SH)
+        try:
+            if self._is_valid(video_path, meta_path, expected_sha256):
+                size_bytes = os.path.getsize(video_path)
+                os.utime(video_path) # Bump for LRU
+                self._record(hits=1, bytes_saved=size_bytes)
+                logger.info(f"Video cache hit for {storage_key} ({size_bytes} bytes not re-downloaded).")
+            else:
+                reader_lock.close()
+                reader_lock = self._fill(storage_key, base, video_path, meta_path, expected_sha256)
+
+            yield video_path
+        finally:
+            reader_lock.close()
+
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Deletes least-recently-used videos (with their metadata and lock files) until the cache
+        fits into `max_bytes`. Videos currently checked out or being downloaded are skipped.
+        """
+        with open(os.path.join(self.cache_dir, ".evict.lock"), "a+") as evict_lock:
+            fcntl.flock(evict_lock, fcntl.LOCK_EX)
+            try:
+                entries = []
+                for name in os.listdir(self.cache_dir):
+                    base, extension = os.path.splitext(name)
+                    if extension in (".json", ".lock") or ".part." in name or ".tmp." in name or name.startswith("."):
+                        continue
+                    path = os.path.join(self.cache_dir, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, os.path.join(self.cache_dir, base), path))
+
+                total_bytes = sum(size for _, size, _, _ in entries)
+                for _, size_bytes, base, path in sorted(entries):
+                    if total_bytes <= self.max_bytes:
+                        break
+                    try:
+                        reader_lock = self._acquire(base + ".lock", fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue # In use by a running task
+                    try:
+                        try:
+                            download_lock = self._acquire(base + ".dl.lock", fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        except BlockingIOError:
+                            continue # Being re-downloaded
+                        try:
+                            # The lock files go last, while we still hold them: anyone who opened
+                            # them meanwhile notices the unlink in _acquire and starts over
+                            for stale in (path, base + ".json", base + ".dl.lock", base + ".lock"):
+                                if os.path.exists(stale):
+                                    os.remove(stale)
+                            total_bytes -= size_bytes
+                            self._record(evictions=1)
+                            logger.info(f"Evicted {path} from the video cache ({size_bytes} bytes).")
+                        finally:
+                            download_lock.close()
+                    finally:
+                        reader_lock.close()
+            finally:
+                fcntl.flock(evict_lock, fcntl.LOCK_UN)
+
+def _build_local_video_cache() -> LocalVideoCache:
+    from app.core.redis import get_redis_client
+    return LocalVideoCache(
+        file_storage_service,
+        cache_dir=settings.WORKER_VIDEO_CACHE_DIR,
+        max_bytes=int(settings.WORKER_VIDEO_CACHE_MAX_GB * 1024 ** 3),
+        redis_client=get_redis_client(),
+        enabled=settings.WORKER_VIDEO_CACHE_ENABLED
+    )
+
+local_video_cache = _build_local_video_cache()
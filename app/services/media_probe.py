@@ -0,0 +1,177 @@
+import struct
+import logging
+from typing import Callable, Dict, Any, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Reads only the container headers of a stored MP4/MOV (ISO base media file), never the media data:
+# the top-level boxes are walked by their 8/16-byte headers (skipping `mdat`, which holds the
+# actual frames), and only the `moov` box, a few KB to a few MB even for multi-GB files, is read
+# in full. Everything comes from HTTP range reads, so probing costs kilobytes and a few requests.
+
+# Top-level box types of an ISO base media file; anything else means this isn't one
+ISO_TOP_LEVEL_BOXES = {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"uuid", b"moof", b"mfra", b"styp", b"sidx", b"pdin", b"meta"}
+
+# The bitrate is stored in a 32-bit integer column; anything above this (a near-zero duration
+# in a broken header) is not a real bitrate and is dropped
+MAX_BITRATE = 2**31 - 1
+
+# Path from a track's `mdia` box down to its sample descriptions (which name the codec)
+SAMPLE_DESCRIPTION_PATH = (b"minf", b"stbl", b"stsd")
+
+def iter_boxes(data: bytes, start: int = 0, end: int | None = None) -> Iterator[Tuple[bytes, int, int]]:
+    """
+    Yields (type, payload_start, box_end) of every box in data[start:end], stopping at the first
+    truncated or malformed one.
+    """
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header_size = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size or offset + size > end:
+            return
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+def find_box(data: bytes, start: int, end: int, box_type: bytes) -> Tuple[int, int] | None:
+    for found_type, payload_start, box_end in iter_boxes(data, start, end):
+        if found_type == box_type:
+            return payload_start, box_end
+    return None
+
+def parse_mvhd(data: bytes, start: int) -> float | None:
+    """
+    Movie duration in seconds from the movie header.
+    """
+    version = data[start]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, start + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, start + 12)
+    return duration / timescale if timescale else None
+
+def parse_trak(data: bytes, start: int, end: int) -> Dict[str, Any]:
+    """
+    Handler type ('vide', 'soun', ...), codec (sample entry fourcc) and, for video, the
+    display size of one track.
+    """
+    track: Dict[str, Any] = {}
+    tkhd = find_box(data, start, end, b"tkhd")
+    if tkhd:
+        # width/height are 16.16 fixed point after the version-dependent times and the matrix
+        width_offset = tkhd[0] + 4 + (32 if data[tkhd[0]] == 1 else 20) + 52
+        if width_offset + 8 <= tkhd[1]:
+            width, height = struct.unpack_from(">II", data, width_offset)
+            track["width"], track["height"] = width >> 16, height >> 16
+
+    mdia = find_box(data, start, end, b"mdia")
+    if not mdia:
+        return track
+    hdlr = find_box(data, mdia[0], mdia[1], b"hdlr")
+    if hdlr and hdlr[0] + 12 <= hdlr[1]:
+        track["handler"] = data[hdlr[0] + 8:hdlr[0] + 12]
+
+    box = mdia
+    for box_type in SAMPLE_DESCRIPTION_PATH:
+        box = find_box(data, box[0], box[1], box_type)
+        if not box:
+            return track
+    # stsd: version/flags, entry count, then the first sample entry (size, format)
+    if box[0] + 16 <= box[1]:
+        track["codec"] = data[box[0] + 12:box[0] + 16].decode("latin-1").strip()
+    return track
+
+def parse_moov(data: bytes) -> Dict[str, Any]:
+    """
+    Duration, resolution and codecs from a complete `moov` payload.
+    """
+    info: Dict[str, Any] = {"duration_seconds": None, "width": None, "height": None, "video_codec": None, "audio_codec": None}
+    for box_type, payload_start, box_end in iter_boxes(data):
+        if box_type == b"mvhd":
+            info["duration_seconds"] = parse_mvhd(data, payload_start)
+        elif box_type == b"trak":
+            track = parse_trak(data, payload_start, box_end)
+            if track.get("handler") == b"vide" and info["video_codec"] is None:
+                info["video_codec"] = track.get("codec")
+                info["width"], info["height"] = track.get("width"), track.get("height")
+            elif track.get("handler") == b"soun" and info["audio_codec"] is None:
+                info["audio_codec"] = track.get("codec")
+    return info
+
+def probe_mp4(read_range: Callable[[int, int], bytes], size_bytes: int, head_bytes: int, max_header_bytes: int) -> Dict[str, Any] | None:
+    """
+    Probes an MP4/MOV of `size_bytes` through `read_range(start, end)` (inclusive byte range).
+    Returns None when the file isn't an ISO base media file or has no readable `moov` box.
+    """
+    # One read covers the start of the file: ftyp and, for faststart files, usually all of moov
+    head = read_range(0, min(head_bytes, size_bytes) - 1)
+    bytes_read = len(head)
+
+    moov_offset = moov_size = moov_header = media_offset = None
+    offset = 0
+    while offset + 8 <= size_bytes:
+        header = head[offset:offset + 16] if offset + 16 <= len(head) else None
+        if header is None:
+            header = read_range(offset, min(offset + 16, size_bytes) - 1)
+            bytes_read += len(header)
+        box_size, box_type = struct.unpack_from(">I4s", header)
+        header_size = 8
+        if box_size == 1 and len(header) >= 16:
+            box_size, header_size = struct.unpack_from(">Q", header, 8)[0], 16
+        elif box_size == 0:
+            box_size = size_bytes - offset
+        if box_type not in ISO_TOP_LEVEL_BOXES or box_size < header_size:
+            if offset == 0:
+                return None # Not an MP4/MOV
+            break
+        if box_type == b"moov" and moov_offset is None:
+            moov_offset, moov_size, moov_header = offset, box_size, header_size
+        elif box_type in (b"mdat", b"moof") and media_offset is None:
+            media_offset = offset
+        if moov_offset is not None and media_offset is not None:
+            break
+        offset += box_size
+
+    if moov_offset is None or moov_size > max_header_bytes:
+        logger.warning(f"No readable moov box (offset {moov_offset}, size {moov_size})")
+        return None
+
+    moov_end = moov_offset + moov_size
+    if moov_end <= len(head):
+        moov = head[moov_offset + moov_header:moov_end]
+    else:
+        moov = read_range(moov_offset + moov_header, moov_end - 1)
+        bytes_read += len(moov)
+
+    info = parse_moov(moov)
+    duration = info["duration_seconds"]
+    bitrate = int(size_bytes * 8 / duration) if duration else None
+    info.update({
+        "bitrate": bitrate if bitrate is not None and bitrate <= MAX_BITRATE else None,
+        # Playable while downloading only when the index comes before the media data
+        "is_faststart": media_offset is None or moov_offset < media_offset,
+        "probe_bytes": bytes_read
+    })
+    return info
+
+def probe_stored_video(storage, object_key: str, head_bytes: int, max_header_bytes: int) -> Dict[str, Any] | None:
+    """
+    Probes a video stored in S3/MinIO with ranged GETs (see FileStorageService.read_range).
+    """
+    size_bytes = storage.get_object_size(object_key)
+    if size_bytes < 8:
+        return None
+    return probe_mp4(
+        lambda start, end: storage.read_range(object_key, start, end),
+        size_bytes,
+        head_bytes=head_bytes,
+        max_header_bytes=max_header_bytes
+    )
@@ -0,0 +1,131 @@
+import base64
+import json
+import uuid
+from sqlalchemy import func, or_, literal, tuple_, cast, String, Double
+from sqlalchemy.orm import Session
+from fastapi import Depends
+from app.models.moment import CharacterMoment, ACTION_TSVECTOR
+from app.models.character_screenshot_metadata import CharacterScreenshotMetadata, normalized_character_name
+from app.db.database import get_db
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Must match the configuration of ACTION_TSVECTOR
+TEXT_SEARCH_CONFIG = "english"
+
+def encode_search_cursor(rank: float, moment_id: uuid.UUID) -> str:
+    """
+    Encodes the (rank, id) position of the last result on a page as an opaque cursor.
+    """
+    payload = json.dumps({"rank": rank, "id": str(moment_id)})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_search_cursor(cursor: str) -> tuple[float, uuid.UUID]:
+    """
+    Reverses encode_search_cursor. Raises ValueError for anything that isn't a cursor we issued.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(payload["rank"]), uuid.UUID(payload["id"])
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+class MomentSearchService:
+    """
+    Text search over the `action` descriptions of every CharacterMoment.
+
+    A moment matches when its words match the query (Postgres full-text search on
+    ACTION_TSVECTOR, an expression GIN index) OR the query is a fuzzy substring of the action (pg_trgm
+    word similarity, GIN-indexed), so typos and partial words still find results.
+    Both conditions are index-backed, so Postgres answers with a BitmapOr of the two GIN indexes
+    (combined with the video/character indexes when filtering) and never scans the whole table.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def search_moments(self, query: str, video_id: str | None = None, character_name: str | None = None,
+                       min_confidence: float | None = None, limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None) -> dict:
+        """
+        Returns one page of matching moments, best match first, with keyset pagination on (rank, id).
+        Raises ValueError for an empty query, a malformed video_id or an invalid cursor.
+        """
+        query = " ".join(query.split())
+        if not query:
+            raise ValueError("The search query must not be empty.")
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        ts_query = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, query)
+        query_literal = literal(query, String)
+        # Full-text relevance (normalized to 0..1) plus trigram closeness, so exact word matches rank first.
+        # Both functions return float4; the rank is widened to float8 so the value encoded in the
+        # cursor compares exactly equal to the stored one and ties on rank page by id.
+        rank = cast(
+            func.ts_rank_cd(ACTION_TSVECTOR, ts_query, 32) + func.word_similarity(query_literal, CharacterMoment.action),
+            Double
+        )
+
+        results = (
+            self.db.query(
+                CharacterMoment.id,
+                CharacterMoment.video_id,
+                CharacterMoment.character_id,
+                CharacterScreenshotMetadata.character_name,
+                CharacterMoment.action,
+                CharacterMoment.start_timestamp,
+                CharacterMoment.end_timestamp,
+                CharacterMoment.confidence_score,
+                rank.label("rank")
+            )
+            .join(CharacterScreenshotMetadata, CharacterMoment.character_id == CharacterScreenshotMetadata.id)
+            .filter(or_(
+                ACTION_TSVECTOR.op("@@")(ts_query),
+                query_literal.op("<%")(CharacterMoment.action)
+            ))
+        )
+
+        if video_id:
+            try:
+                results = results.filter(CharacterMoment.video_id == uuid.UUID(str(video_id)))
+            except ValueError:
+                raise ValueError("Invalid video_id")
+        if character_name:
+            results = results.filter(
+                normalized_character_name(CharacterScreenshotMetadata.character_name) == normalized_character_name(character_name)
+            )
+        if min_confidence is not None:
+            results = results.filter(CharacterMoment.confidence_score >= min_confidence)
+        if cursor:
+            cursor_rank, cursor_id = decode_search_cursor(cursor)
+            results = results.filter(tuple_(rank, CharacterMoment.id) < tuple_(cursor_rank, cursor_id))
+
+        # Fetch one extra row to find out whether another page exists
+        rows = results.order_by(rank.desc(), CharacterMoment.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        return {
+            "moments": [self._row_to_dict(row) for row in rows],
+            "next_cursor": encode_search_cursor(rows[-1].rank, rows[-1].id) if has_more else None
+        }
+
+    @staticmethod
+    def _row_to_dict(row) -> dict:
+        return {
+            "moment_id": str(row.id),
+            "video_id": str(row.video_id),
+            "character_id": str(row.character_id),
+            "character_name": row.character_name,
+            "action": row.action,
+            "start_timestamp": row.start_timestamp,
+            "end_timestamp": row.end_timestamp,
+            "confidence_score": row.confidence_score,
+            "rank": round(float(row.rank), 4)
+        }
+
+def get_moment_search_service(db: Session = Depends(get_db)) -> MomentSearchService:
+    return MomentSearchService(db)
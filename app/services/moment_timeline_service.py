@@ -0,0 +1,154 @@
+import uuid
+from typing import List, Dict, Any
+from sqlalchemy import func, delete, tuple_, cast, Numeric
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from fastapi import Depends
+from app.core.config import settings
+from app.models.moment import CharacterMoment
+from app.models.video_metadata import VideoMetadata
+from app.models.character_screenshot_metadata import CharacterScreenshotMetadata
+from app.db.database import get_db
+import logging
+
+logger = logging.getLogger(__name__)
+
+def normalize_moments(moments: List[Dict[str, Any]], merge_gap_seconds: float) -> List[Dict[str, Any]]:
+    """
+    Merges overlapping (or nearly adjacent, within `merge_gap_seconds`) intervals of ONE character
+    into a single moment, keeping the description of the most confident one.
+    Zero-length moments (a single frame) are kept; inverted intervals are dropped and logged.
+    The result is sorted and non-overlapping.
+    """
+    inverted = [m for m in moments if m["end_timestamp"] < m["start_timestamp"]]
+    if inverted:
+        logger.warning(
+            f"Dropping {len(inverted)} inverted moment(s): "
+            + ", ".join(f"{m['start_timestamp']}-{m['end_timestamp']}s" for m in inverted[:10])
+        )
+    intervals = sorted(
+        (m for m in moments if m["end_timestamp"] >= m["start_timestamp"]),
+        key=lambda m: (m["start_timestamp"], m["end_timestamp"])
+    )
+    merged: List[Dict[str, Any]] = []
+    for moment in intervals:
+        previous = merged[-1] if merged else None
+        if previous and moment["start_timestamp"] <= previous["end_timestamp"] + merge_gap_seconds:
+            best = moment if moment["confidence_score"] > previous["confidence_score"] else previous
+            merged[-1] = {
+                **best,
+                "start_timestamp": previous["start_timestamp"],
+                "end_timestamp": max(previous["end_timestamp"], moment["end_timestamp"])
+            }
+        else:
+            merged.append(dict(moment))
+    return merged
+
+class MomentTimelineService:
+    """
+    Owns how moments are written and queried as a timeline.
+
+    Each character's moments are stored normalized: non-overlapping intervals, unique per
+    (character, start, end), with a generated `time_range` (numrange) GiST-indexed together with
+    the video, so "who is on screen between t1 and t2" is a single index lookup.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def save_moments(self, video: VideoMetadata, screenshot: CharacterScreenshotMetadata, moments_data: List[Dict[str, Any]]) -> int:
+        """
+        Merges the engine's moments for this screenshot into its stored timeline, in the caller's
+        transaction (the caller commits). Idempotent: saving the same result twice (e.g. a retried
+        task) changes nothing. Returns the number of moments the character now has in this video.
+        """
+        moments = [
+            {
+                "action": m.get("action") or f"Found {screenshot.character_name}",
+                "start_timestamp": float(m.get("start_timestamp", 0.0)),
+                "end_timestamp": float(m.get("end_timestamp", 0.0)),
+                "confidence_score": float(m.get("confidence_score", 0.0))
+            }
+            for m in moments_data
+        ]
+        if video.scene_boundaries is not None:
+            from app.services.scene_detector import unpack_boundaries, snap_moments_to_scenes
+            moments = snap_moments_to_scenes(
+                moments, unpack_boundaries(video.scene_boundaries), video.duration_seconds, settings.SCENE_SNAP_TOLERANCE_SECONDS
+            )
+
+        # Serialize concurrent writers of the same character's timeline
+        self.db.query(CharacterScreenshotMetadata.id).filter(CharacterScreenshotMetadata.id == screenshot.id).with_for_update().first()
+
+        existing = [
+            {"action": r.action, "start_timestamp": r.start_timestamp, "end_timestamp": r.end_timestamp, "confidence_score": r.confidence_score}
+            for r in self.db.query(
+                CharacterMoment.action, CharacterMoment.start_timestamp, CharacterMoment.end_timestamp, CharacterMoment.confidence_score
+            ).filter(CharacterMoment.character_id == screenshot.id)
+        ]
+        timeline = normalize_moments(existing + moments, settings.MOMENT_MERGE_GAP_SECONDS)
+
+        # Remove the intervals that were merged into bigger ones...
+        keep = [(m["start_timestamp"], m["end_timestamp"]) for m in timeline]
+        stale = delete(CharacterMoment).where(CharacterMoment.character_id == screenshot.id)
+        if keep:
+            stale = stale.where(tuple_(CharacterMoment.start_timestamp, CharacterMoment.end_timestamp).not_in(keep))
+        self.db.execute(stale)
+
+        # ...and bulk-upsert the timeline in one statement; intervals already stored keep their row
+        if timeline:
+            statement = insert(CharacterMoment).values([
+                {"id": uuid.uuid4(), "video_id": video.id, "character_id": screenshot.id, **m}
+                for m in timeline
+            ])
+            self.db.execute(statement.on_conflict_do_update(
+                constraint="uq_character_moments_character_id_start_end",
+                set_={"action": statement.excluded.action, "confidence_score": statement.excluded.confidence_score}
+            ))
+        return len(timeline)
+
+    def characters_on_screen(self, video_id: str, start: float, end: float) -> List[Dict[str, Any]]:
+        """
+        Every character with a moment overlapping [start, end] in this video, answered from the
+        (video_id, time_range) GiST index. Raises ValueError for a malformed video_id or range.
+        """
+        try:
+            video_uuid = uuid.UUID(str(video_id))
+        except ValueError:
+            raise ValueError("Invalid video_id")
+        if end < start:
+            raise ValueError("The end of the range must not be before its start.")
+
+        window = func.numrange(cast(start, Numeric), cast(end, Numeric), "[]")
+        rows = (
+            self.db.query(
+                CharacterMoment.character_id,
+                CharacterScreenshotMetadata.character_name,
+                CharacterMoment.action,
+                CharacterMoment.start_timestamp,
+                CharacterMoment.end_timestamp,
+                CharacterMoment.confidence_score
+            )
+            .join(CharacterScreenshotMetadata, CharacterMoment.character_id == CharacterScreenshotMetadata.id)
+            .filter(CharacterMoment.video_id == video_uuid, CharacterMoment.time_range.op("&&")(window))
+            .order_by(CharacterScreenshotMetadata.character_name, CharacterMoment.start_timestamp)
+            .all()
+        )
+
+        characters: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            character = characters.setdefault(str(row.character_id), {
+                "character_id": str(row.character_id),
+                "character_name": row.character_name,
+                "moments": []
+            })
+            character["moments"].append({
+                "action": row.action,
+                "start_timestamp": row.start_timestamp,
+                "end_timestamp": row.end_timestamp,
+                "confidence_score": row.confidence_score
+            })
+        return list(characters.values())
+
+def get_moment_timeline_service(db: Session = Depends(get_db)) -> MomentTimelineService:
+    return MomentTimelineService(db)
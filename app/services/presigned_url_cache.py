@@ -0,0 +1,177 @@
+import time
+import threading
+import logging
+from collections import OrderedDict
+from app.core.config import settings
+from app.services.file_storage_service import FileStorageService, file_storage_service
+
+logger = logging.getLogger(__name__)
+
+class PresignedUrlCache:
+    """
+    Caches presigned playback URLs by storage_key so listing thousands of videos does not
+    re-sign thousands of URLs on every request.
+
+    A URL is reused until `safety_margin_seconds` before it actually expires, so the browser
+    always receives a link that is valid for at least that long.
+    - Level 1: an in-process LRU (bounded by `max_entries`).
+    - Level 2 (optional): Redis, shared by every API worker. Values are stored with a Redis TTL,
+      so expired URLs disappear on their own.
+    """
+
+    REDIS_KEY_PREFIX = "presigned_url"
+
+    def __init__(self, storage: FileStorageService, max_entries: int, safety_margin_seconds: int, redis_client=None):
+        self.storage = storage
+        self.max_entries = max(max_entries, 1)
+        self.safety_margin_seconds = safety_margin_seconds
+        self.redis = redis_client
+
+        # storage_key/expiration -> (url, reuse_until as a unix timestamp)
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _cache_key(self, object_key: str, expiration_seconds: int) -> str:
+        return f"{expiration_seconds}:{object_key}"
+
+    def _get_local(self, cache_key: str, now: float) -> str | None:
+        entry = self._entries.get(cache_key)
+        if entry is None:
+            return None
+        url, reuse_until = entry
+        if now >= reuse_until:
+            del self._entries[cache_key]
+            return None
+        self._entries.move_to_end(cache_key)
+        return url
+
+    def _put_local(self, cache_key: str, url: str, reuse_until: float) -> None:
+        self._entries[cache_key] = (url, reuse_until)
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_url(self, object_key: str, expiration_seconds: int = 3600) -> str:
+        """
+        Returns a presigned URL for a single object, signing a new one only on a cache miss.
+        """
+        return self.get_urls([object_key], expiration_seconds)[object_key]
+
+    def get_urls(self, object_keys: list[str], expiration_seconds: int = 3600) -> dict[str, str]:
+        """
+        Batch version of get_url, used by the listing endpoint.
+        Local misses are looked up in Redis with a single MGET and written back with a single pipeline.
+        """
+        now = time.time()
+        urls: dict[str, str] = {}
+        missing: list[str] = []
+
+        with self._lock:
+            for object_key in dict.fromkeys(object_keys):
+                url = self._get_local(self._cache_key(object_key, expiration_seconds), now)
+                if url is not None:
+                    self.hits += 1
+                    urls[object_key] = url
+                else:
+                    missing.append(object_key)
+
+        if not missing:
+            return urls
+
+        # Level 2: the shared Redis cache
+        if self.redis is not None:
+            try:
+                redis_keys = [f"{self.REDIS_KEY_PREFIX}:{self._cache_key(k, expiration_seconds)}" for k in missing]
+                still_missing = []
+                with self._lock:
+                    for object_key, value in zip(missing, self.redis.mget(redis_keys)):
+                        if value is None:
+                            still_missing.append(object_key)
+                            continue
+                        reuse_until, url = value.decode().split("|", 1)
+                        self.redis_hits += 1
+                        urls[object_key] = url
+                        self._put_local(self._cache_key(object_key, expiration_seconds), url, float(reuse_until))
+                missing = still_missing
+            except Exception as e:
+                logger.error(f"Presigned URL cache could not read from Redis: {e}")
+
+        if not missing:
+            return urls
+
+        # Cache miss: actually sign the URLs
+        reuse_for = max(expiration_seconds - self.safety_margin_seconds, 0)
+        reuse_until = now + reuse_for
+        signed = {k: self.storage.get_presigned_url(k, expiration_seconds) for k in missing}
+
+        with self._lock:
+            self.misses += len(missing)
+            for object_key, url in signed.items():
+                # get_presigned_url returns "" on failure; never cache that
+                if url and reuse_for > 0:
+                    self._put_local(self._cache_key(object_key, expiration_seconds), url, reuse_until)
+        urls.update(signed)
+
+        if self.redis is not None and reuse_for > 0:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for object_key, url in signed.items():
+                    if url:
+                        redis_key = f"{self.REDIS_KEY_PREFIX}:{self._cache_key(object_key, expiration_seconds)}"
+                        pipe.setex(redis_key, int(reuse_for), f"{reuse_until}|{url}")
+                pipe.execute()
+            except Exception as e:
+                logger.error(f"Presigned URL cache could not write to Redis: {e}")
+
+        return urls
+
+    def invalidate(self, object_key: str) -> None:
+        """
+        Drops every cached URL for an object (e.g. after it was deleted or replaced).
+        """
+        with self._lock:
+            for cache_key in [k for k in self._entries if k.split(":", 1)[1] == object_key]:
+                del self._entries[cache_key]
+        if self.redis is not None:
+            try:
+                stale = list(self.redis.scan_iter(match=f"{self.REDIS_KEY_PREFIX}:*:{object_key}"))
+                if stale:
+                    self.redis.delete(*stale)
+            except Exception as e:
+                logger.error(f"Presigned URL cache could not invalidate Redis entries: {e}")
+
+    def stats(self) -> dict:
+        """
+        Hit/miss counters so we can verify the cache is doing its job.
+        """
+        with self._lock:
+            lookups = self.hits + self.redis_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+                "redis_enabled": self.redis is not None
+            }
+
+def _build_redis_client():
+    if not settings.PRESIGNED_URL_CACHE_REDIS_URL:
+        return None
+    import redis
+    return redis.Redis.from_url(settings.PRESIGNED_URL_CACHE_REDIS_URL)
+
+presigned_url_cache = PresignedUrlCache(
+    file_storage_service,
+    max_entries=settings.PRESIGNED_URL_CACHE_MAX_ENTRIES,
+    safety_margin_seconds=settings.PRESIGNED_URL_CACHE_SAFETY_MARGIN_SECONDS,
+    redis_client=_build_redis_client()
+)
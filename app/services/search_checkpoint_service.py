@@ -0,0 +1,79 @@
+import json
+import logging
+from typing import Dict, Any
+from app.core.config import settings
+from app.core.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+class SearchCheckpoints:
+    """
+    Durable progress of character searches, so a retried (or redelivered) search resumes at its
+    first incomplete stage instead of redoing the download, the upload and the engine call.
+
+    Each stage leaves its output somewhere that survives the worker:
+    - downloaded: the video sits in the worker-local cache; the checkpoint records which host has it
+    - engine file ready: the uploaded video is registered in the shared GeminiFileRegistry
+    - engine response: the raw moments are stored in the checkpoint below
+    - moments persisted: the screenshot row is committed with is_processed = True
+
+    Checkpoints live in one Redis hash per (screenshot, analysis cache key), so a checkpoint left by
+    another engine/model is never reused. They are cleared once the moments are persisted and
+    expire after `ttl_seconds` otherwise.
+    """
+
+    KEY_PREFIX = "search_checkpoint"
+    STAGES = ("downloaded", "engine_response")
+
+    def __init__(self, redis_client, ttl_seconds: int):
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+
+    def _key(self, screenshot_id: str, cache_key: str) -> str:
+        return f"{self.KEY_PREFIX}:{screenshot_id}:{cache_key}"
+
+    def load(self, screenshot_id: str, cache_key: str) -> Dict[str, Any]:
+        """
+        The outputs of the stages this search already completed, by stage name.
+        Lookup failures are logged and treated as "nothing completed yet".
+        """
+        try:
+            fields = {k.decode(): v for k, v in self.redis.hgetall(self._key(screenshot_id, cache_key)).items()}
+        except Exception as e:
+            logger.error(f"Failed to load the checkpoint of screenshot ID {screenshot_id}: {e}")
+            return {}
+        return {stage: json.loads(fields[stage]) for stage in self.STAGES if stage in fields}
+
+    def record(self, screenshot_id: str, cache_key: str, stage: str, output: Any) -> None:
+        """
+        Marks `stage` as done with its (JSON-serializable) output. Best effort: a failed write
+        only means a retry redoes the stage.
+        """
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hset(self._key(screenshot_id, cache_key), stage, json.dumps(output))
+            pipe.expire(self._key(screenshot_id, cache_key), self.ttl_seconds)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to checkpoint stage '{stage}' of screenshot ID {screenshot_id}: {e}")
+
+    def count_failure(self, screenshot_id: str, cache_key: str) -> int:
+        """
+        Counts one more transient failure of this search and returns the total so far.
+        """
+        pipe = self.redis.pipeline()
+        pipe.hincrby(self._key(screenshot_id, cache_key), "failures", 1)
+        pipe.expire(self._key(screenshot_id, cache_key), self.ttl_seconds)
+        failures, _ = pipe.execute()
+        return int(failures)
+
+    def clear(self, screenshot_id: str, cache_key: str) -> None:
+        try:
+            self.redis.delete(self._key(screenshot_id, cache_key))
+        except Exception as e:
+            logger.error(f"Failed to clear the checkpoint of screenshot ID {screenshot_id}: {e}")
+
+search_checkpoints = SearchCheckpoints(
+    get_redis_client(),
+    ttl_seconds=settings.SEARCH_CHECKPOINT_TTL_HOURS * 3600
+)
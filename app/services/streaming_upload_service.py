@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import AsyncIterator
+from fastapi.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.services.file_storage_service import FileStorageService, file_storage_service
+
+logger = logging.getLogger(__name__)
+
+# S3 rejects multipart parts smaller than 5 MiB (except for the final part)
+MIN_PART_SIZE_BYTES = 5 * 1024 * 1024
+
+class StreamingUploadService:
+    """
+    Streams an incoming byte stream (e.g. a raw HTTP request body) straight into an
+    S3 multipart upload without spooling it to local disk first.
+
+    The body is cut into fixed-size parts and each part is pushed to S3 on a worker thread,
+    so the blocking boto3 calls never run on the event loop. At most `concurrency` parts are
+    in flight at any time, which also caps the memory a single upload can hold to roughly
+    `part_size * concurrency` bytes.
+    """
+
+    def __init__(self, storage: FileStorageService, part_size: int, concurrency: int):
+        self.storage = storage
+        self.part_size = max(part_size, MIN_PART_SIZE_BYTES)
+        self.concurrency = max(concurrency, 1)
+
+    async def upload_stream(self, chunks: AsyncIterator[bytes], filename: str, content_type: str, prefix: str = "") -> dict:
+        """
+        Consumes `chunks` and uploads them as one object.
+        Returns the new object key and its SHA-256, together with transfer statistics (size, duration, bytes/sec).
+        """
+        object_key = self.storage.generate_object_key(filename, prefix)
+        upload_id = await run_in_threadpool(self.storage.create_multipart_upload, object_key, filename, content_type)
+
+        slots = asyncio.Semaphore(self.concurrency)
+        in_flight: list[asyncio.Task] = []
+        buffer = bytearray()
+        total_bytes = 0
+        # Content hash for deduplication, computed incrementally as the body streams past
+        hasher = hashlib.sha256()
+        started_at = time.perf_counter()
+
+        async def send_part(part_number: int, data: bytes) -> dict:
+            try:
+                return await run_in_threadpool(self.storage.upload_part, object_key, upload_id, part_number, data)
+            finally:
+                slots.release()
+
+        async def dispatch(data: bytes) -> None:
+            # Waiting for a free slot here is what applies back-pressure to the client
+            await slots.acquire()
+            # Fail fast instead of streaming gigabytes after a part has already been rejected
+            for task in in_flight:
+                if task.done() and task.exception():
+                    slots.release()
+                    raise task.exception()
+            in_flight.append(asyncio.create_task(send_part(len(in_flight) + 1, data)))
+
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                hasher.update(chunk)
+                total_bytes += len(chunk)
+                while len(buffer) >= self.part_size:
+                    await dispatch(bytes(buffer[:self.part_size]))
+                    del buffer[:self.part_size]
+
+            # The trailing part may be smaller than part_size (or empty for a zero-byte upload)
+            if buffer or not in_flight:
+                await dispatch(bytes(buffer))
+
+            parts = await asyncio.gather(*in_flight)
+            await run_in_threadpool(self.storage.complete_multipart_upload, object_key, upload_id, parts)
+        except BaseException as e:
+            logger.error(f"Streaming upload of {object_key} failed, aborting multipart upload: {e}")
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            await run_in_threadpool(self.storage.abort_multipart_upload, object_key, upload_id)
+            raise
+
+        elapsed = max(time.perf_counter() - started_at, 1e-9)
+        bytes_per_second = total_bytes / elapsed
+        logger.info(
+            f"Streamed {total_bytes} bytes to {object_key} in {len(parts)} parts "
+            f"({elapsed:.2f}s, {bytes_per_second / (1024 * 1024):.2f} MiB/s)"
+        )
+        return {
+            "storage_key": object_key,
+            "sha256": hasher.hexdigest(),
+            "size_bytes": total_bytes,
+            "parts": len(parts),
+            "elapsed_seconds": round(elapsed, 3),
+            "bytes_per_second": round(bytes_per_second, 1)
+        }
+
+streaming_upload_service = StreamingUploadService(
+    file_storage_service,
+    part_size=settings.S3_MULTIPART_PART_SIZE_MB * 1024 * 1024,
+    concurrency=settings.S3_MULTIPART_CONCURRENCY
+)
@@ -0,0 +1,249 @@
+import math
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from fastapi import Depends
+from app.core.config import settings
+from app.models.upload_session import UploadSession, UploadSessionStatus
+from app.db.database import get_db
+from app.services.file_storage_service import FileStorageService, file_storage_service
+from app.services.video_metadata_service import VideoMetadataStorageService
+import logging
+
+logger = logging.getLogger(__name__)
+
+# S3 multipart limits
+MIN_CHUNK_SIZE_BYTES = 5 * 1024 * 1024
+MAX_CHUNKS = 10000
+
+class UploadSessionService:
+    """
+    Implements the resumable upload protocol on top of S3 multipart uploads:
+    create a session -> PUT numbered chunks (in any order, in parallel) -> ask which
+    chunks arrived -> complete.
+
+    S3 itself is the source of truth for which chunks have been received (ListParts),
+    so parallel chunk uploads hitting different API workers never race on our database.
+    """
+
+    def __init__(self, db: Session, storage: FileStorageService):
+        self.db = db
+        self.storage = storage
+
+    def _to_dict(self, upload_session: UploadSession) -> dict:
+        return {
+            "id": str(upload_session.id),
+            "original_filename": upload_session.original_filename,
+            "content_type": upload_session.content_type,
+            "total_size": upload_session.total_size,
+            "chunk_size": upload_session.chunk_size,
+            "total_chunks": upload_session.total_chunks,
+            "status": upload_session.status.value,
+            "video_id": str(upload_session.video_id) if upload_session.video_id else None,
+            "created_at": upload_session.created_at.isoformat(),
+            "updated_at": upload_session.updated_at.isoformat()
+        }
+
+    def _get_session(self, session_id: str, for_update: bool = False) -> UploadSession | None:
+        query = self.db.query(UploadSession).filter(UploadSession.id == session_id)
+        if for_update:
+            query = query.with_for_update()
+        return query.first()
+
+    def create_session(self, filename: str, content_type: str, total_size: int) -> dict:
+        """
+        Opens a new S3 multipart upload and records the session in PostgreSQL.
+        The returned chunk_size is the contract the client must follow for every chunk but the last.
+        """
+        # Grow the chunk size for huge files so we never exceed S3's 10,000-part limit
+        chunk_size = max(settings.S3_MULTIPART_PART_SIZE_MB * 1024 * 1024, MIN_CHUNK_SIZE_BYTES, math.ceil(total_size / MAX_CHUNKS))
+        total_chunks = max(1, math.ceil(total_size / chunk_size))
+
+        object_key = self.storage.generate_object_key(filename, prefix="videos/")
+        upload_id = self.storage.create_multipart_upload(object_key, filename, content_type)
+
+        try:
+            upload_session = UploadSession(
+                original_filename=filename,
+                content_type=content_type,
+                total_size=total_size,
+                chunk_size=chunk_size,
+                total_chunks=total_chunks,
+                storage_key=object_key,
+                s3_upload_id=upload_id,
+                status=UploadSessionStatus.ACTIVE
+            )
+            self.db.add(upload_session)
+            self.db.commit()
+            self.db.refresh(upload_session)
+            return self._to_dict(upload_session)
+        except Exception as e:
+            self.db.rollback()
+            self.storage.abort_multipart_upload(object_key, upload_id)
+            logger.error(f"Failed to create upload session: {e}")
+            raise Exception(f"Database error: {e}")
+
+    def expected_chunk_size(self, upload_session: UploadSession, chunk_number: int) -> int:
+        """
+        Every chunk is exactly chunk_size bytes, except the last one which holds the remainder.
+        """
+        if chunk_number < upload_session.total_chunks:
+            return upload_session.chunk_size
+        return upload_session.total_size - upload_session.chunk_size * (upload_session.total_chunks - 1)
+
+    def upload_chunk(self, session_id: str, chunk_number: int, data: bytes) -> dict | None:
+        """
+        Stores one numbered chunk as the matching S3 multipart part.
+        Re-sending a chunk simply overwrites it, so clients can retry freely.
+        Returns None if the session does not exist.
+        """
+        upload_session = self._get_session(session_id)
+        if not upload_session:
+            return None
+        if upload_session.status != UploadSessionStatus.ACTIVE:
+            raise ValueError(f"Upload session is {upload_session.status.value}")
+        if not 1 <= chunk_number <= upload_session.total_chunks:
+            raise ValueError(f"Chunk number must be between 1 and {upload_session.total_chunks}")
+
+        expected_size = self.expected_chunk_size(upload_session, chunk_number)
+        if len(data) != expected_size:
+            raise ValueError(f"Chunk {chunk_number} must be exactly {expected_size} bytes, got {len(data)}")
+
+        part = self.storage.upload_part(upload_session.storage_key, upload_session.s3_upload_id, chunk_number, data)
+
+        # Bump the activity timestamp so the garbage collector leaves this session alone
+        upload_session.updated_at = datetime.utcnow()
+        self.db.commit()
+
+        return {
+            "chunk_number": chunk_number,
+            "offset": (chunk_number - 1) * upload_session.chunk_size,
+            "size": len(data),
+            "etag": part["ETag"]
+        }
+
+    def get_session_status(self, session_id: str) -> dict | None:
+        """
+        Reports which chunks (and byte offsets) S3 has received, and which are still missing.
+        Returns None if the session does not exist.
+        """
+        upload_session = self._get_session(session_id)
+        if not upload_session:
+            return None
+
+        result = self._to_dict(upload_session)
+        if upload_session.status != UploadSessionStatus.ACTIVE:
+            return result
+
+        parts = self.storage.list_parts(upload_session.storage_key, upload_session.s3_upload_id)
+        received = {p["PartNumber"] for p in parts}
+        result["received_chunks"] = [
+            {"chunk_number": p["PartNumber"], "offset": (p["PartNumber"] - 1) * upload_session.chunk_size, "size": p["Size"]}
+            for p in parts
+        ]
+        result["missing_chunks"] = [n for n in range(1, upload_session.total_chunks + 1) if n not in received]
+        result["bytes_received"] = sum(p["Size"] for p in parts)
+        return result
+
+    def complete_session(self, session_id: str) -> dict | None:
+        """
+        Finalizes the S3 multipart upload and creates the VideoMetadata row.
+        Calling it again on an already completed session returns the same video.
+        Returns None if the session does not exist.
+
+        The session row stays locked until the video row and the COMPLETED status are committed
+        together, so concurrent or retried calls can never create a second video for one upload.
+        """
+        upload_session = self._get_session(session_id, for_update=True)
+        if not upload_session:
+            return None
+        if upload_session.status == UploadSessionStatus.COMPLETED:
+            self.db.rollback() # Release the row lock
+            return self._to_dict(upload_session)
+        if upload_session.status != UploadSessionStatus.ACTIVE:
+            self.db.rollback()
+            raise ValueError(f"Upload session is {upload_session.status.value}")
+
+        try:
+            # A previous attempt may have completed the upload in S3 and then failed before
+            # committing; the multipart upload is gone then (NoSuchUpload) but the object exists
+            if self.storage.object_exists(upload_session.storage_key):
+                logger.info(f"Upload session {session_id} was already completed in storage, recording it.")
+            else:
+                parts = self.storage.list_parts(upload_session.storage_key, upload_session.s3_upload_id)
+                received = {p["PartNumber"] for p in parts}
+                missing = [n for n in range(1, upload_session.total_chunks + 1) if n not in received]
+                if missing:
+                    raise ValueError(f"Cannot complete upload, missing chunks: {missing[:20]}")
+
+                self.storage.complete_multipart_upload(
+                    upload_session.storage_key,
+                    upload_session.s3_upload_id,
+                    [{"PartNumber": p["PartNumber"], "ETag": p["ETag"]} for p in parts]
+                )
+            # S3 assembles the parts, so the content hash (for upload deduplication and the
+            # analysis cache) comes from one streamed read of the finished object
+            content_sha256 = self.storage.hash_object(upload_session.storage_key)
+        except Exception:
+            self.db.rollback()
+            raise
+
+        try:
+            video_record = VideoMetadataStorageService(self.db).save_video_metadata(
+                original_filename=upload_session.original_filename,
+                storage_key=upload_session.storage_key,
+                content_sha256=content_sha256,
+                commit=False
+            )
+            upload_session.status = UploadSessionStatus.COMPLETED
+            upload_session.video_id = video_record["id"]
+            self.db.commit()
+            self.db.refresh(upload_session)
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to mark upload session {session_id} as completed: {e}")
+            raise Exception(f"Database error: {e}")
+
+        if video_record["deduplicated"] and video_record["storage_key"] != upload_session.storage_key:
+            # Identical content was uploaded before; the session now points at that video
+            try:
+                self.storage.delete_file(upload_session.storage_key)
+            except Exception as e:
+                logger.warning(f"Failed to delete duplicate upload {upload_session.storage_key}: {e}")
+        return self._to_dict(upload_session)
+
+    def abort_session(self, session_id: str) -> dict | None:
+        """
+        Cancels an upload and releases the parts already stored in S3 / MinIO.
+        Returns None if the session does not exist.
+        """
+        upload_session = self._get_session(session_id)
+        if not upload_session:
+            return None
+        if upload_session.status == UploadSessionStatus.ACTIVE:
+            self.storage.abort_multipart_upload(upload_session.storage_key, upload_session.s3_upload_id)
+            upload_session.status = UploadSessionStatus.ABORTED
+            self.db.commit()
+            self.db.refresh(upload_session)
+        return self._to_dict(upload_session)
+
+    def cleanup_stale_sessions(self, max_age: timedelta) -> int:
+        """
+        Aborts every ACTIVE session that has not received a chunk within `max_age`.
+        Returns the number of sessions garbage-collected.
+        """
+        cutoff = datetime.utcnow() - max_age
+        stale_sessions = (
+            self.db.query(UploadSession)
+            .filter(UploadSession.status == UploadSessionStatus.ACTIVE, UploadSession.updated_at < cutoff)
+            .with_for_update(skip_locked=True) # Leave sessions being completed right now alone
+            .all()
+        )
+        for upload_session in stale_sessions:
+            logger.info(f"Aborting stale upload session {upload_session.id} ({upload_session.original_filename})")
+            self.storage.abort_multipart_upload(upload_session.storage_key, upload_session.s3_upload_id)
+            upload_session.status = UploadSessionStatus.ABORTED
+        self.db.commit()
+        return len(stale_sessions)
+
+def get_upload_session_service(db: Session = Depends(get_db)) -> UploadSessionService:
+    return UploadSessionService(db, file_storage_service)
@@ -1,64 +1,339 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from sqlalchemy import tuple_, select, update, Select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import Depends
 from app.models.video_metadata import VideoMetadata, VideoStatus
-from app.db.database import get_db
+from app.db.database import get_db, get_async_db
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Page size limits for the video listing
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Only the columns the listing actually returns; selecting these instead of whole
+# VideoMetadata entities skips ORM hydration and identity-map bookkeeping per row.
+LISTING_COLUMNS = (
+    VideoMetadata.id,
+    VideoMetadata.original_filename,
+    VideoMetadata.status,
+    VideoMetadata.duration_seconds,
+    VideoMetadata.storage_key,
+    VideoMetadata.created_at,
+)
+
+def encode_cursor(created_at: datetime, video_id: uuid.UUID) -> str:
+    """
+    Encodes the (created_at, id) position of the last row on a page as an opaque cursor.
+    """
+    payload = json.dumps({"created_at": created_at.isoformat(), "id": str(video_id)})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """
+    Reverses encode_cursor. Raises ValueError for anything that isn't a cursor we issued.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(payload["created_at"]), uuid.UUID(payload["id"])
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+def video_page_statement(limit: int, cursor: str | None, statuses: list[VideoStatus] | None) -> Select:
+    """
+    The keyset-paginated listing query shared by the sync and async services.
+    It selects one row more than `limit`, to find out whether another page exists.
+    """
+    statement = select(*LISTING_COLUMNS)
+    if statuses:
+        statement = statement.where(VideoMetadata.status.in_(statuses))
+    if cursor:
+        created_at, video_id = decode_cursor(cursor)
+        statement = statement.where(tuple_(VideoMetadata.created_at, VideoMetadata.id) < tuple_(created_at, video_id))
+    return statement.order_by(VideoMetadata.created_at.desc(), VideoMetadata.id.desc()).limit(limit + 1)
+
+def scene_index_to_dict(video_uuid: uuid.UUID, row) -> dict:
+    from app.services.scene_detector import unpack_boundaries, scenes_from_boundaries
+
+    scenes = scenes_from_boundaries(unpack_boundaries(row.scene_boundaries), row.duration_seconds)
+    return {
+        "video_id": str(video_uuid),
+        "indexed": row.scene_boundaries is not None,
+        "duration_seconds": row.duration_seconds,
+        "scenes": [{"start": start, "end": end} for start, end in scenes] if row.scene_boundaries is not None else []
+    }
+
 class VideoMetadataStorageService:
     def __init__(self, db: Session):
         # The database session is initialized once per request and passed in
         self.db = db
 
-    def save_video_metadata(self, original_filename: str, storage_key: str) -> dict:
+    def save_video_metadata(self, original_filename: str, storage_key: str, content_sha256: str | None = None, commit: bool = True) -> dict:
         """
         Saves metadata for a new Video record in the PostgreSQL database.
         Returns a dictionary to fully decouple SQLAlchemy models from the API layer.
+
+        If `content_sha256` matches a video we already have, no new row is created: the existing
+        record is returned with "deduplicated": True, and the caller should discard its own copy of
+        the file (its storage_key will differ from the one returned).
+
+        With commit=False the row is only flushed, inside a savepoint of the caller's transaction,
+        so the caller can commit it together with its own changes.
         """
+        if content_sha256:
+            existing = self.get_video_by_content_hash(content_sha256)
+            if existing:
+                return existing
+
         try:
             db_video = VideoMetadata(
                 original_filename=original_filename,
                 storage_key=storage_key,
+                content_sha256=content_sha256,
                 status=VideoStatus.PENDING # Initial status upon upload
             )
-            self.db.add(db_video)
-            self.db.commit()
+            if commit:
+                self.db.add(db_video)
+                self.db.commit()
+            else:
+                # A duplicate then only undoes this insert, not the caller's transaction
+                with self.db.begin_nested():
+                    self.db.add(db_video)
             self.db.refresh(db_video) # Reload the object to get the newly generated UUID
             
             # Convert to dict so the router doesn't know about SQLAlchemy objects at all
-            return {
-                "id": str(db_video.id),
-                "original_filename": db_video.original_filename,
-                "status": db_video.status.value,
-                "duration_seconds": db_video.duration_seconds,
-                "storage_key": db_video.storage_key,
-                "created_at": db_video.created_at.isoformat()
-            }
+            return self._video_to_dict(db_video, deduplicated=False)
+        except IntegrityError as e:
+            if commit:
+                self.db.rollback()
+            # Another upload of the same file committed first; link to that one instead
+            existing = self.get_video_by_content_hash(content_sha256) if content_sha256 else None
+            if existing:
+                return existing
+            logger.error(f"Failed to create video record in database: {e}")
+            raise Exception(f"Database error: {e}")
         except Exception as e:
-            self.db.rollback() # If something fails, undo the database transaction
+            if commit:
+                self.db.rollback() # If something fails, undo the database transaction
             logger.error(f"Failed to create video record in database: {e}")
             raise Exception(f"Database error: {e}")
 
+    def get_video_metadata_by_id(self, video_id: str) -> dict | None:
+        """
+        Retrieves a single video tracking record, or None if it doesn't exist.
+        """
+        try:
+            video_uuid = uuid.UUID(str(video_id))
+        except ValueError:
+            return None
+        db_video = self.db.query(VideoMetadata).filter(VideoMetadata.id == video_uuid).first()
+        return self._video_to_dict(db_video, deduplicated=False) if db_video else None
+
+    def get_video_by_content_hash(self, content_sha256: str) -> dict | None:
+        """
+        Looks up an already uploaded video by the SHA-256 of its content.
+        """
+        db_video = self.db.query(VideoMetadata).filter(VideoMetadata.content_sha256 == content_sha256).first()
+        return self._video_to_dict(db_video, deduplicated=True) if db_video else None
+
+    def get_video_scenes(self, video_id: str) -> dict | None:
+        """
+        Returns the video's scene index as a list of {start, end} spans, or None if the video doesn't exist.
+        `indexed` is False while the EXTRACTING stage hasn't produced an index yet.
+        """
+        try:
+            video_uuid = uuid.UUID(str(video_id))
+        except ValueError:
+            return None
+        row = (
+            self.db.query(VideoMetadata.scene_boundaries, VideoMetadata.duration_seconds)
+            .filter(VideoMetadata.id == video_uuid)
+            .first()
+        )
+        return scene_index_to_dict(video_uuid, row) if row is not None else None
+
+    def get_video_filenames(self, video_ids: list[str]) -> dict[str, str]:
+        """
+        Maps video IDs to their original filenames in one query (for search results spanning many videos).
+        """
+        video_uuids = [uuid.UUID(str(video_id)) for video_id in set(video_ids)]
+        if not video_uuids:
+            return {}
+        rows = self.db.query(VideoMetadata.id, VideoMetadata.original_filename).filter(VideoMetadata.id.in_(video_uuids)).all()
+        return {str(row.id): row.original_filename for row in rows}
+
+    @staticmethod
+    def _video_to_dict(db_video: VideoMetadata, deduplicated: bool) -> dict:
+        return {
+            "id": str(db_video.id),
+            "original_filename": db_video.original_filename,
+            "status": db_video.status.value,
+            "duration_seconds": db_video.duration_seconds,
+            "width": db_video.width,
+            "height": db_video.height,
+            "video_codec": db_video.video_codec,
+            "audio_codec": db_video.audio_codec,
+            "bitrate": db_video.bitrate,
+            "is_faststart": db_video.is_faststart,
+            "storage_key": db_video.storage_key,
+            "content_sha256": db_video.content_sha256,
+            "deduplicated": deduplicated,
+            "created_at": db_video.created_at.isoformat()
+        }
+
     def get_all_video_metadata(self) -> list[dict]:
         """
         Retrieves metadata for all video tracking records from the database.
         Returns a list of dictionaries to fully decouple SQLAlchemy models from the API layer.
         """
-        db_videos = self.db.query(VideoMetadata).order_by(VideoMetadata.created_at.desc()).all()
-        return [
-                {
-                    "id": str(v.id),
-                    "original_filename": v.original_filename,
-                    "status": v.status.value,
-                    "duration_seconds": v.duration_seconds,
-                    "storage_key": v.storage_key,
-                    "created_at": v.created_at.isoformat()
-                }
-                for v in db_videos
-            ]
+        db_videos = self.db.query(*LISTING_COLUMNS).order_by(VideoMetadata.created_at.desc(), VideoMetadata.id.desc()).all()
+        return [self._row_to_dict(v) for v in db_videos]
+
+    def get_video_metadata_page(self, limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None, statuses: list[VideoStatus] | None = None) -> dict:
+        """
+        Retrieves one page of videos, newest first, using keyset pagination on (created_at, id).
+        Instead of OFFSET (which gets slower the deeper you page), each page starts right after the
+        last row of the previous one, so every page is a short index range scan regardless of library size.
+        Returns the videos plus the `next_cursor` to pass back for the following page (None on the last page).
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        rows = self.db.execute(video_page_statement(limit, cursor, statuses)).all()
+        return self._rows_to_page(rows, limit)
+
+    @classmethod
+    def _rows_to_page(cls, rows, limit: int) -> dict:
+        # The statement fetched one extra row to find out whether another page exists
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "videos": [cls._row_to_dict(v) for v in rows],
+            "next_cursor": encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+        }
+
+    @staticmethod
+    def _row_to_dict(v) -> dict:
+        return {
+            "id": str(v.id),
+            "original_filename": v.original_filename,
+            "status": v.status.value,
+            "duration_seconds": v.duration_seconds,
+            "storage_key": v.storage_key,
+            "created_at": v.created_at.isoformat()
+        }
 
 # We construct a dependency that FastAPI will automatically call.
 # It gets a database session from `get_db()`, instantiates our Service, and passes it to the router!
 def get_video_metadata_service(db: Session = Depends(get_db)) -> VideoMetadataStorageService:
     return VideoMetadataStorageService(db)
+
+class AsyncVideoMetadataStorageService:
+    """
+    The asyncio twin of VideoMetadataStorageService for the API's request path.
+    Same queries and same dictionaries, but every round trip to Postgres is awaited,
+    so a request waiting on the database never blocks the event loop or a threadpool thread.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def save_video_metadata(self, original_filename: str, storage_key: str, content_sha256: str | None = None) -> dict:
+        """
+        See VideoMetadataStorageService.save_video_metadata (including content-hash deduplication).
+        """
+        if content_sha256:
+            existing = await self.get_video_by_content_hash(content_sha256)
+            if existing:
+                return existing
+
+        try:
+            db_video = VideoMetadata(
+                original_filename=original_filename,
+                storage_key=storage_key,
+                content_sha256=content_sha256,
+                status=VideoStatus.PENDING
+            )
+            self.db.add(db_video)
+            await self.db.commit()
+            await self.db.refresh(db_video)
+            return VideoMetadataStorageService._video_to_dict(db_video, deduplicated=False)
+        except IntegrityError as e:
+            await self.db.rollback()
+            # Another upload of the same file committed first; link to that one instead
+            existing = await self.get_video_by_content_hash(content_sha256) if content_sha256 else None
+            if existing:
+                return existing
+            logger.error(f"Failed to create video record in database: {e}")
+            raise Exception(f"Database error: {e}")
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"Failed to create video record in database: {e}")
+            raise Exception(f"Database error: {e}")
+
+    async def get_video_metadata_by_id(self, video_id: str) -> dict | None:
+        try:
+            video_uuid = uuid.UUID(str(video_id))
+        except ValueError:
+            return None
+        db_video = await self.db.scalar(select(VideoMetadata).where(VideoMetadata.id == video_uuid))
+        return VideoMetadataStorageService._video_to_dict(db_video, deduplicated=False) if db_video else None
+
+    async def get_video_by_content_hash(self, content_sha256: str) -> dict | None:
+        db_video = await self.db.scalar(select(VideoMetadata).where(VideoMetadata.content_sha256 == content_sha256).limit(1))
+        return VideoMetadataStorageService._video_to_dict(db_video, deduplicated=True) if db_video else None
+
+    async def save_media_info(self, video_id: str, media_info: dict) -> None:
+        """
+        Stores what the media probe found in a video's headers (see app/services/media_probe.py).
+        """
+        duration = media_info.get("duration_seconds")
+        await self.db.execute(
+            update(VideoMetadata)
+            .where(VideoMetadata.id == uuid.UUID(str(video_id)))
+            .values(
+                duration_seconds=int(round(duration)) if duration is not None else VideoMetadata.duration_seconds,
+                width=media_info.get("width"),
+                height=media_info.get("height"),
+                video_codec=media_info.get("video_codec"),
+                audio_codec=media_info.get("audio_codec"),
+                bitrate=media_info.get("bitrate"),
+                is_faststart=media_info.get("is_faststart")
+            )
+        )
+        await self.db.commit()
+
+    async def get_video_scenes(self, video_id: str) -> dict | None:
+        try:
+            video_uuid = uuid.UUID(str(video_id))
+        except ValueError:
+            return None
+        result = await self.db.execute(
+            select(VideoMetadata.scene_boundaries, VideoMetadata.duration_seconds).where(VideoMetadata.id == video_uuid)
+        )
+        row = result.first()
+        return scene_index_to_dict(video_uuid, row) if row is not None else None
+
+    async def get_video_filenames(self, video_ids: list[str]) -> dict[str, str]:
+        video_uuids = [uuid.UUID(str(video_id)) for video_id in set(video_ids)]
+        if not video_uuids:
+            return {}
+        result = await self.db.execute(
+            select(VideoMetadata.id, VideoMetadata.original_filename).where(VideoMetadata.id.in_(video_uuids))
+        )
+        return {str(row.id): row.original_filename for row in result}
+
+    async def get_video_metadata_page(self, limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None, statuses: list[VideoStatus] | None = None) -> dict:
+        """
+        See VideoMetadataStorageService.get_video_metadata_page (keyset pagination on (created_at, id)).
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        result = await self.db.execute(video_page_statement(limit, cursor, statuses))
+        return VideoMetadataStorageService._rows_to_page(result.all(), limit)
+
+def get_async_video_metadata_service(db: AsyncSession = Depends(get_async_db)) -> AsyncVideoMetadataStorageService:
+    return AsyncVideoMetadataStorageService(db)
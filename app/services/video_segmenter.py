@@ -0,0 +1,136 @@
+import bisect
+import logging
+import subprocess
+from typing import List, Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Requires the `ffmpeg` / `ffprobe` binaries on the worker's PATH.
+
+def probe_duration(video_path: str) -> float:
+    """
+    Returns the container duration in seconds (reads the header only).
+    """
+    output = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", video_path],
+        capture_output=True, text=True, check=True
+    ).stdout.strip()
+    return float(output)
+
+def probe_keyframes(video_path: str) -> List[float]:
+    """
+    Returns the timestamps (in seconds) of every video keyframe.
+    Only packet headers are read (no decoding), so this is fast even for long films.
+    """
+    output = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", video_path],
+        capture_output=True, text=True, check=True
+    ).stdout
+    keyframes = []
+    for line in output.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            keyframes.append(float(pts_time))
+    return sorted(keyframes)
+
+def plan_windows(duration: float, keyframes: List[float], window_seconds: float, overlap_seconds: float) -> List[Tuple[float, float]]:
+    """
+    Splits [0, duration] into overlapping (start, end) windows.
+    Every window starts exactly on a keyframe (the last one at or before its nominal start),
+    which is what lets us cut it with a stream copy and still know its true time offset.
+    """
+    step = max(window_seconds - overlap_seconds, 1.0)
+    windows = []
+    nominal_start = 0.0
+    while nominal_start < duration:
+        index = bisect.bisect_right(keyframes, nominal_start) - 1
+        start = keyframes[index] if index >= 0 else 0.0
+        end = min(nominal_start + window_seconds, duration)
+        windows.append((start, end))
+        if end >= duration:
+            break
+        nominal_start += step
+    return windows
+
+def plan_scene_windows(duration: float, keyframes: List[float], scene_boundaries: List[float], window_seconds: float) -> List[Tuple[float, float]]:
+    """
+    Like plan_windows, but windows end on scene cuts (from the video's scene index) instead of
+    overlapping: no scene is ever split between two windows, so no footage has to be analyzed twice.
+    A single scene longer than `window_seconds` is still split at the nominal window length.
+    """
+    edges = [b for b in scene_boundaries if 0.0 < b < duration] + [duration]
+    nominal = []
+    window_start = 0.0
+    last_edge = 0.0
+    for edge in edges:
+        if edge - window_start > window_seconds and last_edge > window_start:
+            nominal.append((window_start, last_edge))
+            window_start = last_edge
+        while edge - window_start > window_seconds:
+            nominal.append((window_start, window_start + window_seconds))
+            window_start += window_seconds
+        last_edge = edge
+    if window_start < duration:
+        nominal.append((window_start, duration))
+
+    # Start each window on the keyframe at or before its scene cut, so it can be stream-copied
+    windows = []
+    for start, end in nominal:
+        index = bisect.bisect_right(keyframes, start) - 1
+        windows.append((keyframes[index] if index >= 0 else 0.0, end))
+    return windows
+
+def cut_window(video_path: str, start: float, end: float, output_path: str) -> str:
+    """
+    Extracts [start, end) into its own file with a stream copy (no re-encode).
+    `start` must be a keyframe timestamp (see plan_windows).
+    """
+    subprocess.run(
+        [
+            "ffmpeg", "-v", "error", "-y",
+            "-ss", f"{start:.3f}", "-i", video_path, "-t", f"{end - start:.3f}",
+            "-map", "0", "-c", "copy", "-avoid_negative_ts", "make_zero",
+            output_path
+        ],
+        check=True
+    )
+    return output_path
+
+def merge_window_moments(window_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Combines per-window engine results into one timeline for the whole video.
+
+    Each entry of `window_results` is {"offset": window_start_seconds, "moments": [...]} with
+    timestamps relative to the window. Timestamps are shifted by the offset, and moments from
+    different windows that overlap in time (the same scene seen twice in an overlap region)
+    are merged into one, keeping the higher-confidence description.
+    """
+    shifted = []
+    for window_index, result in enumerate(window_results):
+        for moment in result.get("moments", []):
+            shifted.append({
+                **moment,
+                "start_timestamp": moment.get("start_timestamp", 0.0) + result["offset"],
+                "end_timestamp": moment.get("end_timestamp", 0.0) + result["offset"],
+                "_windows": {window_index}
+            })
+    shifted.sort(key=lambda m: (m["start_timestamp"], m["end_timestamp"]))
+
+    merged: List[Dict[str, Any]] = []
+    for moment in shifted:
+        previous = merged[-1] if merged else None
+        # Only merge across windows: two distinct moments the engine reported in one window stay distinct
+        if previous and moment["start_timestamp"] <= previous["end_timestamp"] and not (moment["_windows"] & previous["_windows"]):
+            best = moment if moment.get("confidence_score", 0.0) > previous.get("confidence_score", 0.0) else previous
+            merged[-1] = {
+                **best,
+                "start_timestamp": min(previous["start_timestamp"], moment["start_timestamp"]),
+                "end_timestamp": max(previous["end_timestamp"], moment["end_timestamp"]),
+                "_windows": previous["_windows"] | moment["_windows"]
+            }
+        else:
+            merged.append(moment)
+
+    for moment in merged:
+        del moment["_windows"]
+    return merged
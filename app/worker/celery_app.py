@@ -18,4 +18,25 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    # Searches run for minutes: acknowledge a task only once it finished (a worker that dies
+    # mid-search hands it back to the queue), and never reserve tasks a busy process can't start
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    broker_transport_options={"visibility_timeout": settings.CELERY_VISIBILITY_TIMEOUT_HOURS * 3600},
+    # Searches are routed per call by video cost (see app/worker/scheduling.py); windows of a
+    # segmented analysis always belong to a long video
+    task_routes={
+        "analyze_video_window": {"queue": settings.SEARCH_LONG_QUEUE},
+    },
+    # Periodic jobs, run with `celery -A app.worker.celery_app beat`
+    beat_schedule={
+        "cleanup-stale-upload-sessions": {
+            "task": "cleanup_stale_upload_sessions",
+            "schedule": 3600.0, # Every hour
+        },
+    },
 )
+
+# Per-process resource lifecycle (connection pools, storage client, AI engine), wired through Celery signals
+import app.worker.lifecycle  # noqa: E402,F401
@@ -0,0 +1,84 @@
+import logging
+import os
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# --- Worker Process Lifecycle ---
+# Everything expensive a task needs (DB connection pool, boto3 client, AI engine with its API
+# client or ONNX model) is built once per worker process and reused by every task it runs.
+# With the prefork pool, the parent imports the app before forking, so each child first drops
+# the connections it inherited (sharing a socket between processes corrupts both sides) and
+# then builds its own resources before accepting its first task.
+
+def warm_process_resources() -> None:
+    """
+    Builds this process's long-lived resources up front, so the first task doesn't pay for them.
+    A failure is only logged: the resource is built lazily again by the first task that needs it.
+    """
+    from sqlalchemy import text
+    from app.db.database import engine
+    from app.services.ai.factory import get_ai_engine
+
+    try:
+        # Opens the first pooled connection (the rest are opened on demand, up to DB_POOL_SIZE)
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception as e:
+        logger.warning(f"Could not pre-connect to the database: {e}")
+
+    try:
+        get_ai_engine()
+    except Exception as e:
+        logger.warning(f"Could not build the {settings.ACTIVE_AI_ENGINE} engine up front: {e}")
+
+@worker_process_init.connect
+def init_worker_process(**kwargs) -> None:
+    """
+    Runs in every prefork child right after the fork, before it receives any task.
+    """
+    from app.db.database import engine, async_engine
+    from app.services.file_storage_service import file_storage_service
+    from app.services.ai.factory import get_ai_engine
+
+    # close=False: forget the parent's pooled connections without closing them under the parent
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    file_storage_service.connect()
+    get_ai_engine.cache_clear()
+
+    warm_process_resources()
+    logger.info("Worker process initialized (database pool, storage client and AI engine ready).")
+
+@worker_init.connect
+def init_worker(sender=None, **kwargs) -> None:
+    """
+    Starts the worker's Prometheus endpoint (aggregating every child in multiprocess mode).
+    Non-forking pools (threads, solo) run tasks in the main process, which gets no
+    worker_process_init, so its resources are warmed here instead.
+    """
+    if settings.WORKER_METRICS_PORT:
+        from prometheus_client import start_http_server
+        from app.core.metrics import metrics_registry
+        try:
+            start_http_server(settings.WORKER_METRICS_PORT, registry=metrics_registry())
+            logger.info(f"Serving worker metrics on port {settings.WORKER_METRICS_PORT}.")
+        except OSError as e:
+            logger.warning(f"Could not serve worker metrics on port {settings.WORKER_METRICS_PORT}: {e}")
+
+    if "prefork" in str(getattr(sender, "pool_cls", "prefork")).lower():
+        return
+    warm_process_resources()
+    logger.info("Worker initialized (database pool and AI engine ready).")
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs) -> None:
+    """
+    Closes this child's pooled database connections instead of leaving them for the server to time out.
+    """
+    from app.db.database import engine
+    from app.core.metrics import mark_process_dead
+
+    engine.dispose()
+    mark_process_dead(os.getpid())
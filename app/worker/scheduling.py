@@ -0,0 +1,175 @@
+import time
+import logging
+from app.core.config import settings
+from app.core.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# --- Search Scheduling ---
+# Three things decide when a character search runs:
+# 1. Queue by cost: searches on long videos go to SEARCH_LONG_QUEUE, everything else to
+#    SEARCH_SHORT_QUEUE, so a 3-hour film never sits in front of dozens of 2-minute clips.
+#    Run dedicated workers for each queue (see the README).
+# 2. De-duplication: an identical search (same video content, same crop, same character, same
+#    engine/model) that is already queued or running is never enqueued a second time.
+# 3. Fair share: one client can't have more than SEARCH_MAX_RUNNING_PER_CLIENT searches running at
+#    once; extra ones go back to the queue for a while, so other clients' jobs get workers.
+#    Clients are only told apart by a trusted identity (see search_client_id); searches without
+#    one are not capped, since lumping them together would turn the per-client cap into a global one.
+
+def pick_search_queue(duration_seconds: float | None, size_bytes: int | None) -> str:
+    """
+    The queue for a search on a video of this duration (preferred) or size.
+    Unknown videos are treated as long, so they can never block the short queue.
+    """
+    if duration_seconds is not None:
+        is_long = duration_seconds > settings.SEARCH_LONG_VIDEO_SECONDS
+    elif size_bytes is not None:
+        is_long = size_bytes > settings.SEARCH_LONG_VIDEO_MB * 1024 * 1024
+    else:
+        is_long = True
+    return settings.SEARCH_LONG_QUEUE if is_long else settings.SEARCH_SHORT_QUEUE
+
+def search_queue_for_video(video) -> str:
+    """
+    Estimates a video's search cost from its duration (known once the scene index ran),
+    falling back to the size of the stored file.
+    """
+    if video.duration_seconds:
+        return pick_search_queue(video.duration_seconds, None)
+    try:
+        from app.services.file_storage_service import file_storage_service
+        return pick_search_queue(None, file_storage_service.get_object_size(video.storage_key))
+    except Exception as e:
+        logger.warning(f"Could not size video {video.storage_key} for queue routing: {e}")
+        return pick_search_queue(None, None)
+
+def search_client_id(headers, peer_host: str | None) -> str | None:
+    """
+    The fair-share identity of a search request, or None (no per-client cap).
+    Only sources the deployment vouches for are used, since a caller-chosen ID would let anyone
+    dodge the cap: the SEARCH_CLIENT_ID_HEADER set by a trusted gateway, else (if
+    SEARCH_CLIENT_ID_FROM_IP) the caller's address. Behind SEARCH_TRUSTED_PROXY_COUNT proxies that
+    address is the X-Forwarded-For entry the outermost trusted proxy appended, never the socket peer
+    (which would be the proxy itself, shared by every user).
+    """
+    if settings.SEARCH_CLIENT_ID_HEADER:
+        identity = (headers.get(settings.SEARCH_CLIENT_ID_HEADER) or "").strip()
+        if identity:
+            return identity
+    if not settings.SEARCH_CLIENT_ID_FROM_IP:
+        return None
+    if settings.SEARCH_TRUSTED_PROXY_COUNT > 0:
+        forwarded = [hop.strip() for hop in (headers.get("X-Forwarded-For") or "").split(",") if hop.strip()]
+        # Entries left of the ones our proxies appended are whatever the caller sent
+        if len(forwarded) < settings.SEARCH_TRUSTED_PROXY_COUNT:
+            return None
+        return forwarded[-settings.SEARCH_TRUSTED_PROXY_COUNT]
+    return peer_host
+
+class SearchJobRegistry:
+    """
+    Redis registry of the searches that are queued or running, keyed by the same identity as the
+    analysis result cache. A claim is taken when a search is enqueued and released when its task
+    finishes; claims also expire after `ttl_seconds`, so a lost task can't block a search forever.
+    """
+
+    KEY_PREFIX = "search_jobs"
+
+    def __init__(self, redis_client, ttl_seconds: int):
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+
+    def _claim_key(self, cache_key: str) -> str:
+        return f"{self.KEY_PREFIX}:claim:{cache_key}"
+
+    def _screenshot_key(self, screenshot_id: str) -> str:
+        return f"{self.KEY_PREFIX}:screenshot:{screenshot_id}"
+
+    def claim(self, cache_key: str, screenshot_id: str) -> bool:
+        """
+        Registers a search about to be enqueued. False if the identical search is already pending.
+        """
+        if not self.redis.set(self._claim_key(cache_key), screenshot_id, nx=True, ex=self.ttl_seconds):
+            return False
+        self.redis.set(self._screenshot_key(screenshot_id), cache_key, ex=self.ttl_seconds)
+        return True
+
+    def holder(self, cache_key: str) -> str | None:
+        """
+        The screenshot ID whose pending search holds this claim, if any.
+        """
+        value = self.redis.get(self._claim_key(cache_key))
+        return value.decode() if value is not None else None
+
+    def release(self, screenshot_id: str) -> None:
+        """
+        Forgets the pending search of a screenshot (its task finished, successfully or not).
+        """
+        try:
+            cache_key = self.redis.get(self._screenshot_key(screenshot_id))
+            if cache_key is not None:
+                self.redis.delete(self._claim_key(cache_key.decode()), self._screenshot_key(screenshot_id))
+        except Exception as e:
+            logger.error(f"Failed to release the search claim of screenshot ID {screenshot_id}: {e}")
+
+class ClientFairShare:
+    """
+    Caps how many searches of one client run at the same time, across every worker.
+    Each running search holds a lease (a sorted-set member scored by its expiry), so the slot of a
+    task killed mid-flight frees itself after `lease_seconds`.
+    """
+
+    KEY_PREFIX = "search_running"
+
+    # Count live leases and add ours atomically, so two workers can't both take the last slot
+    _START_SCRIPT = """
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+    if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+        return 0
+    end
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[4])
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+    return 1
+    """
+
+    def __init__(self, redis_client, max_running: int, lease_seconds: int):
+        self.redis = redis_client
+        self.max_running = max_running
+        self.lease_seconds = lease_seconds
+        self._start = redis_client.register_script(self._START_SCRIPT)
+
+    def _key(self, client_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{client_id}"
+
+    def try_start(self, client_id: str | None, task_id: str) -> bool:
+        """
+        Takes a slot for this task. Always True for anonymous tasks or when fair share is disabled.
+        """
+        if not client_id or self.max_running <= 0:
+            return True
+        now = time.time()
+        return bool(self._start(
+            keys=[self._key(client_id)],
+            args=[now, now + self.lease_seconds, self.max_running, task_id, self.lease_seconds]
+        ))
+
+    def finish(self, client_id: str | None, task_id: str) -> None:
+        if not client_id or self.max_running <= 0:
+            return
+        try:
+            self.redis.zrem(self._key(client_id), task_id)
+        except Exception as e:
+            logger.error(f"Failed to release the fair-share slot of task {task_id}: {e}")
+
+search_jobs = SearchJobRegistry(
+    get_redis_client(),
+    ttl_seconds=settings.SEARCH_DEDUP_TTL_HOURS * 3600
+)
+
+# A lease outlives any task the broker would still consider in flight
+client_fair_share = ClientFairShare(
+    get_redis_client(),
+    max_running=settings.SEARCH_MAX_RUNNING_PER_CLIENT,
+    lease_seconds=settings.CELERY_VISIBILITY_TIMEOUT_HOURS * 3600
+)
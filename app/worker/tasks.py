@@ -1,19 +1,140 @@
 import time
+import socket
 import logging
+import subprocess
+from contextlib import ExitStack, contextmanager
+from celery import chord, group
+from celery.exceptions import Retry
 from app.worker.celery_app import celery_app
 from app.db.database import SessionLocal
 from app.models.video_metadata import VideoMetadata, VideoStatus
 from app.models.character_screenshot_metadata import CharacterScreenshotMetadata
-from app.models.moment import CharacterMoment
+from app.services.moment_timeline_service import MomentTimelineService
+from app.core.metrics import SEARCH_STAGE_SECONDS, observe_stage
 
 logger = logging.getLogger(__name__)
 
+def search_stage(stage: str):
+    """
+    Times one stage of a character search (and counts its failures) for the /metrics endpoint.
+    """
+    return observe_stage(SEARCH_STAGE_SECONDS, "search", stage)
+
+def record_screenshot_vector(ai_engine, screenshot: CharacterScreenshotMetadata, screenshot_file_path: str) -> None:
+    """
+    Engines that embed screenshots persist the embedding, and the screenshot row points at it (vector_id).
+    """
+    if not hasattr(ai_engine, "store_screenshot_vector"):
+        return
+    try:
+        screenshot.vector_id = ai_engine.store_screenshot_vector(screenshot_file_path, screenshot.content_sha256)
+    except Exception as e:
+        logger.error(f"Failed to store the embedding of screenshot ID {screenshot.id}: {e}")
+
+def engine_needs_video(ai_engine, video_identity: str) -> bool:
+    """
+    Engines that search a prebuilt per-video index (the VECTOR engine) only need the video file
+    to build that index; once it exists, the (possibly multi-GB) video isn't downloaded at all.
+    """
+    if not hasattr(ai_engine, "has_frame_index"):
+        return True
+    try:
+        return not ai_engine.has_frame_index(video_identity)
+    except Exception as e:
+        logger.error(f"Failed to look up the frame index of {video_identity}: {e}")
+        return True
+
+@contextmanager
+def client_slot(task, client_id: str | None):
+    """
+    Runs the task body in one of the client's fair-share slots. When the client already has its
+    share of searches running, the task goes back to its queue and tries again later.
+    """
+    from app.core.config import settings
+    from app.worker.scheduling import client_fair_share
+
+    if not client_fair_share.try_start(client_id, task.request.id):
+        logger.info(f"Client {client_id} is at its running-search limit; requeueing task {task.request.id}")
+        raise task.retry(countdown=settings.SEARCH_FAIR_SHARE_RETRY_SECONDS, max_retries=None)
+    try:
+        yield
+    finally:
+        client_fair_share.finish(client_id, task.request.id)
+
+@contextmanager
+def pending_search_jobs(screenshot_ids: list[str]):
+    """
+    Lets identical searches be enqueued again once the wrapped run is done with these screenshots.
+    A run that hands them on (to a retry, or to the merge step of a segmented analysis, which
+    releases them itself) keeps them pending by setting the yielded state's "handed_off".
+    """
+    from app.worker.scheduling import search_jobs
+
+    state = {"handed_off": False}
+    try:
+        yield state
+    except Retry:
+        state["handed_off"] = True
+        raise
+    finally:
+        if not state["handed_off"]:
+            for screenshot_id in screenshot_ids:
+                search_jobs.release(screenshot_id)
+
+# Errors worth retrying: dropped connections and timeouts (Postgres, Redis, MinIO, the engine's
+# HTTP client), provider-side 5xx and quota errors. Matched by class name across the exception's
+# MRO, so optional client libraries never have to be imported here.
+TRANSIENT_ERROR_NAMES = {
+    "ConnectionError", "TimeoutError", "OperationalError", "EndpointConnectionError",
+    "ConnectionClosedError", "ReadTimeoutError", "ConnectTimeoutError", "ServerError"
+}
+
+def is_transient_error(error: Exception) -> bool:
+    from app.services.ai.rate_limiter import is_quota_error
+
+    if is_quota_error(error) or getattr(error, "code", None) in (500, 502, 503, 504):
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+def retry_countdown(task, error: Exception, searches: list[tuple[str, str]]) -> int | None:
+    """
+    Seconds to wait before retrying the task (exponential backoff) when `error` is transient and
+    none of its searches (screenshot ID, analysis cache key) has failed SEARCH_MAX_RETRIES times
+    yet. None when the failure is final.
+    """
+    from app.core.config import settings
+    from app.services.search_checkpoint_service import search_checkpoints
+
+    if task is None or not is_transient_error(error):
+        return None
+    try:
+        failures = max(search_checkpoints.count_failure(screenshot_id, cache_key) for screenshot_id, cache_key in searches)
+    except Exception as e:
+        logger.error(f"Failed to count search failures: {e}")
+        return None
+    if failures > settings.SEARCH_MAX_RETRIES:
+        return None
+    countdown = settings.SEARCH_RETRY_BACKOFF_SECONDS * 2 ** (failures - 1)
+    logger.warning(f"Transient failure ({error}); retry {failures}/{settings.SEARCH_MAX_RETRIES} in {countdown}s...")
+    return countdown
+
 @celery_app.task(bind=True, name="process_character_search")
-def process_character_search(self, screenshot_db_id: str):
+def process_character_search(self, screenshot_db_id: str, client_id: str | None = None):
     """
     This is the background task that will eventually run the heavy AI computer vision.
     For now, it is a 'stub' that simulates work and updates the database.
     """
+    with client_slot(self, client_id), pending_search_jobs([screenshot_db_id]) as job:
+        result = run_character_search(screenshot_db_id, self)
+        job["handed_off"] = "windows" in result
+        return result
+
+def run_character_search(screenshot_db_id: str, task=None) -> dict:
+    """
+    Runs one screenshot's search, resuming at its first incomplete stage (see SearchCheckpoints).
+    Transient failures are retried through `task`; without one (or after the last retry) the
+    video is marked FAILED.
+    """
     logger.info(f"Worker picked up job for screenshot ID: {screenshot_db_id}")
     
     db = SessionLocal()
@@ -31,58 +152,129 @@ def process_character_search(self, screenshot_db_id: str):
         db.close()
         return {"status": "error", "message": "Video not found"}
 
+    # A previous attempt already persisted the moments (e.g. the worker died before acknowledging)
+    if screenshot.is_processed:
+        logger.info(f"Screenshot ID {screenshot_db_id} was already processed; nothing to resume.")
+        db.close()
+        return {"status": "success", "message": "AI Processing Complete (already saved)", "screenshot_id": screenshot_db_id}
+
+    from app.services.job_progress_service import job_progress
+    from app.services.search_checkpoint_service import search_checkpoints
+    video_id = str(video.id)
+
+    # Step 2b: The exact same search (same video, same crop, same character, same engine/model)
+    # may have run before. If so, reuse its result instead of calling the engine again.
+    from app.services.analysis_cache_service import analysis_result_cache, content_identity
+    video_identity = content_identity(video.content_sha256, video.storage_key)
+    cache_key = analysis_result_cache.build_key(
+        video_identity,
+        content_identity(screenshot.content_sha256, screenshot.screenshot_url),
+        screenshot.character_name
+    )
+    with search_stage("cache_lookup"):
+        cached_moments = analysis_result_cache.get(cache_key)
+    cache_hit = cached_moments is not None
+    # Otherwise, a previous attempt of this search may have got the engine's answer before failing
+    checkpoint = search_checkpoints.load(screenshot_db_id, cache_key)
+    if not cache_hit and "engine_response" in checkpoint:
+        cached_moments = checkpoint["engine_response"]
+    if cached_moments is not None:
+        source = "cached" if cache_hit else "checkpointed"
+        logger.info(f"Found a {source} analysis for screenshot ID {screenshot_db_id}. Saving {len(cached_moments)} {source} moments...")
+        try:
+            with search_stage("save"):
+                moments_found = MomentTimelineService(db).save_moments(video, screenshot, cached_moments)
+                screenshot.is_processed = True
+                video.status = VideoStatus.COMPLETED
+                db.commit()
+            db.close()
+            search_checkpoints.clear(screenshot_db_id, cache_key)
+            job_progress.publish(video_id, screenshot_db_id, "completed", moments_found=moments_found, cache_hit=cache_hit)
+            return {"status": "success", "message": f"AI Processing Complete ({source})", "screenshot_id": screenshot_db_id, "cache_hit": cache_hit}
+        except Exception as e:
+            # Fall back to a full analysis rather than failing the job
+            logger.error(f"Failed to apply cached analysis result: {e}")
+            db.rollback()
+
     logger.info(f"Analyzing Video '{video.original_filename}' for character '{screenshot.character_name}'...")
     video.status = VideoStatus.ANALYZING
     db.commit()
 
     import os
     from app.services.file_storage_service import file_storage_service
+    from app.services.local_video_cache import local_video_cache
     from app.services.ai.factory import get_ai_engine
     
-    # Define temporary file paths to hold the MinIO files during processing
-    temp_video_path = f"/tmp/{video.id}.mp4"
+    # Define temporary file paths to hold the MinIO files during processing.
+    # The video itself comes from the worker-local video cache, which owns its file.
     temp_img_path = f"/tmp/{screenshot.id}.png"
+    video_checkout = ExitStack()
     
     # Ensure /tmp exists on Windows or Linux
     os.makedirs("/tmp", exist_ok=True)
     
     try:
         # Step 3: Download the physical files from MinIO to the local Worker machine
-        logger.info(f"Downloading files from Storage to local worker for analysis...")
-        file_storage_service.download_file(video.storage_key, temp_video_path)
-        file_storage_service.download_file(screenshot.screenshot_url, temp_img_path)
+        # (the video is only downloaded if this machine doesn't have it cached yet,
+        # and not at all when the engine searches an index that already exists)
+        ai_engine = get_ai_engine()
+        temp_video_path = None
+        if engine_needs_video(ai_engine, video_identity):
+            logger.info(f"Downloading files from Storage to local worker for analysis...")
+            job_progress.publish(video_id, screenshot_db_id, "downloading")
+            with search_stage("video_download"):
+                temp_video_path = video_checkout.enter_context(
+                    local_video_cache.checkout(video.storage_key, expected_sha256=video.content_sha256)
+                )
+            previous_host = checkpoint.get("downloaded", {}).get("host")
+            if previous_host and previous_host != socket.gethostname():
+                logger.info(f"Resumed on another worker than {previous_host}; the video had to be fetched again here.")
+            search_checkpoints.record(screenshot_db_id, cache_key, "downloaded", {"host": socket.gethostname()})
+        else:
+            logger.info("The video is already indexed; searching its index without downloading it...")
+
+        # Step 3b: Long videos are split into overlapping windows analyzed in parallel by other tasks
+        windows = plan_segmented_analysis(temp_video_path, video.scene_boundaries) if temp_video_path else None
+        if windows:
+            logger.info(f"Video is long; fanning the analysis out over {len(windows)} windows...")
+            job_progress.publish(video_id, screenshot_db_id, "analyzing", windows_total=len(windows))
+            chord(
+                group(analyze_video_window.s(screenshot_db_id, start, end) for start, end in windows)
+            )(merge_video_window_results.s(screenshot_db_id, cache_key, video_identity))
+            return {"status": "success", "message": "Segmented analysis dispatched", "screenshot_id": screenshot_db_id, "windows": len(windows)}
+
+        with search_stage("screenshot_download"):
+            file_storage_service.download_file(screenshot.screenshot_url, temp_img_path)
         
         # Step 4: Load the active AI Engine and perform the analysis
         logger.info(f"Sending files to the AI Engine for character '{screenshot.character_name}'...")
-        ai_engine = get_ai_engine()
-        moments_data = ai_engine.find_character_moments(
-            video_file_path=temp_video_path,
-            screenshot_file_path=temp_img_path,
-            character_name=screenshot.character_name
-        )
+        job_progress.publish(video_id, screenshot_db_id, "analyzing")
+        with search_stage("engine"):
+            moments_data = ai_engine.find_character_moments(
+                video_file_path=temp_video_path,
+                screenshot_file_path=temp_img_path,
+                character_name=screenshot.character_name,
+                video_identity=video_identity
+            )
+        
+        # Remember the raw result so neither a retry nor an identical search pays for the engine again
+        search_checkpoints.record(screenshot_db_id, cache_key, "engine_response", moments_data)
+        analysis_result_cache.set(cache_key, video_identity, moments_data)
+        record_screenshot_vector(ai_engine, screenshot, temp_img_path)
         
         # Step 5: Save the AI Results dynamically
         logger.info(f"AI Analysis complete! Discovered {len(moments_data)} moments. Saving to database...")
-        moments_to_insert = []
-        for moment_dict in moments_data:
-            moment = CharacterMoment(
-                video_id=video.id,
-                character_id=screenshot.id,
-                action=moment_dict.get("action", f"Found {screenshot.character_name}"),
-                start_timestamp=moment_dict.get("start_timestamp", 0.0),
-                end_timestamp=moment_dict.get("end_timestamp", 0.0),
-                confidence_score=moment_dict.get("confidence_score", 0.0)
-            )
-            moments_to_insert.append(moment)
+        job_progress.publish(video_id, screenshot_db_id, "saving", moments_found=len(moments_data))
+        with search_stage("save"):
+            moments_found = MomentTimelineService(db).save_moments(video, screenshot, moments_data)
             
-        if moments_to_insert:
-            db.add_all(moments_to_insert)
-        
-        # Step 6: Completion
-        screenshot.is_processed = True
-        video.status = VideoStatus.COMPLETED
-        
-        db.commit()
+            # Step 6: Completion
+            screenshot.is_processed = True
+            video.status = VideoStatus.COMPLETED
+            
+            db.commit()
+        search_checkpoints.clear(screenshot_db_id, cache_key)
+        job_progress.publish(video_id, screenshot_db_id, "completed", moments_found=moments_found)
         logger.info(f"Finished processing screenshot ID: {screenshot_db_id} Successfully!")
         
         return {"status": "success", "message": "AI Processing Complete", "screenshot_id": screenshot_db_id}
@@ -90,6 +282,11 @@ def process_character_search(self, screenshot_db_id: str):
     except Exception as e:
         logger.error(f"Error during Celery processing: {e}")
         db.rollback()
+        countdown = retry_countdown(task, e, [(screenshot_db_id, cache_key)])
+        if countdown is not None:
+            job_progress.publish(video_id, screenshot_db_id, "retrying", message=str(e), retry_in_seconds=countdown)
+            raise task.retry(exc=e, countdown=countdown, max_retries=None)
+        job_progress.publish(video_id, screenshot_db_id, "failed", message=str(e))
         
         # Attempt to perfectly mark the video as FAILED
         try:
@@ -106,11 +303,586 @@ def process_character_search(self, screenshot_db_id: str):
         # Step 7: Clean up the local hard drive
         logger.info("Cleaning up local temporary files...")
         try:
-            if os.path.exists(temp_video_path):
-                os.remove(temp_video_path)
+            video_checkout.close()
             if os.path.exists(temp_img_path):
                 os.remove(temp_img_path)
         except Exception as cleanup_error:
             logger.error(f"Failed to delete local temp files: {cleanup_error}")
             
         db.close()
+
+# --- Segmented Analysis ---
+# A two-hour film analyzed in one engine call is bounded by that single call, and one failure
+# loses everything. Instead, long videos are cut (keyframe-aligned stream copy, no re-encode) into
+# overlapping windows that run as a Celery chord; each window retries on its own, and the merge
+# step shifts timestamps back onto the full timeline and de-duplicates the overlaps.
+
+def plan_segmented_analysis(video_path: str, scene_boundaries: bytes | None = None) -> list[tuple[float, float]] | None:
+    """
+    Returns the (start, end) windows to analyze separately, or None to analyze the video in one piece.
+    With a scene index, windows end on scene cuts and need no overlap.
+    """
+    from app.core.config import settings
+    from app.services.video_segmenter import probe_duration, probe_keyframes, plan_windows, plan_scene_windows
+    from app.services.scene_detector import unpack_boundaries
+
+    if not settings.SEGMENTED_ANALYSIS_ENABLED or settings.ACTIVE_AI_ENGINE.upper() == "VECTOR":
+        # The vector engine searches a precomputed index in milliseconds; splitting would only hurt
+        return None
+    try:
+        duration = probe_duration(video_path)
+        if duration <= settings.SEGMENTED_ANALYSIS_MIN_DURATION_SECONDS:
+            return None
+        keyframes = probe_keyframes(video_path)
+        if scene_boundaries is not None:
+            windows = plan_scene_windows(duration, keyframes, unpack_boundaries(scene_boundaries), settings.SEGMENT_WINDOW_SECONDS)
+        else:
+            windows = plan_windows(duration, keyframes, settings.SEGMENT_WINDOW_SECONDS, settings.SEGMENT_OVERLAP_SECONDS)
+        return windows if len(windows) > 1 else None
+    except (OSError, ValueError, subprocess.CalledProcessError) as e:
+        logger.warning(f"Could not probe video for segmentation ({e}); analyzing it in one piece.")
+        return None
+
+@celery_app.task(bind=True, name="analyze_video_window")
+def analyze_video_window(self, screenshot_db_id: str, start: float, end: float):
+    """
+    Analyzes one [start, end) window of a video. Timestamps in the result are relative to `start`.
+    A failing window is retried on its own; after the last retry it reports the error instead of
+    raising, so the rest of the chord still gets merged.
+    """
+    import os
+    from app.core.config import settings
+    from app.services.file_storage_service import file_storage_service
+    from app.services.local_video_cache import local_video_cache
+    from app.services.analysis_cache_service import content_identity
+    from app.services.video_segmenter import cut_window
+    from app.services.ai.factory import get_ai_engine
+    from app.services.job_progress_service import job_progress
+
+    db = SessionLocal()
+    try:
+        screenshot = db.query(CharacterScreenshotMetadata).filter(CharacterScreenshotMetadata.id == screenshot_db_id).first()
+        video = db.query(VideoMetadata).filter(VideoMetadata.id == screenshot.video_id).first() if screenshot else None
+        if not screenshot or not video:
+            return {"offset": start, "end": end, "moments": [], "error": "Screenshot or video not found"}
+        storage_key, content_sha256 = video.storage_key, video.content_sha256
+        screenshot_url, character_name = screenshot.screenshot_url, screenshot.character_name
+        video_identity = content_identity(video.content_sha256, video.storage_key)
+        video_id = str(video.id)
+        window_tag = f"{video.id}_{int(start * 1000)}_{int(end * 1000)}"
+    finally:
+        db.close()
+
+    extension = os.path.splitext(storage_key)[1] or ".mp4"
+    window_path = f"/tmp/{window_tag}{extension}"
+    temp_img_path = f"/tmp/{screenshot_db_id}_{int(start * 1000)}.png"
+    os.makedirs("/tmp", exist_ok=True)
+
+    try:
+        logger.info(f"Analyzing window {start:.1f}s-{end:.1f}s for character '{character_name}'...")
+        with local_video_cache.checkout(storage_key, expected_sha256=content_sha256) as video_path:
+            cut_window(video_path, start, end, window_path)
+        file_storage_service.download_file(screenshot_url, temp_img_path)
+
+        moments_data = get_ai_engine().find_character_moments(
+            video_file_path=window_path,
+            screenshot_file_path=temp_img_path,
+            character_name=character_name,
+            # Each window is its own engine upload, reusable by later searches on the same window
+            video_identity=f"{video_identity}#{start:.3f}-{end:.3f}"
+        )
+        job_progress.publish(video_id, screenshot_db_id, "analyzing", window_start=start, window_end=end, window_moments=len(moments_data))
+        return {"offset": start, "end": end, "moments": moments_data}
+
+    except Exception as e:
+        if self.request.retries < settings.SEGMENT_MAX_RETRIES:
+            logger.warning(f"Window {start:.1f}s-{end:.1f}s failed ({e}); retrying...")
+            raise self.retry(exc=e, countdown=30 * 2 ** self.request.retries, max_retries=settings.SEGMENT_MAX_RETRIES)
+        logger.error(f"Window {start:.1f}s-{end:.1f}s failed permanently: {e}")
+        return {"offset": start, "end": end, "moments": [], "error": str(e)}
+    finally:
+        for path in (window_path, temp_img_path):
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except Exception as cleanup_error:
+                logger.error(f"Failed to delete local temp files: {cleanup_error}")
+
+@celery_app.task(bind=True, name="merge_video_window_results")
+def merge_video_window_results(self, window_results: list[dict], screenshot_db_id: str, cache_key: str, video_identity: str):
+    """
+    Chord callback: merges every window's moments onto the full timeline and saves them.
+    Windows that failed permanently are reported in the video's error_message, but the moments
+    found by the other windows are kept.
+    """
+    from app.services.analysis_cache_service import analysis_result_cache
+    from app.services.video_segmenter import merge_window_moments
+    from app.services.job_progress_service import job_progress
+    from app.worker.scheduling import search_jobs
+
+    failed = [r for r in window_results if r.get("error")]
+    moments_data = merge_window_moments([r for r in window_results if not r.get("error")])
+
+    db = SessionLocal()
+    screenshot = None
+    retrying = False
+    try:
+        screenshot = db.query(CharacterScreenshotMetadata).filter(CharacterScreenshotMetadata.id == screenshot_db_id).first()
+        video = db.query(VideoMetadata).filter(VideoMetadata.id == screenshot.video_id).first()
+
+        if len(failed) == len(window_results):
+            video.status = VideoStatus.FAILED
+            video.error_message = f"All {len(window_results)} analysis windows failed: {failed[0]['error']}"
+            db.commit()
+            job_progress.publish(video.id, screenshot_db_id, "failed", message=video.error_message)
+            return {"status": "error", "message": video.error_message}
+
+        # Only complete results are worth caching
+        if not failed:
+            analysis_result_cache.set(cache_key, video_identity, moments_data)
+
+        logger.info(f"Segmented analysis complete! Discovered {len(moments_data)} moments. Saving to database...")
+        job_progress.publish(video.id, screenshot_db_id, "saving", moments_found=len(moments_data))
+        moments_found = MomentTimelineService(db).save_moments(video, screenshot, moments_data)
+        screenshot.is_processed = True
+        video.status = VideoStatus.COMPLETED
+        video.error_message = (
+            f"{len(failed)} of {len(window_results)} analysis windows failed: "
+            + ", ".join(f"{r['offset']:.0f}s-{r['end']:.0f}s" for r in failed)
+        ) if failed else None
+        db.commit()
+        job_progress.publish(video.id, screenshot_db_id, "completed", moments_found=moments_found, failed_windows=len(failed))
+        return {"status": "success", "message": "AI Processing Complete", "screenshot_id": screenshot_db_id, "failed_windows": len(failed)}
+    except Exception as e:
+        logger.error(f"Error while merging segmented analysis: {e}")
+        db.rollback()
+        # The windows' results travel with the task, so a retry only redoes the save
+        countdown = retry_countdown(self, e, [(screenshot_db_id, cache_key)])
+        if countdown is not None:
+            retrying = True
+            raise self.retry(exc=e, countdown=countdown, max_retries=None)
+        if screenshot is not None:
+            job_progress.publish(screenshot.video_id, screenshot_db_id, "failed", message=str(e))
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.close()
+        if not retrying:
+            search_jobs.release(screenshot_db_id)
+
+# --- Scene Index ---
+# Runs once per video right after upload (status EXTRACTING): a cheap CPU pass over tiny decoded
+# frames finds every shot cut, stored as a packed array on the video. Every later search reuses it
+# to cut segment windows on scene edges and to snap moment timestamps onto them.
+
+@celery_app.task(bind=True, name="index_video_scenes")
+def index_video_scenes(self, video_id: str):
+    """
+    Builds the scene-boundary index of one video (and records its duration). Idempotent.
+    A failure only leaves the video without an index; searches work without one.
+    """
+    from app.core.config import settings
+    from app.services.local_video_cache import local_video_cache
+    from app.services.video_segmenter import probe_duration
+    from app.services.scene_detector import detect_scene_boundaries, pack_boundaries
+
+    if not settings.SCENE_INDEX_ENABLED:
+        return {"status": "success", "message": "Scene indexing disabled"}
+
+    db = SessionLocal()
+    try:
+        video = db.query(VideoMetadata).filter(VideoMetadata.id == video_id).first()
+        if not video:
+            logger.error(f"Video ID {video_id} not found.")
+            return {"status": "error", "message": "Video not found"}
+        if video.scene_boundaries is not None:
+            return {"status": "success", "message": "Already indexed", "video_id": video_id}
+
+        previous_status = video.status
+        video.status = VideoStatus.EXTRACTING
+        db.commit()
+
+        try:
+            logger.info(f"Building the scene index of video '{video.original_filename}'...")
+            with local_video_cache.checkout(video.storage_key, expected_sha256=video.content_sha256) as video_path:
+                duration = probe_duration(video_path)
+                boundaries = detect_scene_boundaries(
+                    video_path,
+                    sample_fps=settings.SCENE_DETECTION_FPS,
+                    threshold=settings.SCENE_DETECTION_THRESHOLD,
+                    min_scene_seconds=settings.SCENE_MIN_LENGTH_SECONDS
+                )
+        except Exception as e:
+            logger.error(f"Scene indexing failed for video ID {video_id}: {e}")
+            db.refresh(video)
+            if video.status == VideoStatus.EXTRACTING:
+                video.status = previous_status
+            video.error_message = f"Scene indexing failed: {e}"
+            db.commit()
+            return {"status": "error", "message": str(e)}
+
+        db.refresh(video)
+        video.scene_boundaries = pack_boundaries(boundaries)
+        video.duration_seconds = int(round(duration))
+        # A search may have moved the video on in the meantime; only undo our own status
+        if video.status == VideoStatus.EXTRACTING:
+            video.status = previous_status
+        db.commit()
+        logger.info(f"Indexed {len(boundaries) + 1} scenes for video ID {video_id}.")
+
+        if settings.ACTIVE_AI_ENGINE.upper() == "VECTOR":
+            # Embed the frames now too, so even the first search is a pure index scan
+            build_video_frame_index.delay(video_id)
+        return {"status": "success", "video_id": video_id, "scenes": len(boundaries) + 1}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error while indexing scenes: {e}")
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.close()
+
+@celery_app.task(bind=True, name="build_video_frame_index")
+def build_video_frame_index(self, video_id: str):
+    """
+    Builds the VECTOR engine's frame index of one video, then adds the video to the library index.
+    Runs after the scene index, on its own, so an embedding failure never costs the scene index.
+    Idempotent.
+    """
+    from app.core.config import settings
+    from app.services.local_video_cache import local_video_cache
+    from app.services.analysis_cache_service import content_identity
+    from app.services.ai.factory import get_ai_engine
+
+    db = SessionLocal()
+    try:
+        video = db.query(VideoMetadata).filter(VideoMetadata.id == video_id).first()
+        if not video:
+            logger.error(f"Video ID {video_id} not found.")
+            return {"status": "error", "message": "Video not found"}
+
+        try:
+            ai_engine = get_ai_engine()
+            video_identity = content_identity(video.content_sha256, video.storage_key)
+            if not ai_engine.has_frame_index(video_identity):
+                logger.info(f"Building the frame index of video '{video.original_filename}'...")
+                with local_video_cache.checkout(video.storage_key, expected_sha256=video.content_sha256) as video_path:
+                    ai_engine.ensure_frame_index(video_path, video_identity)
+        except Exception as e:
+            logger.error(f"Frame indexing failed for video ID {video_id}: {e}")
+            video.error_message = f"Frame indexing failed: {e}"
+            db.commit()
+            return {"status": "error", "message": str(e)}
+    finally:
+        db.close()
+
+    if settings.LIBRARY_INDEX_ENABLED:
+        add_video_to_library_index.delay(video_id)
+    return {"status": "success", "video_id": video_id}
+
+@celery_app.task(bind=True, name="add_video_to_library_index")
+def add_video_to_library_index(self, video_id: str):
+    """
+    Pools the video's frame embeddings (one vector per few seconds, never across a scene cut)
+    and adds them to the library-wide index as a new segment. Idempotent.
+    """
+    from app.core.config import settings
+    from app.services.local_video_cache import local_video_cache
+    from app.services.analysis_cache_service import content_identity
+    from app.services.ai.vector_engine import frame_index_key
+    from app.services.scene_detector import unpack_boundaries
+    from app.services.library_index import library_index, pool_frame_embeddings
+    import numpy as np
+
+    db = SessionLocal()
+    try:
+        video = db.query(VideoMetadata).filter(VideoMetadata.id == video_id).first()
+        if not video:
+            return {"status": "error", "message": "Video not found"}
+        index_key = frame_index_key(content_identity(video.content_sha256, video.storage_key))
+        scene_boundaries = unpack_boundaries(video.scene_boundaries)
+    finally:
+        db.close()
+
+    try:
+        with local_video_cache.checkout(index_key) as index_path:
+            vectors, starts, ends = pool_frame_embeddings(
+                np.load(index_path, mmap_mode="r"), settings.VECTOR_SAMPLE_FPS, scene_boundaries, settings.LIBRARY_INDEX_POOL_SECONDS
+            )
+        added = library_index.add_video(video_id, vectors, starts, ends)
+        return {"status": "success", "video_id": video_id, "added": added, "vectors": len(vectors)}
+    except Exception as e:
+        logger.error(f"Failed to add video ID {video_id} to the library index: {e}")
+        return {"status": "error", "message": str(e)}
+
+# --- Search Batching ---
+# When a user submits screenshots for several characters of the same video, running one task per
+# screenshot would download the video, upload it to the engine and prompt it N times.
+# Instead, screenshots are parked in a per-video Redis set, and the first one schedules a single
+# batch task SEARCH_BATCH_WINDOW_SECONDS later that analyzes everything collected by then at once.
+
+BATCH_KEY_PREFIX = "search_batch"
+
+def schedule_character_search(screenshot_db_id: str, video_id: str, client_id: str | None = None) -> str:
+    """
+    Entry point used by the API instead of calling process_character_search.delay() directly.
+    Routes the search to the short or long queue by the video's cost, and skips it when an
+    identical search is already queued or running. Returns the ID of the screenshot whose search
+    will produce the result: this one, or the one of the identical search already pending.
+    """
+    from app.core.config import settings
+    from app.core.redis import get_redis_client
+    from app.services.job_progress_service import job_progress
+    from app.services.analysis_cache_service import analysis_result_cache, content_identity
+    from app.worker.scheduling import search_jobs, search_queue_for_video
+
+    db = SessionLocal()
+    try:
+        screenshot = db.query(CharacterScreenshotMetadata).filter(CharacterScreenshotMetadata.id == screenshot_db_id).first()
+        video = db.query(VideoMetadata).filter(VideoMetadata.id == screenshot.video_id).first()
+        cache_key = analysis_result_cache.build_key(
+            content_identity(video.content_sha256, video.storage_key),
+            content_identity(screenshot.content_sha256, screenshot.screenshot_url),
+            screenshot.character_name
+        )
+        queue = search_queue_for_video(video)
+    finally:
+        db.close()
+
+    if not search_jobs.claim(cache_key, screenshot_db_id):
+        pending_screenshot_id = search_jobs.holder(cache_key) or screenshot_db_id
+        logger.info(f"An identical search is already pending (screenshot ID {pending_screenshot_id}); not enqueueing {screenshot_db_id}")
+        return pending_screenshot_id
+
+    job_progress.publish(video_id, screenshot_db_id, "queued", queue=queue)
+    if settings.SEARCH_BATCH_WINDOW_SECONDS <= 0:
+        process_character_search.apply_async(args=[screenshot_db_id], kwargs={"client_id": client_id}, queue=queue)
+        return screenshot_db_id
+
+    redis_client = get_redis_client()
+    pending_key = f"{BATCH_KEY_PREFIX}:pending:{video_id}"
+    scheduled_key = f"{BATCH_KEY_PREFIX}:scheduled:{video_id}"
+
+    redis_client.sadd(pending_key, screenshot_db_id)
+    # Only the first screenshot of a window schedules the batch; the flag outlives the window
+    # generously in case the worker is busy, and the batch task clears it when it runs.
+    if redis_client.set(scheduled_key, 1, nx=True, ex=int(settings.SEARCH_BATCH_WINDOW_SECONDS) + 600):
+        process_character_search_batch.apply_async(
+            args=[video_id], kwargs={"client_id": client_id}, queue=queue, countdown=settings.SEARCH_BATCH_WINDOW_SECONDS
+        )
+    return screenshot_db_id
+
+def pop_pending_screenshots(video_id: str) -> list[str]:
+    """
+    Atomically takes every screenshot waiting to be analyzed for this video.
+    """
+    from app.core.redis import get_redis_client
+
+    redis_client = get_redis_client()
+    pending_key = f"{BATCH_KEY_PREFIX}:pending:{video_id}"
+    # Clear the "scheduled" flag first: anything arriving from now on schedules a new batch,
+    # so no screenshot can be left waiting without a task
+    redis_client.delete(f"{BATCH_KEY_PREFIX}:scheduled:{video_id}")
+    pipe = redis_client.pipeline()
+    pipe.smembers(pending_key)
+    pipe.delete(pending_key)
+    members, _ = pipe.execute()
+    return sorted(m.decode() for m in members)
+
+def requeue_pending_screenshots(video_id: str, screenshot_ids: list[str]) -> None:
+    """
+    Puts screenshots taken by pop_pending_screenshots back for the next batch of this video.
+    """
+    from app.core.redis import get_redis_client
+
+    get_redis_client().sadd(f"{BATCH_KEY_PREFIX}:pending:{video_id}", *screenshot_ids)
+
+@celery_app.task(bind=True, name="process_character_search_batch")
+def process_character_search_batch(self, video_id: str, client_id: str | None = None):
+    """
+    Analyzes every screenshot collected for one video during the batching window with a single
+    video download and as few engine calls as possible (one per SEARCH_BATCH_MAX_SIZE characters).
+    The batch takes one fair-share slot of the client whose screenshot opened it.
+    """
+    with client_slot(self, client_id):
+        screenshot_ids = pop_pending_screenshots(video_id)
+        if not screenshot_ids:
+            return {"status": "success", "message": "Nothing to process"}
+        with pending_search_jobs(screenshot_ids) as job:
+            try:
+                if len(screenshot_ids) == 1:
+                    # Nothing to coalesce, run the regular single-screenshot pipeline inline
+                    result = run_character_search(screenshot_ids[0], self)
+                    job["handed_off"] = "windows" in result
+                    return result
+                return run_character_search_batch(video_id, screenshot_ids, self)
+            except Retry:
+                # The retried batch must find its screenshots waiting again
+                requeue_pending_screenshots(video_id, screenshot_ids)
+                raise
+
+def run_character_search_batch(video_id: str, screenshot_ids: list[str], task=None) -> dict:
+    from app.core.config import settings
+
+    logger.info(f"Worker picked up a batch of {len(screenshot_ids)} screenshots for video ID: {video_id}")
+    db = SessionLocal()
+
+    screenshots = (
+        db.query(CharacterScreenshotMetadata)
+        .filter(CharacterScreenshotMetadata.id.in_(screenshot_ids), CharacterScreenshotMetadata.is_processed.is_(False))
+        .all()
+    )
+    video = db.query(VideoMetadata).filter(VideoMetadata.id == video_id).first()
+    if not video:
+        logger.error(f"Video ID {video_id} not found.")
+        db.close()
+        return {"status": "error", "message": "Video not found"}
+
+    # Serve whatever we can from the analysis result cache (or a previous attempt's checkpoint) first
+    from app.services.analysis_cache_service import analysis_result_cache, content_identity
+    from app.services.job_progress_service import job_progress
+    from app.services.search_checkpoint_service import search_checkpoints
+    video_identity = content_identity(video.content_sha256, video.storage_key)
+    to_analyze = []
+    # screenshot ID -> moments it ended up with, announced once the batch is committed
+    moments_found = {}
+    # (screenshot ID, cache key) of every search whose checkpoint is obsolete once the batch is committed
+    checkpointed = []
+    for screenshot in screenshots:
+        cache_key = analysis_result_cache.build_key(
+            video_identity,
+            content_identity(screenshot.content_sha256, screenshot.screenshot_url),
+            screenshot.character_name
+        )
+        checkpointed.append((str(screenshot.id), cache_key))
+        cached_moments = analysis_result_cache.get(cache_key)
+        if cached_moments is None:
+            cached_moments = search_checkpoints.load(str(screenshot.id), cache_key).get("engine_response")
+        if cached_moments is not None:
+            moments_found[str(screenshot.id)] = MomentTimelineService(db).save_moments(video, screenshot, cached_moments)
+            screenshot.is_processed = True
+        else:
+            to_analyze.append((screenshot, cache_key))
+
+    if not to_analyze:
+        video.status = VideoStatus.COMPLETED
+        db.commit()
+        db.close()
+        for screenshot_id, cache_key in checkpointed:
+            search_checkpoints.clear(screenshot_id, cache_key)
+        for screenshot_id, count in moments_found.items():
+            job_progress.publish(video_id, screenshot_id, "completed", moments_found=count, cache_hit=True)
+        return {"status": "success", "message": "AI Processing Complete (cached)", "screenshot_ids": screenshot_ids}
+
+    logger.info(f"Analyzing Video '{video.original_filename}' for {len(to_analyze)} characters in one batch...")
+    video.status = VideoStatus.ANALYZING
+    db.commit()
+    for screenshot_id, count in moments_found.items():
+        job_progress.publish(video_id, screenshot_id, "completed", moments_found=count, cache_hit=True)
+    moments_found.clear()
+
+    import os
+    from app.services.file_storage_service import file_storage_service
+    from app.services.local_video_cache import local_video_cache
+    from app.services.ai.factory import get_ai_engine
+
+    temp_img_paths = [f"/tmp/{screenshot.id}.png" for screenshot, _ in to_analyze]
+    analyzing_ids = [str(screenshot.id) for screenshot, _ in to_analyze]
+    video_checkout = ExitStack()
+    os.makedirs("/tmp", exist_ok=True)
+
+    try:
+        # Fetch the video ONCE for the whole batch (from the worker-local cache when possible),
+        # unless the engine searches an index that already exists
+        ai_engine = get_ai_engine()
+        temp_video_path = None
+        if engine_needs_video(ai_engine, video_identity):
+            logger.info("Downloading files from Storage to local worker for batch analysis...")
+            for screenshot_id in analyzing_ids:
+                job_progress.publish(video_id, screenshot_id, "downloading")
+            temp_video_path = video_checkout.enter_context(
+                local_video_cache.checkout(video.storage_key, expected_sha256=video.content_sha256)
+            )
+        for (screenshot, _), temp_img_path in zip(to_analyze, temp_img_paths):
+            file_storage_service.download_file(screenshot.screenshot_url, temp_img_path)
+
+        batch_size = max(settings.SEARCH_BATCH_MAX_SIZE, 1)
+        for start in range(0, len(to_analyze), batch_size):
+            group = to_analyze[start:start + batch_size]
+            group_paths = temp_img_paths[start:start + batch_size]
+            for screenshot, _ in group:
+                job_progress.publish(video_id, screenshot.id, "analyzing", batch_size=len(group))
+            results = ai_engine.find_multiple_character_moments(
+                video_file_path=temp_video_path,
+                characters=[(path, screenshot.character_name) for (screenshot, _), path in zip(group, group_paths)],
+                video_identity=video_identity
+            )
+            for (screenshot, cache_key), moments_data, path in zip(group, results, group_paths):
+                search_checkpoints.record(str(screenshot.id), cache_key, "engine_response", moments_data)
+                analysis_result_cache.set(cache_key, video_identity, moments_data)
+                record_screenshot_vector(ai_engine, screenshot, path)
+                job_progress.publish(video_id, screenshot.id, "saving", moments_found=len(moments_data))
+                moments_found[str(screenshot.id)] = MomentTimelineService(db).save_moments(video, screenshot, moments_data)
+                screenshot.is_processed = True
+
+        video.status = VideoStatus.COMPLETED
+        db.commit()
+        for screenshot_id, cache_key in checkpointed:
+            search_checkpoints.clear(screenshot_id, cache_key)
+        for screenshot_id, count in moments_found.items():
+            job_progress.publish(video_id, screenshot_id, "completed", moments_found=count)
+        logger.info(f"Finished processing batch for video ID: {video_id} Successfully!")
+        return {"status": "success", "message": "AI Processing Complete", "screenshot_ids": screenshot_ids}
+
+    except Exception as e:
+        logger.error(f"Error during Celery batch processing: {e}")
+        db.rollback()
+        countdown = retry_countdown(task, e, list(zip(analyzing_ids, [cache_key for _, cache_key in to_analyze])))
+        if countdown is not None:
+            for screenshot_id in analyzing_ids:
+                job_progress.publish(video_id, screenshot_id, "retrying", message=str(e), retry_in_seconds=countdown)
+            raise task.retry(exc=e, countdown=countdown, max_retries=None)
+        for screenshot_id in analyzing_ids:
+            job_progress.publish(video_id, screenshot_id, "failed", message=str(e))
+        try:
+            video = db.query(VideoMetadata).filter(VideoMetadata.id == video_id).first()
+            if video:
+                video.status = VideoStatus.FAILED
+                video.error_message = str(e)
+                db.commit()
+        except Exception:
+            pass # Ignore secondary fails
+        return {"status": "error", "message": str(e)}
+    finally:
+        logger.info("Cleaning up local temporary files...")
+        try:
+            video_checkout.close()
+            for path in temp_img_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+        except Exception as cleanup_error:
+            logger.error(f"Failed to delete local temp files: {cleanup_error}")
+        db.close()
+
+@celery_app.task(name="cleanup_stale_upload_sessions")
+def cleanup_stale_upload_sessions():
+    """
+    Periodic task (scheduled by Celery Beat) that aborts resumable uploads nobody has
+    touched for UPLOAD_SESSION_TTL_HOURS, so abandoned multipart parts don't pile up in MinIO.
+    """
+    from datetime import timedelta
+    from app.core.config import settings
+    from app.services.file_storage_service import file_storage_service
+    from app.services.upload_session_service import UploadSessionService
+
+    db = SessionLocal()
+    try:
+        removed = UploadSessionService(db, file_storage_service).cleanup_stale_sessions(
+            timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+        )
+        logger.info(f"Garbage-collected {removed} stale upload sessions.")
+        return {"status": "success", "removed": removed}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to clean up stale upload sessions: {e}")
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.close()
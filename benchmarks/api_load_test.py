@@ -0,0 +1,134 @@
+"""
+HTTP load test for the API's request path: video listing, video upload and search dispatch.
+
+Runs each scenario with N concurrent clients for a fixed duration against a running API and
+reports requests/sec and latency percentiles. Save one run per build and compare them:
+
+    # on the build before the change
+    python benchmarks/api_load_test.py --video-id <uuid> --label before --output before.json
+    # on the build after the change
+    python benchmarks/api_load_test.py --video-id <uuid> --label after --output after.json
+    python benchmarks/api_load_test.py --compare before.json after.json
+
+Uploads and searches send random bytes, so content-hash deduplication never short-circuits them.
+Search dispatch queues real jobs: point it at a staging stack whose workers are stopped, and
+purge the queue afterwards (`celery -A app.worker.celery_app purge`).
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+import httpx
+
+SCENARIOS = ("list", "upload", "search")
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+async def send(client: httpx.AsyncClient, scenario: str, args) -> httpx.Response:
+    if scenario == "list":
+        return await client.get("/api/videos/", params={"limit": 50})
+    if scenario == "upload":
+        files = {"file": ("load-test.mp4", os.urandom(args.upload_kb * 1024), "video/mp4")}
+        return await client.post("/api/videos/upload", files=files)
+    files = {"file": ("load-test.png", os.urandom(args.image_kb * 1024), "image/png")}
+    data = {"video_id": args.video_id, "character_name": "Load Test", "time_stamp": "0"}
+    return await client.post("/api/videos/search/screenshot", files=files, data=data)
+
+async def run_scenario(scenario: str, args) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + args.duration
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await send(client, scenario, args)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0
+    }
+
+def print_report(report: dict) -> None:
+    print(f"[{report['label']}] {report['concurrency']} clients, {report['duration_seconds']}s per scenario")
+    print(f"{'scenario':<10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for scenario, result in report["scenarios"].items():
+        print(f"{scenario:<10}{result['requests_per_second']:>10}{result['p50_ms']:>10}{result['p99_ms']:>10}{result['errors']:>8}")
+
+def compare(before_path: str, after_path: str) -> None:
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{'scenario':<10}{'req/s ' + before['label']:>16}{'req/s ' + after['label']:>16}{'p99 ' + before['label']:>16}{'p99 ' + after['label']:>16}")
+    for scenario in SCENARIOS:
+        if scenario in before["scenarios"] and scenario in after["scenarios"]:
+            b, a = before["scenarios"][scenario], after["scenarios"][scenario]
+            print(f"{scenario:<10}{b['requests_per_second']:>16}{a['requests_per_second']:>16}{b['p99_ms']:>16}{a['p99_ms']:>16}")
+
+async def main(args) -> None:
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    if "search" in scenarios and not args.video_id:
+        sys.exit("The search scenario needs --video-id (an existing video to attach screenshots to).")
+
+    report = {
+        "label": args.label,
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "duration_seconds": args.duration,
+        "scenarios": {}
+    }
+    for scenario in scenarios:
+        report["scenarios"][scenario] = await run_scenario(scenario, args)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of: list, upload, search")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per scenario")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--upload-kb", type=int, default=512)
+    parser.add_argument("--image-kb", type=int, default=64)
+    parser.add_argument("--video-id")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output", help="Write the report as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two saved reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        asyncio.run(main(args))
@@ -0,0 +1,28 @@
+import time
+from typing import List, Dict, Any
+from app.services.ai.base import BaseAIEngine
+
+class StubAIEngine(BaseAIEngine):
+    """
+    Stands in for a real engine in benchmarks: answers every search with `moments_per_search`
+    synthetic moments after `latency_seconds`, so the numbers measure our own pipeline
+    (storage, database, cache, task plumbing) rather than a model or a network.
+    """
+
+    def __init__(self, moments_per_search: int = 20, latency_seconds: float = 0.0):
+        self.moments_per_search = moments_per_search
+        self.latency_seconds = latency_seconds
+
+    def find_character_moments(self, video_file_path: str, screenshot_file_path: str, character_name: str, video_identity: str | None = None) -> List[Dict[str, Any]]:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        # Disjoint 5-second moments, 10 seconds apart, so none of them are merged on save
+        return [
+            {
+                "action": f"{character_name} walking across the room",
+                "start_timestamp": i * 10.0,
+                "end_timestamp": i * 10.0 + 5.0,
+                "confidence_score": 0.9
+            }
+            for i in range(self.moments_per_search)
+        ]
@@ -0,0 +1,15 @@
+import os
+
+# Database tests run against TEST_DATABASE_URL. The settings are read by the first `app` import,
+# whichever test module that happens in, so the URL must be in place before any of them is collected.
+if os.environ.get("TEST_DATABASE_URL"):
+    os.environ["DATABASE_URL"] = os.environ["TEST_DATABASE_URL"]
+
+# The settings have no defaults for these; the tests only need them to exist (nothing here talks to S3)
+for name, value in {
+    "AWS_ACCESS_KEY_ID": "test",
+    "AWS_SECRET_ACCESS_KEY": "test",
+    "S3_BUCKET_NAME": "test",
+    "DATABASE_URL": "postgresql+psycopg2://postgres@localhost/test",
+}.items():
+    os.environ.setdefault(name, value)
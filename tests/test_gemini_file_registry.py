@@ -0,0 +1,139 @@
+"""
+Reuse of uploaded videos across searches (GeminiFileRegistry), driven through the Gemini engines
+with an in-memory stand-in for genai.Client and fakeredis for the registry.
+"""
+import json
+import asyncio
+import itertools
+from types import SimpleNamespace
+import pytest
+import fakeredis
+
+from app.services.ai.gemini_file_registry import GeminiFileRegistry
+from app.services.ai.gemini_engine import GeminiAIEngine
+from app.services.ai.async_gemini_engine import AsyncGeminiAIEngine
+
+MOMENTS_RESPONSE = json.dumps({"moments": [
+    {"action": "waves", "start_timestamp": 1.0, "end_timestamp": 2.0, "confidence_score": 0.9}
+]})
+
+class FakeFiles:
+    """
+    The File API: uploads are ACTIVE right away and live until deleted.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.uploaded = []
+        self.deleted = []
+        self._names = itertools.count(1)
+
+    def upload(self, file):
+        name = f"files/{next(self._names)}"
+        self.files[name] = SimpleNamespace(name=name, state=SimpleNamespace(name="ACTIVE"), expiration_time=None)
+        self.uploaded.append(file)
+        return self.files[name]
+
+    def get(self, name):
+        return self.files[name]
+
+    def delete(self, name):
+        self.deleted.append(name)
+        del self.files[name]
+
+class FakeModels:
+    def __init__(self):
+        self.calls = []
+
+    def generate_content(self, model, contents, config):
+        self.calls.append(contents)
+        return SimpleNamespace(text=MOMENTS_RESPONSE)
+
+class FakeAsyncNamespace:
+    """
+    `client.aio.*`: the same fake, awaitable.
+    """
+
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        method = getattr(self._target, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+class FakeGenaiClient:
+    def __init__(self):
+        self.files = FakeFiles()
+        self.models = FakeModels()
+        self.aio = SimpleNamespace(files=FakeAsyncNamespace(self.files), models=FakeAsyncNamespace(self.models))
+
+@pytest.fixture
+def media(tmp_path):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"video")
+    screenshot = tmp_path / "crop.png"
+    screenshot.write_bytes(b"image")
+    return str(video), str(screenshot)
+
+@pytest.fixture
+def registry():
+    return GeminiFileRegistry(fakeredis.FakeRedis())
+
+def test_second_search_reuses_the_uploaded_video(media, registry):
+    video, screenshot = media
+    client = FakeGenaiClient()
+    engine = GeminiAIEngine(client=client, file_registry=registry)
+
+    assert engine.find_character_moments(video, screenshot, "Alice", video_identity="sha-1")[0]["action"] == "waves"
+    engine.find_character_moments(video, screenshot, "Bob", video_identity="sha-1")
+
+    assert client.files.uploaded == [video, screenshot, screenshot]
+    video_name = registry.lookup("sha-1")
+    assert video_name == "files/1"
+    # Only the per-search screenshots were deleted; the shared video stays for the next search
+    assert video_name in client.files.files
+    assert video_name not in client.files.deleted
+    assert all(call[1].name == video_name for call in client.models.calls)
+    assert int(registry.redis.get(registry._refs_key(video_name)) or 0) == 0
+
+def test_unusable_registered_video_is_evicted_and_uploaded_again(media, registry):
+    video, screenshot = media
+    client = FakeGenaiClient()
+    engine = GeminiAIEngine(client=client, file_registry=registry)
+
+    engine.find_character_moments(video, screenshot, "Alice", video_identity="sha-1")
+    client.files.files["files/1"].state.name = "FAILED"
+    engine.find_character_moments(video, screenshot, "Alice", video_identity="sha-1")
+
+    assert client.files.uploaded.count(video) == 2
+    assert "files/1" in client.files.deleted
+    assert registry.lookup("sha-1") not in (None, "files/1")
+
+def test_evicting_a_file_in_use_defers_the_delete_to_the_last_release(registry):
+    deleted = []
+    registry.register("sha-1", "files/1")
+    registry.acquire("files/1")
+
+    registry.evict("sha-1", deleted.append)
+    assert registry.lookup("sha-1") is None
+    assert deleted == []
+
+    registry.release("files/1", deleted.append)
+    assert deleted == ["files/1"]
+
+def test_async_engine_reuses_the_uploaded_video(media, registry):
+    video, screenshot = media
+    client = FakeGenaiClient()
+    engine = AsyncGeminiAIEngine(client=client, file_registry=registry)
+
+    async def search_twice():
+        await engine.find_character_moments_async(video, screenshot, "Alice", video_identity="sha-1")
+        await engine.find_character_moments_async(video, screenshot, "Bob", video_identity="sha-1")
+
+    asyncio.run(search_twice())
+
+    assert client.files.uploaded.count(video) == 1
+    assert registry.lookup("sha-1") in client.files.files
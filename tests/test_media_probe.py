@@ -0,0 +1,111 @@
+"""
+Header-only MP4/MOV probing (media_probe.probe_mp4) on synthetic ISO base media boxes,
+checking what it parses and how many bytes it had to read to get there.
+"""
+import struct
+
+from app.services.media_probe import probe_mp4, MAX_BITRATE
+
+def box(box_type: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+def box64(box_type: bytes, payload: bytes = b"") -> bytes:
+    # size == 1: the real size follows the type as a 64-bit integer
+    return struct.pack(">I4sQ", 1, box_type, 16 + len(payload)) + payload
+
+def mvhd(timescale: int, duration: int, version: int = 0) -> bytes:
+    if version == 1:
+        times = struct.pack(">QQIQ", 0, 0, timescale, duration)
+    else:
+        times = struct.pack(">IIII", 0, 0, timescale, duration)
+    return box(b"mvhd", bytes([version, 0, 0, 0]) + times + bytes(80))
+
+def trak(handler: bytes, codec: bytes, width: int = 0, height: int = 0) -> bytes:
+    # tkhd v0: times and track id (20 bytes), reserved/layer/volume and the matrix (52), 16.16 size
+    tkhd = box(b"tkhd", bytes(4) + bytes(20) + bytes(52) + struct.pack(">II", width << 16, height << 16))
+    hdlr = box(b"hdlr", bytes(8) + handler + bytes(12))
+    stsd = box(b"stsd", bytes(4) + struct.pack(">I", 1) + struct.pack(">I4s", 16, codec) + bytes(8))
+    return box(b"trak", tkhd + box(b"mdia", hdlr + box(b"minf", box(b"stbl", stsd))))
+
+def moov(duration_box: bytes, padding: int = 0) -> bytes:
+    tracks = trak(b"vide", b"avc1", 1920, 1080) + trak(b"soun", b"mp4a")
+    return box(b"moov", duration_box + tracks + (box(b"free", bytes(padding)) if padding else b""))
+
+FTYP = box(b"ftyp", b"isom" + bytes(4) + b"isomavc1")
+
+class RangeReader:
+    """
+    read_range over an in-memory file, recording every request.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.reads = []
+
+    def __call__(self, start: int, end: int) -> bytes:
+        self.reads.append((start, end))
+        return self.data[start:end + 1]
+
+    @property
+    def bytes_read(self) -> int:
+        return sum(end - start + 1 for start, end in self.reads)
+
+def probe(data: bytes, head_bytes: int = 64 * 1024, max_header_bytes: int = 1024 * 1024):
+    reader = RangeReader(data)
+    return probe_mp4(reader, len(data), head_bytes, max_header_bytes), reader
+
+def test_faststart_file_is_probed_with_one_read():
+    data = FTYP + moov(mvhd(timescale=1000, duration=90_000)) + box(b"mdat", bytes(4096))
+    info, reader = probe(data)
+
+    assert info["duration_seconds"] == 90.0
+    assert (info["width"], info["height"]) == (1920, 1080)
+    assert (info["video_codec"], info["audio_codec"]) == ("avc1", "mp4a")
+    assert info["bitrate"] == len(data) * 8 // 90
+    assert info["is_faststart"] is True
+    assert len(reader.reads) == 1
+    assert info["probe_bytes"] == reader.bytes_read == len(data)
+
+def test_mvhd_version_1_duration():
+    data = FTYP + moov(mvhd(timescale=90_000, duration=2**33, version=1))
+    info, _ = probe(data)
+
+    assert info["duration_seconds"] == 2**33 / 90_000
+
+def test_64_bit_mdat_is_skipped_without_reading_the_media():
+    media = bytes(2 * 1024 * 1024)
+    movie = moov(mvhd(timescale=1000, duration=60_000))
+    data = FTYP + box64(b"mdat", media) + movie
+    info, reader = probe(data, head_bytes=64)
+
+    assert info["duration_seconds"] == 60.0
+    assert info["is_faststart"] is False
+    # The head, the 16 header bytes at the moov offset, then the moov payload
+    assert len(reader.reads) == 3
+    assert info["probe_bytes"] == reader.bytes_read == 64 + 16 + (len(movie) - 8)
+    assert reader.bytes_read < len(media) // 100
+
+def test_non_mp4_input_returns_none():
+    data = b"RIFF" + struct.pack("<I", 4096) + b"AVI LIST" + bytes(4096)
+    info, reader = probe(data)
+
+    assert info is None
+    assert len(reader.reads) == 1
+
+def test_moov_larger_than_max_header_bytes_is_not_read():
+    movie = moov(mvhd(timescale=1000, duration=60_000), padding=8192)
+    data = FTYP + box(b"mdat", bytes(1024)) + movie
+    info, reader = probe(data, head_bytes=64, max_header_bytes=4096)
+
+    assert info is None
+    # Only the head and the moov box header were fetched, never its payload
+    assert reader.bytes_read == 64 + 16
+
+def test_near_zero_duration_drops_the_bitrate():
+    # One microsecond for a whole file would not fit the 32-bit bitrate column
+    data = FTYP + moov(mvhd(timescale=1_000_000, duration=1)) + box(b"mdat", bytes(4096))
+    info, _ = probe(data)
+
+    assert len(data) * 8 * 1_000_000 > MAX_BITRATE
+    assert info["duration_seconds"] == 1e-6
+    assert info["bitrate"] is None
@@ -0,0 +1,101 @@
+"""
+EngineRateLimiter against fakeredis (its Lua support needs `fakeredis[lua]`): token refill,
+the in-flight cap and lease expiry of the acquire script, plus quota retries of `call()`.
+"""
+import time
+import pytest
+import fakeredis
+
+from app.services.ai.rate_limiter import Budget, EngineRateLimiter, RateLimitTimeout
+
+class QuotaError(Exception):
+    code = 429
+
+def make_limiter(budget: Budget, **kwargs) -> EngineRateLimiter:
+    return EngineRateLimiter(fakeredis.FakeRedis(), {"generate": budget}, **kwargs)
+
+def test_bucket_refills_after_burst_is_spent():
+    limiter = make_limiter(Budget(rate_per_second=10, burst=2, max_in_flight=100))
+
+    for _ in range(2):
+        lease_id, wait = limiter.try_acquire("generate")
+        assert lease_id and wait == 0.0
+        limiter.release("generate", lease_id)
+
+    lease_id, wait = limiter.try_acquire("generate")
+    assert lease_id is None
+    assert 0 < wait <= 0.1
+
+    time.sleep(wait + 0.02)
+    lease_id, _ = limiter.try_acquire("generate")
+    assert lease_id
+
+def test_in_flight_cap_blocks_until_a_slot_is_released():
+    limiter = make_limiter(Budget(rate_per_second=1000, burst=1000, max_in_flight=2))
+
+    held = [limiter.try_acquire("generate")[0] for _ in range(2)]
+    assert all(held)
+
+    lease_id, wait = limiter.try_acquire("generate")
+    assert lease_id is None and wait > 0
+    assert limiter.stats()["budgets"]["generate"]["in_flight"] == 2
+
+    limiter.release("generate", held[0])
+    lease_id, _ = limiter.try_acquire("generate")
+    assert lease_id
+
+def test_full_semaphore_does_not_consume_tokens():
+    limiter = make_limiter(Budget(rate_per_second=0.001, burst=2, max_in_flight=1))
+
+    first, _ = limiter.try_acquire("generate")
+    for _ in range(5):
+        assert limiter.try_acquire("generate")[0] is None
+
+    limiter.release("generate", first)
+    assert limiter.try_acquire("generate")[0]
+
+def test_expired_lease_frees_its_slot():
+    # A worker that crashed while holding a slot never releases it; the lease runs out instead
+    limiter = make_limiter(Budget(rate_per_second=1000, burst=1000, max_in_flight=1), lease_seconds=0.2)
+
+    assert limiter.try_acquire("generate")[0]
+    assert limiter.try_acquire("generate")[0] is None
+
+    time.sleep(0.3)
+    assert limiter.try_acquire("generate")[0]
+
+def test_limit_gives_up_after_max_wait():
+    limiter = make_limiter(Budget(rate_per_second=1000, burst=1000, max_in_flight=1), max_wait_seconds=0.3)
+
+    assert limiter.try_acquire("generate")[0]
+    with pytest.raises(RateLimitTimeout):
+        with limiter.limit("generate"):
+            pass
+
+def test_call_retries_quota_errors(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    limiter = make_limiter(Budget(rate_per_second=1000, burst=1000, max_in_flight=1), quota_max_retries=2)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise QuotaError("RESOURCE_EXHAUSTED")
+        return "ok"
+
+    assert limiter.call("generate", flaky) == "ok"
+    assert len(attempts) == 3
+    # Every attempt released its slot
+    assert limiter.stats()["budgets"]["generate"]["in_flight"] == 0
+
+def test_call_does_not_retry_other_errors():
+    limiter = make_limiter(Budget(rate_per_second=1000, burst=1000, max_in_flight=1))
+    attempts = []
+
+    def broken():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        limiter.call("generate", broken)
+    assert len(attempts) == 1